@@ -5,160 +5,103 @@
 
 from flask import Flask, jsonify, request
 from flask_cors import CORS
-from datetime import datetime, timedelta
+from datetime import datetime
 import json
 import os
 
+from change_feed import ChangeFeed, TooManySubscribers
+from data_layer import is_valid_alert, parse_alert_limit, shared_data_layer
+from downsampling import DownsampleError, parse_downsample_params
+from equipment_repository import SUMMARY_STATUSES
+from http_cache import ResponseCache, cache_control, choose_encoding, compress, if_none_match, make_etag, normalize_query
+from router import API_ROUTES, flask_rule
+from timeseries_store import (
+    INVALID_READINGS_ERROR, TimeRangeError, create_store, format_timestamp, normalize_reading, parse_time_range,
+    readings_from_body
+)
+
 app = Flask(__name__)
 CORS(app)  # フロントエンドからのアクセスを許可
 
-# サンプルデータ
-SAMPLE_EQUIPMENT = [
-    {
-        "id": 1,
-        "name": "射出成形機-1",
-        "type": "射出成形機",
-        "status": "running",
-        "location": "ライン A",
-        "operatingHours": 2450,
-        "lastMaintenance": "2024-01-15",
-        "temperature": 75,
-        "pressure": 82,
-        "vibration": 4.2,
-        "history": [
-            {"id": 1, "timestamp": "2024-01-20 10:30", "event": "稼働開始"},
-            {"id": 2, "timestamp": "2024-01-15 15:00", "event": "定期メンテナンス完了"}
-        ]
-    },
-    {
-        "id": 2,
-        "name": "射出成形機-2",
-        "type": "射出成形機",
-        "status": "running",
-        "location": "ライン A",
-        "operatingHours": 2380,
-        "lastMaintenance": "2024-01-10",
-        "temperature": 78,
-        "pressure": 85,
-        "vibration": 3.8,
-        "history": [
-            {"id": 1, "timestamp": "2024-01-20 09:15", "event": "稼働開始"},
-            {"id": 2, "timestamp": "2024-01-10 14:30", "event": "定期メンテナンス完了"}
-        ]
-    },
-    {
-        "id": 3,
-        "name": "組立ロボット-1",
-        "type": "組立ロボット",
-        "status": "idle",
-        "location": "ライン B",
-        "operatingHours": 1680,
-        "lastMaintenance": "2024-01-05",
-        "temperature": 45,
-        "pressure": 65,
-        "vibration": 2.1,
-        "history": [
-            {"id": 1, "timestamp": "2024-01-20 11:00", "event": "待機状態"},
-            {"id": 2, "timestamp": "2024-01-05 16:45", "event": "定期メンテナンス完了"}
-        ]
-    },
-    {
-        "id": 4,
-        "name": "組立ロボット-2",
-        "type": "組立ロボット",
-        "status": "running",
-        "location": "ライン B",
-        "operatingHours": 1720,
-        "lastMaintenance": "2024-01-08",
-        "temperature": 52,
-        "pressure": 72,
-        "vibration": 2.8,
-        "history": [
-            {"id": 1, "timestamp": "2024-01-20 08:30", "event": "稼働開始"},
-            {"id": 2, "timestamp": "2024-01-08 13:20", "event": "定期メンテナンス完了"}
-        ]
-    },
-    {
-        "id": 5,
-        "name": "検査装置-1",
-        "type": "検査装置",
-        "status": "maintenance",
-        "location": "ライン C",
-        "operatingHours": 3200,
-        "lastMaintenance": "2024-01-20",
-        "temperature": 35,
-        "pressure": 0,
-        "vibration": 0,
-        "history": [
-            {"id": 1, "timestamp": "2024-01-20 13:00", "event": "メンテナンス開始"},
-            {"id": 2, "timestamp": "2024-01-18 17:30", "event": "稼働停止"}
-        ]
-    },
-    {
-        "id": 6,
-        "name": "コンプレッサー-1",
-        "type": "コンプレッサー",
-        "status": "running",
-        "location": "共通設備",
-        "operatingHours": 5680,
-        "lastMaintenance": "2023-12-20",
-        "temperature": 68,
-        "pressure": 88,
-        "vibration": 5.2,
-        "history": [
-            {"id": 1, "timestamp": "2024-01-01 00:00", "event": "連続稼働中"},
-            {"id": 2, "timestamp": "2023-12-20 10:00", "event": "定期メンテナンス完了"}
-        ]
-    },
-    {
-        "id": 7,
-        "name": "コンプレッサー-2",
-        "type": "コンプレッサー",
-        "status": "error",
-        "location": "共通設備",
-        "operatingHours": 5420,
-        "lastMaintenance": "2023-12-15",
-        "temperature": 95,
-        "pressure": 102,
-        "vibration": 8.5,
-        "history": [
-            {"id": 1, "timestamp": "2024-01-20 14:25", "event": "温度異常検出"},
-            {"id": 2, "timestamp": "2024-01-20 14:20", "event": "アラート発生"}
-        ]
-    }
-]
+# 設備・アラートは simple_api.py と共通のデータ層から読む（不変のスナップショットを差し替えて更新）
+data_layer = shared_data_layer()
+# 設備データへのアクセスはリポジトリ経由（主キー・location / status / type のインデックス）
+equipment_repository = data_layer.equipment
+alert_log = data_layer.alerts
+# センサーデータは時系列ストア（SENSOR_DATA_PATH）から期間を指定して取得
+sensor_store = create_store()
+
+# エンコード済みレスポンスのキャッシュ（API_RESPONSE_CACHE_MAX_BYTES / API_RESPONSE_CACHE_MAX_ENTRIES）
+response_cache = ResponseCache()
+
+# 設備の状態変化・新しいアラート・最新のセンサー値の差分を /api/stream で配信する
+change_feed = ChangeFeed()
+# SSE で購読できるイベント種別（reset は常に送る）
+STREAM_EVENT_TYPES = ('equipment', 'alert', 'sensor')
+
+def publish_equipment_change(previous, current):
+    """設備の変更を差分（変わった項目のみ）で配信する。状態が変わった場合はサマリーも送る"""
+    if current is None:
+        event = {'id': previous['id'], 'deleted': True}
+    else:
+        changes = {
+            field: value for field, value in current.items()
+            if previous is None or previous.get(field) != value
+        }
+        if not changes:
+            return
+        event = {'id': current['id'], 'changes': changes}
+    if current is None or previous is None or 'status' in event['changes']:
+        event['summary'] = equipment_repository.summary()
+    change_feed.publish('equipment', event)
+
+equipment_repository.add_listener(publish_equipment_change)
 
-SAMPLE_ALERTS = [
-    {
-        "id": 1,
-        "timestamp": (datetime.now() - timedelta(minutes=5)).isoformat(),
-        "message": "温度異常が検出されました",
-        "equipmentName": "コンプレッサー-2",
-        "equipmentId": 7,
-        "severity": "error",
-        "status": "active"
-    },
-    {
-        "id": 2,
-        "timestamp": (datetime.now() - timedelta(minutes=30)).isoformat(),
-        "message": "メンテナンス時期に到達しました",
-        "equipmentName": "検査装置-1",
-        "equipmentId": 5,
-        "severity": "warning",
-        "status": "active"
-    },
-    {
-        "id": 3,
-        "timestamp": (datetime.now() - timedelta(hours=2)).isoformat(),
-        "message": "センサー通信エラー",
-        "equipmentName": "組立ロボット-1",
-        "equipmentId": 3,
-        "severity": "warning",
-        "status": "resolved"
-    }
-]
+def api_route(name):
+    """router.API_ROUTES の名前でルートを登録する（パスとメソッドは simple_api.py と共通、末尾のスラッシュは無視）"""
+    method, pattern = API_ROUTES[name]
+    return app.route(flask_rule(pattern), methods=[method], strict_slashes=False)
 
-@app.route('/api/health', methods=['GET'])
+def conditional_json(resource, version, build):
+    """
+    ETag 付きの JSON レスポンス
+    
+    ETag はデータのバージョン番号とクエリパラメータから決まるため、
+    If-None-Match が一致する場合は build（ペイロードの組み立て）を呼ばずに 304 を返す。
+    200 の本文は (リソース, バージョン, クエリ) ごとにエンコード済みのもの（圧縮済みを含む）を再利用する。
+    """
+    key = response_cache.key(resource, version, normalize_query(request.args.to_dict(flat=False)))
+    etag = make_etag(*key)
+    encoding = None
+    if if_none_match(request.headers.get('If-None-Match'), etag):
+        response = app.response_class(status=304)
+    else:
+        cached = response_cache.get_or_build(key, build)
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'), len(cached.body))
+        body = response_cache.compressed(cached, encoding) if encoding else cached.body
+        response = app.response_class(body, mimetype='application/json')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag, weak=encoding is not None)
+    response.headers['Cache-Control'] = cache_control()
+    response.vary.add('Accept-Encoding')
+    return response
+
+@app.after_request
+def compress_response(response):
+    """conditional_json 以外の JSON レスポンス（センサーデータなど）を Accept-Encoding に応じて圧縮する"""
+    if (response.mimetype != 'application/json' or response.is_streamed or response.direct_passthrough
+            or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'), len(body))
+    if encoding:
+        response.set_data(compress(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+@api_route('health')
 def health():
     """ヘルスチェック"""
     return jsonify({
@@ -167,117 +110,196 @@ def health():
         'version': '1.0.0'
     })
 
-@app.route('/api/equipment', methods=['GET'])
+@api_route('equipment_list')
 def get_equipment():
     """設備一覧取得"""
     location = request.args.get('location')
     status = request.args.get('status')
+    equipment_type = request.args.get('type')
     
-    filtered_equipment = SAMPLE_EQUIPMENT
-    
-    if location:
-        filtered_equipment = [eq for eq in filtered_equipment if eq['location'] == location]
-    
-    if status:
-        filtered_equipment = [eq for eq in filtered_equipment if eq['status'] == status]
+    def build():
+        filtered_equipment = equipment_repository.list(
+            location=location or None,
+            status=status or None,
+            equipment_type=equipment_type or None
+        )
+        return {
+            'equipment': filtered_equipment,
+            'total': len(filtered_equipment),
+            'timestamp': datetime.now().isoformat()
+        }
     
-    return jsonify({
-        'equipment': filtered_equipment,
-        'total': len(filtered_equipment),
-        'timestamp': datetime.now().isoformat()
-    })
+    return conditional_json('equipment', equipment_repository.version, build)
 
-@app.route('/api/equipment/<int:equipment_id>', methods=['GET'])
+@api_route('equipment_detail')
 def get_equipment_detail(equipment_id):
     """設備詳細取得"""
-    equipment = next((eq for eq in SAMPLE_EQUIPMENT if eq['id'] == equipment_id), None)
+    equipment = equipment_repository.get(equipment_id)
     
     if not equipment:
         return jsonify({'error': '設備が見つかりません'}), 404
     
-    return jsonify({
+    return conditional_json(f'equipment{equipment_id}', equipment_repository.version, lambda: {
         'equipment': equipment,
         'timestamp': datetime.now().isoformat()
     })
 
-@app.route('/api/equipment/summary', methods=['GET'])
+@api_route('equipment_summary')
 def get_equipment_summary():
-    """設備サマリー取得"""
-    total = len(SAMPLE_EQUIPMENT)
-    running = len([eq for eq in SAMPLE_EQUIPMENT if eq['status'] == 'running'])
-    idle = len([eq for eq in SAMPLE_EQUIPMENT if eq['status'] == 'idle'])
-    maintenance = len([eq for eq in SAMPLE_EQUIPMENT if eq['status'] == 'maintenance'])
-    error = len([eq for eq in SAMPLE_EQUIPMENT if eq['status'] == 'error'])
+    """設備サマリー取得（ステータス別の件数は登録・更新時に差分で集計済み）"""
+    return conditional_json('summary', equipment_repository.version, lambda: {
+        'summary': equipment_repository.summary(
+            location=request.args.get('location') or None,
+            equipment_type=request.args.get('type') or None,
+            breakdown=request.args.get('breakdown', '').lower() in ('1', 'true')
+        ),
+        'timestamp': datetime.now().isoformat()
+    })
+
+@api_route('equipment_status')
+def update_equipment_status(equipment_id):
+    """設備の状態を変更（変更は /api/stream の equipment イベントとして配信する）"""
+    status = (request.get_json(silent=True) or {}).get('status')
+    if status not in SUMMARY_STATUSES:
+        return jsonify({'error': f"status は {' / '.join(SUMMARY_STATUSES)} のいずれかを指定してください"}), 400
+    
+    equipment = equipment_repository.update_status(equipment_id, status)
+    if equipment is None:
+        return jsonify({'error': '設備が見つかりません'}), 404
     
     return jsonify({
-        'summary': {
-            'total': total,
-            'running': running,
-            'idle': idle,
-            'maintenance': maintenance,
-            'error': error
-        },
+        'equipment': equipment,
         'timestamp': datetime.now().isoformat()
     })
 
-@app.route('/api/alerts', methods=['GET'])
+@api_route('alerts')
 def get_alerts():
     """アラート一覧取得"""
     severity = request.args.get('severity')
-    status = request.args.get('status', 'active')
-    limit = int(request.args.get('limit', 10))
+    status = request.args.get('status')
+    limit = parse_alert_limit(request.args.get('limit'))
     
-    filtered_alerts = SAMPLE_ALERTS
+    def build():
+        # 最新のアラートから指定件数を返す（status 未指定時は active のみ、all で全件）
+        filtered_alerts = alert_log.list(severity, status, limit)
+        return {
+            'alerts': filtered_alerts,
+            'total': len(filtered_alerts),
+            'timestamp': datetime.now().isoformat()
+        }
     
-    if severity:
-        filtered_alerts = [alert for alert in filtered_alerts if alert['severity'] == severity]
+    return conditional_json('alerts', alert_log.version, build)
+
+@api_route('create_alerts')
+def create_alerts():
+    """
+    アラート登録（iot-data-processor の storedAlerts など、1件または配列）
     
-    if status:
-        filtered_alerts = [alert for alert in filtered_alerts if alert['status'] == status]
+    登録したアラートは /api/stream の alert イベントとして配信する。
+    """
+    body = request.get_json(silent=True)
+    alerts = body if isinstance(body, list) else [body]
+    if not alerts or not all(is_valid_alert(alert) for alert in alerts):
+        return jsonify({'error': 'message を含むアラートを指定してください（id は文字列または整数）'}), 400
     
-    # 最新のアラートから指定件数を返す
-    filtered_alerts = sorted(filtered_alerts, key=lambda x: x['timestamp'], reverse=True)[:limit]
+    created = alert_log.add(alerts, equipment_repository)
+    for alert in created:
+        change_feed.publish('alert', alert)
     
-    return jsonify({
-        'alerts': filtered_alerts,
-        'total': len(filtered_alerts),
-        'timestamp': datetime.now().isoformat()
-    })
+    return jsonify({'alerts': created, 'total': len(created)}), 201
 
-@app.route('/api/sensor-data/<int:equipment_id>', methods=['GET'])
+@api_route('sensor_data')
 def get_sensor_data(equipment_id):
-    """センサーデータ取得"""
-    equipment = next((eq for eq in SAMPLE_EQUIPMENT if eq['id'] == equipment_id), None)
+    """
+    センサーデータ取得（from / to の期間、未指定時は直近24時間）
+    
+    maxPoints / resolution を指定するとサーバー側で間引く（method: minmax / lttb）
+    """
+    equipment = equipment_repository.get(equipment_id)
     
     if not equipment:
         return jsonify({'error': '設備が見つかりません'}), 404
     
-    # 過去24時間のサンプルセンサーデータを生成
-    import random
-    sensor_data = []
-    base_time = datetime.now() - timedelta(hours=24)
-    
-    for i in range(24):  # 1時間ごとのデータ
-        timestamp = base_time + timedelta(hours=i)
-        
-        # 基準値からの変動を追加
-        temp_variation = random.uniform(-5, 5)
-        pressure_variation = random.uniform(-3, 3)
-        vibration_variation = random.uniform(-0.5, 0.5)
-        
-        sensor_data.append({
-            'timestamp': timestamp.isoformat(),
-            'temperature': max(0, equipment['temperature'] + temp_variation),
-            'pressure': max(0, equipment['pressure'] + pressure_variation),
-            'vibration': max(0, equipment['vibration'] + vibration_variation)
-        })
+    try:
+        start, end = parse_time_range(request.args.get('from'), request.args.get('to'))
+        max_points, resolution, method = parse_downsample_params(
+            request.args.get('maxPoints'), request.args.get('resolution'), request.args.get('method')
+        )
+        sample = sensor_store.sample(
+            equipment_id, start, end, max_points, resolution, method, request.args.get('column')
+        )
+    except (TimeRangeError, DownsampleError) as e:
+        return jsonify({'error': str(e)}), 400
     
     return jsonify({
         'equipmentId': equipment_id,
-        'sensorData': sensor_data,
+        'from': format_timestamp(start),
+        'to': format_timestamp(end),
+        'count': len(sample['sensorData']),
+        'sensorData': sample['sensorData'],
+        'downsampling': {
+            'method': sample['method'],
+            'resolution': sample['resolution'],
+            'source': sample['source']
+        },
         'timestamp': datetime.now().isoformat()
     })
 
+@api_route('append_sensor_data')
+def append_sensor_data(equipment_id):
+    """
+    センサーデータ登録（iot-data-processor の入力・processedData 形式、1件または配列）
+    
+    時系列ストアに追記し、最新の値を /api/stream の sensor イベントとして配信する。
+    """
+    if equipment_repository.get(equipment_id) is None:
+        return jsonify({'error': '設備が見つかりません'}), 404
+    
+    readings = readings_from_body(request.get_json(silent=True))
+    if readings is None:
+        return jsonify({'error': INVALID_READINGS_ERROR}), 400
+    try:
+        readings = [dict(reading, deviceId=str(equipment_id), equipmentId=str(equipment_id)) for reading in readings]
+        latest = max((normalize_reading(reading) for reading in readings), key=lambda row: row[1])
+        count = sensor_store.append_readings(readings)
+    except (TypeError, ValueError):
+        return jsonify({'error': INVALID_READINGS_ERROR}), 400
+    
+    change_feed.publish('sensor', dict(
+        {'equipmentId': equipment_id, 'timestamp': format_timestamp(latest[1])},
+        **{column: value for column, value in latest[2].items() if column in sensor_store.columns}
+    ))
+    
+    return jsonify({'equipmentId': equipment_id, 'count': count}), 201
+
+@api_route('stream')
+def stream_changes():
+    """
+    変更の配信（Server-Sent Events）
+    
+    types=equipment,alert,sensor で受け取る種別を絞り込める。
+    再接続時は Last-Event-ID（EventSource が自動で送る）の続きから送る。
+    """
+    types = request.args.get('types')
+    if types:
+        types = set(types.split(','))
+        unknown = types.difference(STREAM_EVENT_TYPES)
+        if unknown:
+            return jsonify({'error': f"未対応のイベント種別です: {', '.join(sorted(unknown))}"}), 400
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    try:
+        subscription = change_feed.subscribe(last_event_id, types or None)
+    except TooManySubscribers as e:
+        return jsonify({'error': str(e)}), 503
+    
+    response = app.response_class(subscription.stream(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # リバースプロキシでのバッファリングを無効にする
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(subscription.close)
+    return response
+
 @app.errorhandler(404)
 def not_found_error(error):
     return jsonify({'error': 'エンドポイントが見つかりません'}), 404
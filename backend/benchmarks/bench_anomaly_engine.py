@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+異常検知エンジンのベンチマーク
+
+detect_anomalies() を1件ずつ呼び出す従来方式と、列指向エンジン
+detect_anomalies_columnar() のスループットを 1万・10万・100万件で比較し、
+出力が完全に一致することも検証する。
+
+使用方法:
+    python backend/benchmarks/bench_anomaly_engine.py [--sizes 10000 100000 1000000]
+"""
+
+import argparse
+import json
+import random
+from datetime import datetime
+
+from bench_utils import load_function_package, print_row, timed
+
+iot = load_function_package('iot-data-processor')
+from iot_data_processor.anomaly_engine import columns_from_readings, detect_anomalies_columnar
+
+FIXED_NOW = datetime(2024, 6, 23, 10, 0, 0)
+
+
+class FixedDatetime(datetime):
+    """出力比較のため現在時刻を固定する"""
+
+    @classmethod
+    def now(cls, tz=None):
+        return FIXED_NOW
+
+
+def generate_readings(size, seed=42):
+    """約1割が閾値を超えるサンプルデータを生成"""
+    rng = random.Random(seed)
+    readings = []
+    for i in range(size):
+        sensor_data = {
+            'temperature': round(rng.gauss(70, 10), 1),
+            'pressure': round(rng.gauss(80, 8), 1),
+            'vibration': round(rng.gauss(4, 2), 2)
+        }
+        if i % 7 == 0:
+            del sensor_data['pressure']
+        readings.append((f"device-{i % 1000}", sensor_data))
+    return readings
+
+
+def run_scalar(readings):
+    alerts_by_row = {}
+    for row, (device_id, sensor_data) in enumerate(readings):
+        alerts = iot.detect_anomalies(device_id, sensor_data)
+        if alerts:
+            alerts_by_row[row] = alerts
+    return alerts_by_row
+
+
+def build_columns(readings):
+    device_ids = [device_id for device_id, _ in readings]
+    return device_ids, columns_from_readings([sensor_data for _, sensor_data in readings])
+
+
+def run_columnar(device_ids, columns, now=None):
+    return detect_anomalies_columnar(device_ids, now=now, **columns)
+
+
+def check_identical(readings, device_ids, columns):
+    """時刻を固定して従来方式と列指向エンジンの出力をバイト単位で比較"""
+    original = iot.datetime
+    iot.datetime = FixedDatetime
+    try:
+        expected = json.dumps(run_scalar(readings), ensure_ascii=False)
+    finally:
+        iot.datetime = original
+    actual = json.dumps(run_columnar(device_ids, columns, FIXED_NOW), ensure_ascii=False)
+    return expected == actual
+
+
+def main():
+    parser = argparse.ArgumentParser(description="異常検知エンジンのベンチマーク")
+    parser.add_argument("--sizes", type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        readings = generate_readings(size)
+        print(f"■ {size:,}件")
+        _, scalar_time = timed(run_scalar, readings)
+        (device_ids, columns), build_time = timed(build_columns, readings)
+        result, detect_time = timed(run_columnar, device_ids, columns)
+        print_row("従来方式 (1件ずつ)", size, scalar_time)
+        print_row("列指向 (列変換込み)", size, build_time + detect_time)
+        print_row("列指向 (検知のみ)", size, detect_time)
+
+        identical = check_identical(readings, device_ids, columns)
+        print(f"  アラート行数: {len(result):,}  出力一致: {'OK' if identical else 'NG'}")
+        if not identical:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+変更フィード（/api/stream）のベンチマーク
+
+設備数を増やした app.py について、ダッシュボードの定期取得（一覧・サマリー・アラートを毎回取得）と
+変更フィードの購読（状態変化の差分のみ）で、状態変更1件あたりにクライアントへ送る量を比較する。
+また、購読者数を変えて ChangeFeed.publish の処理時間と全購読者への配信完了までの時間を測り、
+送信の遅い購読者が reset を受け取ることも検証する。
+
+使用方法:
+    python backend/benchmarks/bench_change_feed.py [--size 1000] [--changes 1000]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+from bench_utils import print_row, timed
+from bench_equipment_repository import generate_equipment
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import app as app_module
+from change_feed import RESET_EVENT, ChangeFeed
+from equipment_repository import SUMMARY_STATUSES, create_repository
+
+POLL_URLS = ('/api/equipment', '/api/equipment/summary', '/api/alerts?status=active&limit=5')
+
+
+def change_statuses(client, count):
+    for index in range(count):
+        client.put(f'/api/equipment/{index % 100 + 1}/status',
+                   json={'status': SUMMARY_STATUSES[(index + index // 100) % len(SUMMARY_STATUSES)]})
+
+
+def fan_out(subscribers, changes):
+    """購読者ごとのスレッドで受信し、publish の合計時間と全員が受信し終えるまでの時間を返す"""
+    feed = ChangeFeed(capacity=changes, max_subscribers=subscribers)
+    subscriptions = [feed.subscribe() for _ in range(subscribers)]
+    received = [0] * subscribers
+
+    def receive(index, subscription):
+        while received[index] < changes:
+            received[index] += len(subscription.wait(1))
+
+    threads = [threading.Thread(target=receive, args=item) for item in enumerate(subscriptions)]
+    for thread in threads:
+        thread.start()
+    start = time.perf_counter()
+    publish_seconds = 0.0
+    for index in range(changes):
+        _, seconds = timed(feed.publish, 'equipment', {'id': index, 'changes': {'status': 'running'}})
+        publish_seconds += seconds
+    for thread in threads:
+        thread.join()
+    for subscription in subscriptions:
+        subscription.close()
+    return publish_seconds, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="変更フィードのベンチマーク")
+    parser.add_argument("--size", type=int, default=1_000)
+    parser.add_argument("--changes", type=int, default=1_000)
+    args = parser.parse_args()
+
+    app_module.equipment_repository = create_repository(generate_equipment(args.size))
+    app_module.equipment_repository.add_listener(app_module.publish_equipment_change)
+    client = app_module.app.test_client()
+
+    poll_bytes = sum(len(client.get(url).data) for url in POLL_URLS)
+    subscription = app_module.change_feed.subscribe()
+    version = app_module.equipment_repository.version
+    _, seconds = timed(change_statuses, client, args.changes)
+    print(f"■ 設備 {args.size:,}台 / 状態変更 {args.changes:,}件")
+    print_row("PUT /api/equipment/<id>/status（配信を含む）", args.changes, seconds)
+    # 同じ状態への変更は配信しない
+    changed = app_module.equipment_repository.version - version
+    events = subscription.wait(0)
+    subscription.close()
+    if len(events) != changed:
+        raise SystemExit(f"配信された変更が {len(events)}件です（{changed}件）")
+    stream_bytes = sum(len(event.encoded) for event in events) / len(events)
+    print(f"  定期取得（{len(POLL_URLS)}件）   {poll_bytes / 1024:>8.1f}KB/回")
+    print(f"  変更フィード          {stream_bytes / 1024:>8.1f}KB/変更")
+
+    print(f"■ ChangeFeed（変更 {args.changes:,}件）")
+    for subscribers in (1, 10, 100):
+        publish_seconds, delivery_seconds = fan_out(subscribers, args.changes)
+        print_row(f"publish（購読者 {subscribers:>3}）", args.changes, publish_seconds)
+        print(f"    全購読者への配信完了 {delivery_seconds:.3f}秒")
+
+    feed = ChangeFeed(capacity=10)
+    lagging = feed.subscribe()
+    for index in range(100):
+        feed.publish('equipment', {'id': index})
+    reset = [event.type for event in lagging.wait(0)] == [RESET_EVENT]
+    lagging.close()
+    print(f"■ 送信の遅い購読者（容量 10 に対し 100件遅延）: reset {'OK' if reset else 'NG'}")
+    if not reset:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+レスポンス圧縮のベンチマーク
+
+設備数を増やした app.py の一覧と、1分間隔1日分のセンサーデータについて、
+Accept-Encoding なし・gzip・br（brotli がインストールされている場合）のレスポンスの大きさと、
+指定した回線速度での転送時間の目安を比較する。
+あわせて一覧を繰り返し取得し、圧縮結果をキャッシュした場合と要求ごとにエンコード・圧縮した場合の
+1秒あたりのリクエスト数を比較し、展開した本文が無圧縮の本文と一致することを検証する。
+
+使用方法:
+    python backend/benchmarks/bench_compression.py [--size 1000] [--requests 500] [--link-mbps 2]
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import tempfile
+
+from bench_utils import print_row, timed
+from bench_equipment_repository import generate_equipment
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import app as app_module
+from equipment_repository import create_repository
+from http_cache import ENCODINGS, ResponseCache, brotli
+from timeseries_store import TimeSeriesStore, generate_readings, parse_timestamp
+
+URLS = ('/api/equipment', '/api/sensor-data/1?from=2024-06-23&to=2024-06-24')
+SENSOR_DATA_END = parse_timestamp('2024-06-24')
+
+
+def decompress(body, encoding):
+    if encoding == 'gzip':
+        return gzip.decompress(body)
+    if encoding == 'br':
+        return brotli.decompress(body)
+    return body
+
+
+def without_timestamp(body):
+    payload = json.loads(body)
+    payload.pop('timestamp', None)
+    return payload
+
+
+def fetch(client, url, encoding):
+    headers = {'Accept-Encoding': encoding} if encoding else {}
+    response = client.get(url, headers=headers)
+    return response.headers.get('Content-Encoding'), response.data
+
+
+def repeat(client, url, encoding, count):
+    for _ in range(count):
+        _, body = fetch(client, url, encoding)
+    return body
+
+
+def main():
+    parser = argparse.ArgumentParser(description="レスポンス圧縮のベンチマーク")
+    parser.add_argument("--size", type=int, default=1_000)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--link-mbps", type=float, default=2.0, help="転送時間の目安に使う回線速度（Mbps）")
+    args = parser.parse_args()
+
+    app_module.equipment_repository = create_repository(generate_equipment(args.size))
+    client = app_module.app.test_client()
+    mismatched = False
+
+    with tempfile.TemporaryDirectory() as root:
+        app_module.sensor_store = TimeSeriesStore(root)
+        generate_readings(app_module.sensor_store, ['1'], 1, 60, end=SENSOR_DATA_END)
+
+        print(f"■ レスポンスの大きさ（設備 {args.size:,}台 / 回線 {args.link_mbps:g}Mbps での転送時間）")
+        for url in URLS:
+            _, plain = fetch(client, url, None)
+            print(f"  {url}")
+            for encoding in (None,) + ENCODINGS:
+                content_encoding, body = fetch(client, url, encoding)
+                identical = without_timestamp(decompress(body, content_encoding)) == without_timestamp(plain)
+                mismatched = mismatched or content_encoding != encoding or not identical
+                seconds = len(body) * 8 / (args.link_mbps * 1_000_000)
+                print(f"    {encoding or '無圧縮':<8} {len(body) / 1024:>8.1f}KB  {seconds * 1000:>7.1f}ms"
+                      f"  （{len(plain) / len(body):.1f}倍）  本文一致: {'OK' if identical else 'NG'}")
+
+    url = URLS[0]
+    print(f"■ {url} / 各 {args.requests:,}リクエスト")
+    for encoding in ENCODINGS:
+        app_module.response_cache = ResponseCache(max_bytes=0)
+        _, seconds = timed(repeat, client, url, encoding, args.requests)
+        print_row(f"{encoding} キャッシュなし（要求ごとにエンコード・圧縮）", args.requests, seconds)
+        app_module.response_cache = ResponseCache()
+        _, seconds = timed(repeat, client, url, encoding, args.requests)
+        print_row(f"{encoding} 圧縮結果をキャッシュ", args.requests, seconds)
+
+    if mismatched:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+条件付き GET（ETag / If-None-Match）のベンチマーク
+
+設備数を増やした app.py に対し、ダッシュボードの定期取得と同じリクエストを
+If-None-Match なし（毎回 200 とペイロード全体）と、前回の ETag 付き（304）で送り、
+1秒あたりのリクエスト数と転送量を比較する。
+
+使用方法:
+    python backend/benchmarks/bench_conditional_get.py [--size 1000] [--requests 500]
+"""
+
+import argparse
+import os
+import sys
+
+from bench_utils import print_row, timed
+from bench_equipment_repository import generate_equipment
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import app as app_module
+from equipment_repository import create_repository
+
+URLS = ('/api/equipment', '/api/equipment/summary', '/api/alerts')
+
+
+def poll(client, url, count, etag=None):
+    headers = {'If-None-Match': etag} if etag else {}
+    transferred = 0
+    for _ in range(count):
+        response = client.get(url, headers=headers)
+        transferred += len(response.data)
+    return response.status_code, transferred
+
+
+def main():
+    parser = argparse.ArgumentParser(description="条件付き GET のベンチマーク")
+    parser.add_argument("--size", type=int, default=1_000)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    app_module.equipment_repository = create_repository(generate_equipment(args.size))
+    client = app_module.app.test_client()
+    print(f"■ 設備 {args.size:,}台 / 各 {args.requests:,}リクエスト")
+    for url in URLS:
+        etag = client.get(url).headers['ETag']
+        (status, transferred), seconds = timed(poll, client, url, args.requests)
+        print_row(f"{url} ({status})", args.requests, seconds)
+        print(f"    転送量 {transferred / args.requests / 1024:,.1f}KB/リクエスト")
+        (status, transferred), seconds = timed(poll, client, url, args.requests, etag)
+        print_row(f"{url} ({status})", args.requests, seconds)
+        if status != 304:
+            raise SystemExit(f"{url}: 304 になりません（{status}）")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+センサーデータのダウンサンプリングのベンチマーク
+
+1Hz のセンサーデータを指定日数分書き込み、maxPoints 指定の検索について
+元データを読んで集計する場合と、ロールアップ（1m / 1h / 1d）から集計する場合の
+処理時間・レスポンスの大きさを比較し、集計結果の一致も検証する。
+
+使用方法:
+    python backend/benchmarks/bench_downsampling.py [--days 30] [--max-points 1000]
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+
+from bench_utils import timed
+from bench_timeseries_store import START, write_readings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from downsampling import aggregate_rows, bucket_points
+from timeseries_store import SECONDS_PER_DAY, TIMESTAMP_COLUMN, TimeSeriesStore, format_timestamp
+
+
+def raw_sample(store, start, end, width):
+    """ロールアップを使わずに元データを読んで集計する"""
+    start = start // width * width
+    end = (end // width + 1) * width
+    data = store.query('1', start, math.nextafter(end, -math.inf))
+    points = bucket_points(
+        aggregate_rows(data[TIMESTAMP_COLUMN], [data[column] for column in store.columns], width), store.columns
+    )
+    for point in points:
+        point[TIMESTAMP_COLUMN] = format_timestamp(point[TIMESTAMP_COLUMN])
+    return points
+
+
+def close(expected, actual):
+    if len(expected) != len(actual):
+        return False
+    for left, right in zip(expected, actual):
+        for key, value in left.items():
+            other = right[key]
+            if isinstance(value, float) and other is not None:
+                if not math.isclose(value, other, rel_tol=1e-9, abs_tol=1e-9):
+                    return False
+            elif value != other:
+                return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ダウンサンプリングのベンチマーク")
+    parser.add_argument("--days", type=float, default=30)
+    parser.add_argument("--max-points", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        store = TimeSeriesStore(root)
+        rows, seconds = timed(write_readings, store, args.days)
+        print(f"■ 1Hz × {args.days:g}日 = {rows:,}行（書き込み {seconds:.1f}秒、ロールアップ更新を含む）")
+
+        mismatched = False
+        for days in (1, 7, args.days):
+            end = START + days * SECONDS_PER_DAY
+            raw_rows = store.count('1', START, end)
+            sample, sample_seconds = timed(store.sample, '1', START, end, args.max_points)
+            expected, raw_seconds = timed(raw_sample, store, START, end, sample['resolution'])
+            identical = close(expected, sample['sensorData'])
+            mismatched = mismatched or not identical
+            raw_bytes = len(json.dumps(store.points('1', START, end), ensure_ascii=False).encode('utf-8')) \
+                if raw_rows <= 1_000_000 else None
+            sample_bytes = len(json.dumps(sample['sensorData'], ensure_ascii=False).encode('utf-8'))
+            print(f"■ 期間 {days:g}日（{raw_rows:,}行）→ maxPoints={args.max_points:,}")
+            print(f"  元データから集計      {raw_seconds:>8.3f}秒")
+            print(f"  TimeSeriesStore.sample {sample_seconds:>8.3f}秒  {len(sample['sensorData']):,}点"
+                  f" / バケット幅 {sample['resolution']:g}秒 / 集計元 {sample['source']}")
+            print(f"  レスポンス            {sample_bytes / 1024:>8.1f}KB"
+                  + (f"（間引きなし {raw_bytes / 1024 / 1024:.1f}MB）" if raw_bytes is not None else ""))
+            print(f"    結果一致: {'OK' if identical else 'NG'}")
+
+    if mismatched:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+設備リポジトリのベンチマーク
+
+設備数を増やしたときの一覧（location / status 絞り込み）・詳細取得について、
+従来のリスト走査と EquipmentRepository（memory / sqlite）の処理時間を比較し、結果の一致も検証する。
+あわせてサマリー（ステータス別件数）を、ステータスごとの走査と差分集計済みの件数で比較する。
+最後に、状態を更新し続けるスレッドと並行して読み取り（詳細・絞り込み・サマリー）を行い、
+読み取りが更新途中の状態（件数の合計の不一致・条件に合わない設備）を見ないことを検証する。
+
+使用方法:
+    python backend/benchmarks/bench_equipment_repository.py [--size 10000] [--queries 2000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+
+from bench_utils import print_row, timed
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from equipment_repository import SUMMARY_STATUSES, create_repository
+
+TYPES = ['射出成形機', '組立ロボット', '検査装置', 'コンプレッサー']
+STATUSES = ['running', 'running', 'running', 'idle', 'maintenance', 'error']
+
+
+def generate_equipment(size, seed=42):
+    rng = random.Random(seed)
+    return [
+        {
+            'id': i,
+            'name': f"設備-{i}",
+            'type': rng.choice(TYPES),
+            'status': rng.choice(STATUSES),
+            'location': f"ライン {rng.randrange(50)}",
+            'temperature': rng.randint(30, 95),
+        }
+        for i in range(1, size + 1)
+    ]
+
+
+def scan_queries(equipment, queries):
+    results = []
+    for kind, value in queries:
+        if kind == 'id':
+            results.append(next((eq for eq in equipment if eq['id'] == value), None))
+        else:
+            location, status = value
+            results.append([eq for eq in equipment if eq['location'] == location and eq['status'] == status])
+    return results
+
+
+def repository_queries(repository, queries):
+    results = []
+    for kind, value in queries:
+        if kind == 'id':
+            results.append(repository.get(value))
+        else:
+            location, status = value
+            results.append(repository.list(location=location, status=status))
+    return results
+
+
+def scan_summary(equipment, repeat):
+    for _ in range(repeat):
+        summary = {'total': len(equipment)}
+        for status in ('running', 'idle', 'maintenance', 'error'):
+            summary[status] = len([eq for eq in equipment if eq['status'] == status])
+    return summary
+
+
+def repository_summary(repository, repeat):
+    for _ in range(repeat):
+        summary = repository.summary()
+    return summary
+
+
+def concurrent_reads(repository, queries, size, updates, readers=4):
+    """更新と並行して読み取り、(読み取り件数, 更新件数, 不整合の件数) を返す"""
+    done = threading.Event()
+    counts = [0] * readers
+    inconsistent = [0] * readers
+
+    def read(index):
+        while not done.is_set():
+            for kind, value in queries:
+                if kind == 'id':
+                    repository.get(value)
+                else:
+                    location, status = value
+                    found = repository.list(location=location, status=status)
+                    if any(eq['location'] != location or eq['status'] != status for eq in found):
+                        inconsistent[index] += 1
+                summary = repository.summary()
+                if summary['total'] != size or sum(summary[status] for status in SUMMARY_STATUSES) != size:
+                    inconsistent[index] += 1
+                counts[index] += 1
+
+    def write():
+        rng = random.Random(11)
+        for _ in range(updates):
+            repository.update_status(rng.randint(1, size), rng.choice(SUMMARY_STATUSES))
+        done.set()
+
+    threads = [threading.Thread(target=read, args=(index,)) for index in range(readers)]
+    writer = threading.Thread(target=write)
+    for thread in threads + [writer]:
+        thread.start()
+    for thread in threads + [writer]:
+        thread.join()
+    return sum(counts), updates, sum(inconsistent)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="設備リポジトリのベンチマーク")
+    parser.add_argument("--size", type=int, default=10_000)
+    parser.add_argument("--queries", type=int, default=2_000)
+    args = parser.parse_args()
+
+    equipment = generate_equipment(args.size)
+    rng = random.Random(7)
+    queries = [
+        ('id', rng.randint(1, args.size)) if rng.random() < 0.5
+        else ('filter', (f"ライン {rng.randrange(50)}", rng.choice(STATUSES)))
+        for _ in range(args.queries)
+    ]
+    print(f"■ 設備 {args.size:,}台 / {args.queries:,}リクエスト（詳細取得と location+status 絞り込みを半数ずつ）")
+
+    expected, seconds = timed(scan_queries, equipment, queries)
+    print_row("リスト走査", args.queries, seconds)
+
+    mismatched = False
+    for backend in ('memory', 'sqlite'):
+        repository = create_repository(equipment, backend=backend)
+        actual, seconds = timed(repository_queries, repository, queries)
+        identical = actual == expected
+        mismatched = mismatched or not identical
+        print_row(f"リポジトリ ({backend})", args.queries, seconds)
+        print(f"    結果一致: {'OK' if identical else 'NG'}")
+
+    print(f"■ サマリー {args.queries:,}リクエスト")
+    expected, seconds = timed(scan_summary, equipment, args.queries)
+    print_row("ステータスごとの走査", args.queries, seconds)
+    repository = create_repository(equipment)
+    actual, seconds = timed(repository_summary, repository, args.queries)
+    print_row("差分集計済みの件数", args.queries, seconds)
+    identical = actual == expected
+    mismatched = mismatched or not identical
+    print(f"    結果一致: {'OK' if identical else 'NG'}")
+
+    print(f"■ 更新と並行した読み取り（読み取り 4スレッド / 状態の更新 {args.queries:,}件）")
+    repository = create_repository(equipment)
+    (reads, updates, inconsistent), seconds = timed(concurrent_reads, repository, queries, args.size, args.queries)
+    print_row("読み取り（詳細・絞り込み + サマリー）", reads, seconds)
+    print_row("状態の更新", updates, seconds)
+    print(f"    不整合: {'なし' if not inconsistent else f'{inconsistent}件'}")
+    mismatched = mismatched or bool(inconsistent)
+
+    if mismatched:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+並列シャード集計のベンチマーク
+
+1か月分を想定した工場データで、逐次実行（aggregate）と
+aggregate_parallel のワーカー数 1〜N での処理時間を比較し、結果の一致も検証する。
+あわせて Function の main() が parallelWorkers の指定で aggregate_parallel を使うことを検証する。
+
+使用方法:
+    python backend/benchmarks/bench_parallel_aggregation.py [--size 1000000] [--devices 200] [--max-workers 8] [--chunk-size 50000]
+"""
+
+import argparse
+import json
+import os
+import random
+from datetime import datetime, timedelta, timezone
+
+import azure.functions as func
+
+from bench_utils import load_function_package, print_row, timed
+
+data_transformer = load_function_package('data-transformer')
+from data_transformer.aggregation import aggregate
+from data_transformer.parallel import DEFAULT_CHUNK_SIZE, aggregate_parallel
+
+TRANSFORM_TYPES = ['equipment_efficiency', 'hourly_aggregation', 'daily_summary']
+
+
+def generate_records(size, devices, seed=42):
+    """30日間に均等に分布するセンサーレコードを生成"""
+    rng = random.Random(seed)
+    start = datetime(2024, 6, 1, tzinfo=timezone.utc)
+    step = 30 * 24 * 3600 / size
+    records = []
+    for i in range(size):
+        temperature = round(rng.gauss(65, 8), 2)
+        records.append({
+            'deviceId': f"EQ-{rng.randrange(devices):04d}",
+            'timestamp': (start + timedelta(seconds=i * step)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'sensorData': {
+                'temperature': {'value': temperature, 'status': 'warning' if temperature > 80 else 'normal'},
+                'pressure': {'value': round(rng.uniform(40, 90), 2), 'status': 'normal'},
+                'vibration': {'value': round(rng.gauss(4, 1.5), 2), 'status': 'normal'},
+            },
+            'alerts': []
+        })
+    return records
+
+
+def check_function_parallel(records, workers, chunk_size):
+    """main() に parallelWorkers を指定すると aggregate_parallel で集計されるか（結果は逐次実行と一致するか）"""
+    calls = []
+    original = data_transformer.aggregate_parallel
+
+    def recording(*args, **kwargs):
+        calls.append(kwargs)
+        return original(*args, **kwargs)
+
+    def request(body):
+        return func.HttpRequest(method='POST', url='/api/data-transformer', body=json.dumps(body).encode())
+
+    body = {'transformTypes': TRANSFORM_TYPES, 'data': records}
+    data_transformer.aggregate_parallel = recording
+    try:
+        serial = json.loads(data_transformer.main(request(body)).get_body())
+        parallel = json.loads(data_transformer.main(request(dict(
+            body, parallelWorkers=workers, chunkSize=chunk_size
+        ))).get_body())
+    finally:
+        data_transformer.aggregate_parallel = original
+    for payload in (serial, parallel):
+        payload['results']['daily_summary'].pop('date', None)
+    used = [call.get('workers') for call in calls] == [workers]
+    return used and serial['results'] == parallel['results']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="並列シャード集計のベンチマーク")
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    records = generate_records(args.size, args.devices)
+    options = {'percentiles': [0.5, 0.95, 0.99]}
+    print(f"■ {args.size:,}件 / {args.devices}台 / {', '.join(TRANSFORM_TYPES)}")
+
+    expected, serial_time = timed(aggregate, records, TRANSFORM_TYPES, **options)
+    print_row("逐次実行", args.size, serial_time)
+
+    # 日別サマリーの日付は実行日になるため比較から除く
+    expected['daily_summary'].pop('date', None)
+    mismatched = False
+    for workers in range(1, args.max_workers + 1):
+        actual, seconds = timed(
+            aggregate_parallel, records, TRANSFORM_TYPES,
+            workers=workers, chunk_size=args.chunk_size, **options
+        )
+        actual['daily_summary'].pop('date', None)
+        identical = actual == expected
+        mismatched = mismatched or not identical
+        print_row(f"並列 {workers}ワーカー", args.size, seconds)
+        print(f"    結果一致: {'OK' if identical else 'NG'}  逐次比: {serial_time / seconds:.2f}x")
+
+    # Function 経由はリクエストボディの JSON を作るため件数を絞る
+    workers = max(args.max_workers, 2)
+    function_records = records[:min(args.size, 20_000)]
+    used = check_function_parallel(function_records, workers, max(len(function_records) // 8, 1))
+    print(f"■ main()（parallelWorkers={workers}）: 並列集計 {'OK' if used else 'NG'}")
+    mismatched = mismatched or not used
+
+    if mismatched:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+レスポンスのシリアライズキャッシュのベンチマーク
+
+app.py と simple_api.py のハンドラー（設備数を増やした共通のリポジトリ）に同じリクエストを繰り返し送り、
+ResponseCache を無効にした場合（毎回 json.dumps とエンコード）と有効にした場合の
+1秒あたりのリクエスト数を比較し、本文が一致することも検証する。
+
+使用方法:
+    python backend/benchmarks/bench_response_cache.py [--size 1000] [--requests 500]
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+
+from bench_utils import print_row, timed
+from bench_equipment_repository import generate_equipment
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import app as app_module
+import simple_api
+from equipment_repository import create_repository
+from http_cache import ResponseCache
+
+APP_URLS = ('/api/equipment', '/api/equipment?status=running', '/api/equipment/summary', '/api/alerts')
+SIMPLE_API_URLS = ('/api/equipment', '/api/equipment?status=running', '/api/equipment/summary', '/api/alerts')
+
+
+class BenchHandler(simple_api.APIHandler):
+    """ソケットを使わずに simple_api.py のハンドラーを呼び出す"""
+
+    def __init__(self, path):
+        self.path = path
+        self.headers = {}
+        self.wfile = io.BytesIO()
+        self.request_version = 'HTTP/1.1'
+
+    def send_response(self, code, message=None):
+        self.status = code
+
+    def send_header(self, keyword, value):
+        pass
+
+    def end_headers(self):
+        pass
+
+
+def app_requests(client, url, count):
+    for _ in range(count):
+        body = client.get(url).data
+    return body
+
+
+def simple_api_requests(url, count):
+    for _ in range(count):
+        handler = BenchHandler(url)
+        handler.do_GET()
+    return handler.wfile.getvalue()
+
+
+def without_timestamp(body):
+    payload = json.loads(body)
+    payload.pop('timestamp', None)
+    return payload
+
+
+def compare(label, count, run):
+    """キャッシュなし・ありで実行し、本文（timestamp 以外）が一致するか返す"""
+    app_module.response_cache = simple_api.response_cache = ResponseCache(max_bytes=0)
+    expected, seconds = timed(run)
+    print_row(f"{label} キャッシュなし", count, seconds)
+    app_module.response_cache = simple_api.response_cache = ResponseCache()
+    actual, seconds = timed(run)
+    print_row(f"{label} キャッシュあり", count, seconds)
+    return without_timestamp(expected) == without_timestamp(actual)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="レスポンスキャッシュのベンチマーク")
+    parser.add_argument("--size", type=int, default=1_000)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    app_module.equipment_repository = simple_api.equipment_repository = create_repository(generate_equipment(args.size))
+    client = app_module.app.test_client()
+    mismatched = False
+
+    print(f"■ app.py（設備 {args.size:,}台）/ 各 {args.requests:,}リクエスト")
+    for url in APP_URLS:
+        identical = compare(url, args.requests, lambda: app_requests(client, url, args.requests))
+        mismatched = mismatched or not identical
+        print(f"    結果一致: {'OK' if identical else 'NG'}")
+
+    print(f"■ simple_api.py（設備 {args.size:,}台）/ 各 {args.requests:,}リクエスト")
+    for url in SIMPLE_API_URLS:
+        identical = compare(url, args.requests, lambda: simple_api_requests(url, args.requests))
+        mismatched = mismatched or not identical
+        print(f"    結果一致: {'OK' if identical else 'NG'}")
+
+    if mismatched:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+ルーティングのベンチマーク
+
+simple_api.py の従来の do_GET（startswith / endswith / split の分岐）と同じ判定を行う関数と、
+router.Router.match で、ダッシュボードが送るパスの解決にかかる時間を比較し、
+解決結果（ハンドラーとパラメータ）が一致することも検証する。
+
+使用方法:
+    python backend/benchmarks/bench_router.py [--requests 200000]
+"""
+
+import argparse
+import os
+import sys
+
+from bench_utils import print_row, timed
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from router import API_ROUTES, InvalidParameter, RouteError, Router
+
+# /api/equipment/ は従来の分岐では 404 になっていた（Router では /api/equipment と同じ）ため比較しない
+PATHS = (
+    '/api/health', '/api/equipment', '/api/equipment/3', '/api/equipment/3/',
+    '/api/equipment/summary', '/api/alerts', '/api/sensor-data/7', '/api/equipment/abc', '/api/unknown',
+)
+NAMES = ('health', 'equipment_list', 'equipment_detail', 'equipment_summary', 'alerts', 'sensor_data')
+
+
+def legacy_route(path):
+    """従来の do_GET の分岐（ID の変換は各ハンドラーで行っていた）"""
+    def detail(equipment_id):
+        try:
+            return 'equipment_detail', {'equipment_id': int(equipment_id)}
+        except ValueError:
+            return 'invalid', {}
+
+    if path == '/api/health':
+        return 'health', {}
+    elif path == '/api/equipment':
+        return 'equipment_list', {}
+    elif path.startswith('/api/equipment/') and path.endswith('/'):
+        path = path.rstrip('/')
+        if path.startswith('/api/equipment/') and path != '/api/equipment':
+            equipment_id = path.split('/')[-1]
+            if equipment_id == 'summary':
+                return 'equipment_summary', {}
+            return detail(equipment_id)
+        return 'not_found', {}
+    elif path.startswith('/api/equipment/') and path != '/api/equipment':
+        equipment_id = path.split('/')[-1]
+        if equipment_id == 'summary':
+            return 'equipment_summary', {}
+        return detail(equipment_id)
+    elif path == '/api/alerts':
+        return 'alerts', {}
+    elif path.startswith('/api/sensor-data/'):
+        try:
+            return 'sensor_data', {'equipment_id': int(path.split('/')[-1])}
+        except ValueError:
+            return 'invalid', {}
+    return 'not_found', {}
+
+
+def router_route(router, path):
+    try:
+        return router.match('GET', path)
+    except InvalidParameter:
+        return 'invalid', {}
+    except RouteError:
+        return 'not_found', {}
+
+
+def resolve_all(route, count):
+    results = []
+    for index in range(count):
+        results.append(route(PATHS[index % len(PATHS)]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ルーティングのベンチマーク")
+    parser.add_argument("--requests", type=int, default=200_000)
+    args = parser.parse_args()
+
+    router = Router()
+    for name in NAMES:
+        router.add(*API_ROUTES[name], name)
+
+    print(f"■ {len(PATHS)}種類のパス / {args.requests:,}リクエスト")
+    expected, seconds = timed(resolve_all, legacy_route, args.requests)
+    print_row("従来の分岐", args.requests, seconds)
+    actual, seconds = timed(resolve_all, lambda path: router_route(router, path), args.requests)
+    print_row("Router.match", args.requests, seconds)
+    identical = expected == actual
+    print(f"    結果一致: {'OK' if identical else 'NG'}")
+    if not identical:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+simple_api.py の負荷試験
+
+simple_api.py を別プロセスで起動し、同時接続 10（目標）/ 100（上限）のクライアントから
+keep-alive でダッシュボードと同じ GET を繰り返し送り、レイテンシのパーセンタイル（p50 / p95 / p99）と
+1秒あたりのリクエスト数を測る。従来の HTTPServer（1リクエストずつ処理）と PooledHTTPServer を比較し、
+応答の遅いクライアント（リクエストの途中で送信を止める接続）が1つある場合も測る。
+
+使用方法:
+    python backend/benchmarks/bench_simple_api_load.py [--clients 10,100] [--requests 100]
+"""
+
+import argparse
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from bench_utils import print_row
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+URLS = ('/api/equipment', '/api/equipment/summary', '/api/alerts?status=active&limit=5', '/api/equipment/1')
+
+# 従来の HTTPServer は keep-alive に対応していない（HTTP/1.0 で1リクエストごとに切断する）
+SERVERS = {
+    'HTTPServer': (
+        "import simple_api, sys\n"
+        "from http.server import HTTPServer\n"
+        "class Handler(simple_api.APIHandler):\n"
+        "    protocol_version = 'HTTP/1.0'\n"
+        "    timeout = None\n"
+        "HTTPServer(('127.0.0.1', int(sys.argv[1])), Handler).serve_forever()\n"
+    ),
+    'PooledHTTPServer': (
+        "import simple_api, sys\n"
+        "simple_api.PooledHTTPServer(('127.0.0.1', int(sys.argv[1])), simple_api.APIHandler).serve_forever()\n"
+    ),
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(code, port, data_path):
+    env = dict(os.environ, SENSOR_DATA_PATH=data_path)
+    process = subprocess.Popen(
+        [sys.executable, '-c', code, str(port)], cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    for _ in range(100):
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/api/health')
+            connection.getresponse().read()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise SystemExit("サーバーが起動しません")
+
+
+def client(port, count, latencies, errors):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    for index in range(count):
+        start = time.perf_counter()
+        try:
+            connection.request('GET', URLS[index % len(URLS)])
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+        except OSError as e:
+            errors.append(type(e).__name__)
+            connection.close()
+            continue
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+
+
+def slow_client(port, seconds, stop):
+    """リクエストの途中で送信を止め、seconds 秒後に残りを送る接続"""
+    with socket.create_connection(('127.0.0.1', port)) as sock:
+        sock.sendall(b'GET /api/health HTTP/1.1\r\nHost: localhost\r\n')
+        stop.wait(seconds)
+        try:
+            sock.sendall(b'Connection: close\r\n\r\n')
+            sock.recv(65536)
+        except OSError:
+            pass
+
+
+def run_load(port, clients, requests, slow_seconds=None):
+    latencies = []
+    errors = []
+    stop = threading.Event()
+    slow = None
+    if slow_seconds is not None:
+        slow = threading.Thread(target=slow_client, args=(port, slow_seconds, stop))
+        slow.start()
+        time.sleep(0.1)
+    threads = [threading.Thread(target=client, args=(port, requests, latencies, errors)) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    stop.set()
+    if slow is not None:
+        slow.join()
+    return latencies, errors, seconds
+
+
+def print_latencies(label, latencies, errors, seconds):
+    print_row(label, len(latencies), seconds)
+    if len(latencies) >= 2:
+        p = statistics.quantiles(latencies, n=100, method='inclusive')
+        print(f"    p50 {p[49] * 1000:>8.1f}ms  p95 {p[94] * 1000:>8.1f}ms  p99 {p[98] * 1000:>8.1f}ms"
+              + (f"  エラー {len(errors)}件" if errors else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="simple_api.py の負荷試験")
+    parser.add_argument("--clients", default="10,100", help="同時接続数（カンマ区切り）")
+    parser.add_argument("--requests", type=int, default=100, help="クライアントあたりのリクエスト数")
+    parser.add_argument("--slow-seconds", type=float, default=1.0, help="遅いクライアントが送信を止める秒数")
+    parser.add_argument("--servers", default=','.join(SERVERS))
+    args = parser.parse_args()
+    client_counts = [int(value) for value in args.clients.split(',')]
+
+    with tempfile.TemporaryDirectory() as data_path:
+        for name in args.servers.split(','):
+            port = free_port()
+            process = start_server(SERVERS[name], port, data_path)
+            try:
+                print(f"■ {name}")
+                for clients in client_counts:
+                    print_latencies(f"同時接続 {clients:>3}", *run_load(port, clients, args.requests))
+                print_latencies(
+                    f"同時接続 {client_counts[0]:>3} + 遅いクライアント",
+                    *run_load(port, client_counts[0], args.requests, args.slow_seconds)
+                )
+            finally:
+                process.kill()
+                process.wait()
+
+
+if __name__ == '__main__':
+    main()
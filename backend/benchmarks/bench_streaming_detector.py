@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+ストリーミング異常検知のベンチマーク
+
+StreamingDetector.update() の1件あたりの処理速度を測り、検知結果も検証する。
+
+- 数値誤差: ノイズの多い値を長時間流した後に一定値が続いても、移動標準偏差が
+  バッファから計算した値と一致し、わずかな変化で急変アラートを出さない
+- 緩やかな上昇: 80℃から89℃へゆっくり上昇するコンプレッサーを傾向として検出する
+- 誤検知: 変化のないノイズだけの値では傾向アラートを出さない
+
+使用方法:
+    python backend/benchmarks/bench_streaming_detector.py [--size 100000] [--devices 1000]
+"""
+
+import argparse
+import random
+import statistics
+from datetime import datetime, timedelta, timezone
+
+from bench_utils import load_function_package, print_row, timed
+
+load_function_package('iot-data-processor')
+from iot_data_processor.streaming_detector import StreamingDetector
+
+START = datetime(2024, 6, 23, tzinfo=timezone.utc)
+
+
+def minutes(index):
+    return (START + timedelta(minutes=index)).isoformat()
+
+
+def feed(detector, device_id, temperatures, offset=0):
+    """1分間隔の温度を投入し、アラート種別ごとの件数を返す"""
+    counts = {}
+    for index, temperature in enumerate(temperatures):
+        for alert in detector.update(device_id, minutes(offset + index), {'temperature': temperature}):
+            counts[alert['type']] = counts.get(alert['type'], 0) + 1
+    return counts
+
+
+def check_precision(rng):
+    """ノイズの多い 5000件の後に 80.3℃ が続くウィンドウで、0.01℃ の変化を急変としない"""
+    detector = StreamingDetector()
+    noisy = [rng.gauss(80, 15) for _ in range(5000)]
+    feed(detector, 'EQ-1', noisy)
+    flat = [80.3] * (detector.window_size + 7)
+    feed(detector, 'EQ-1', flat, len(noisy))
+    stddev = detector.stats('EQ-1', 'temperature')['stddev']
+    counts = feed(detector, 'EQ-1', [80.31], len(noisy) + len(flat))
+    ok = abs(stddev - statistics.stdev(flat[:detector.window_size])) < 1e-9 and not counts
+    print(f"■ 数値誤差（ノイズ 5000件の後に一定値）: 移動標準偏差 {stddev:.3g}  "
+          f"0.01℃の変化 {counts or 'アラートなし'}  {'OK' if ok else 'NG'}")
+    return ok
+
+
+def check_slow_heating(rng):
+    """1時間 80℃ で安定した後、90分かけて 80℃ → 89℃ に上昇する"""
+    detector = StreamingDetector()
+    stable = [round(rng.gauss(80, 0.2), 2) for _ in range(60)]
+    heating = [round(80 + 9 * index / 90 + rng.gauss(0, 0.2), 2) for index in range(91)]
+    stable_counts = feed(detector, 'EQ-2', stable)
+    heating_counts = feed(detector, 'EQ-2', heating, len(stable))
+    ok = not stable_counts and heating_counts.get('temperature_trend', 0) > 0
+    print(f"■ 緩やかな上昇（80℃ → 89℃ / 90分）: 安定時 {stable_counts or 'アラートなし'}  "
+          f"上昇時 {heating_counts}  {'OK' if ok else 'NG'}")
+    return ok
+
+
+def check_stationary_noise(rng, size):
+    """変化のないノイズだけの値で傾向アラートを出さない"""
+    detector = StreamingDetector()
+    counts = feed(detector, 'EQ-3', [rng.gauss(80, 0.5) for _ in range(size)])
+    ok = 'temperature_trend' not in counts
+    print(f"■ 誤検知（80℃ ± 0.5 / {size:,}件）: {counts or 'アラートなし'}  {'OK' if ok else 'NG'}")
+    return ok
+
+
+def run(detector, readings):
+    alerts = 0
+    for device_id, timestamp, sensor_data in readings:
+        alerts += len(detector.update(device_id, timestamp, sensor_data))
+    return alerts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ストリーミング異常検知のベンチマーク")
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--devices", type=int, default=1_000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    readings = [
+        (f"EQ-{index % args.devices:04d}", minutes(index // args.devices), {
+            'temperature': rng.gauss(70, 5),
+            'pressure': rng.gauss(80, 4),
+            'vibration': rng.gauss(4, 1),
+        })
+        for index in range(args.size)
+    ]
+    alerts, seconds = timed(run, StreamingDetector(), readings)
+    print(f"■ {args.size:,}件 / {args.devices:,}台")
+    print_row("StreamingDetector.update", args.size, seconds)
+    print(f"    アラート {alerts:,}件")
+
+    results = [check_precision(rng), check_slow_heating(rng), check_stationary_noise(rng, 10_000)]
+    if not all(results):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
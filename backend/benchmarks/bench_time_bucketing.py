@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+タイムスタンプバケット化のベンチマーク
+
+hourly_aggregation の従来方式（datetime.fromisoformat + strftime）と
+TimestampBucketer のバケットキー生成速度を比較し、キーの一致も検証する。
+
+使用方法:
+    python backend/benchmarks/bench_time_bucketing.py [--size 1000000]
+"""
+
+import argparse
+import random
+from datetime import datetime, timedelta, timezone
+
+from bench_utils import load_function_package, print_row, timed
+
+load_function_package('data-transformer')
+from data_transformer.time_bucketing import TimestampBucketer
+
+
+def generate_timestamps(size, seed=42):
+    """1秒〜数秒間隔のタイムスタンプ（UTC 'Z' と JST オフセットを混在）を生成"""
+    rng = random.Random(seed)
+    jst = timezone(timedelta(hours=9))
+    current = datetime(2024, 6, 1, tzinfo=timezone.utc)
+    timestamps = []
+    for _ in range(size):
+        current += timedelta(seconds=rng.randint(1, 3))
+        if rng.random() < 0.5:
+            timestamps.append(current.strftime('%Y-%m-%dT%H:%M:%SZ'))
+        else:
+            timestamps.append(current.astimezone(jst).isoformat())
+    return timestamps
+
+
+def legacy_keys(timestamps):
+    return [
+        datetime.fromisoformat(ts.replace('Z', '+00:00')).strftime('%Y-%m-%d %H:00:00')
+        for ts in timestamps
+    ]
+
+
+def bucketer_keys(timestamps, width='1h', tz=None):
+    key = TimestampBucketer(width, tz).key
+    return [key(ts) for ts in timestamps]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="タイムスタンプバケット化のベンチマーク")
+    parser.add_argument("--size", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    timestamps = generate_timestamps(args.size)
+    print(f"■ {args.size:,}件")
+
+    expected, legacy_time = timed(legacy_keys, timestamps)
+    actual, bucketer_time = timed(bucketer_keys, timestamps)
+    print_row("従来方式 (1h)", args.size, legacy_time)
+    print_row("TimestampBucketer (1h)", args.size, bucketer_time)
+    print(f"  キー一致: {'OK' if expected == actual else 'NG'}  高速化倍率: {legacy_time / bucketer_time:.1f}x")
+
+    for width in ('1m', '15m', '1d'):
+        _, seconds = timed(bucketer_keys, timestamps, width, 'Asia/Tokyo')
+        print_row(f"Asia/Tokyo ({width})", args.size, seconds)
+
+    if expected != actual:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+時系列ストアのベンチマーク
+
+1Hz のセンサーデータを指定日数分書き込み、期間指定の検索について
+全行の走査と TimeSeriesStore（日付パーティション + 疎インデックスの二分探索）の
+処理時間を比較し、結果の一致も検証する。
+
+使用方法:
+    python backend/benchmarks/bench_timeseries_store.py [--days 7] [--queries 50]
+"""
+
+import argparse
+import array
+import os
+import random
+import sys
+import tempfile
+
+from bench_utils import print_row, timed
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from timeseries_store import SECONDS_PER_DAY, TIMESTAMP_COLUMN, TimeSeriesStore
+
+START = 1_717_200_000.0
+# 検索する期間の幅（秒）
+WIDTHS = (60, 3600, SECONDS_PER_DAY)
+
+
+def write_readings(store, days, chunk=SECONDS_PER_DAY):
+    rng = random.Random(42)
+    total = int(days * SECONDS_PER_DAY)
+    for offset in range(0, total, chunk):
+        timestamps = [START + i for i in range(offset, min(offset + chunk, total))]
+        store.append('1', timestamps, {
+            'temperature': [70 + rng.uniform(-5, 5) for _ in timestamps],
+            'pressure': [80 + rng.uniform(-3, 3) for _ in timestamps],
+            'vibration': [4 + rng.uniform(-0.5, 0.5) for _ in timestamps]
+        })
+    return total
+
+
+def scan_queries(columns, queries):
+    """全行を走査して期間内の行を抽出"""
+    results = []
+    timestamps = columns[TIMESTAMP_COLUMN]
+    for start, end in queries:
+        rows = [row for row, timestamp in enumerate(timestamps) if start <= timestamp <= end]
+        results.append({column: array.array('d', (values[row] for row in rows)) for column, values in columns.items()})
+    return results
+
+
+def store_queries(store, queries):
+    return [store.query('1', start, end) for start, end in queries]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="時系列ストアのベンチマーク")
+    parser.add_argument("--days", type=float, default=7)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        store = TimeSeriesStore(root)
+        rows, seconds = timed(write_readings, store, args.days)
+        print(f"■ 1Hz × {args.days:g}日 = {rows:,}行")
+        print_row("書き込み", rows, seconds)
+
+        columns = store.query('1', START, START + args.days * SECONDS_PER_DAY)
+        rng = random.Random(7)
+        mismatched = False
+        for width in WIDTHS:
+            queries = []
+            for _ in range(args.queries):
+                start = START + rng.uniform(0, max(args.days * SECONDS_PER_DAY - width, 0))
+                queries.append((start, start + width))
+            print(f"■ 期間 {width:,}秒の検索 × {args.queries:,}回")
+            expected, seconds = timed(scan_queries, columns, queries)
+            print_row("全行の走査（メモリ上）", args.queries, seconds)
+            actual, seconds = timed(store_queries, store, queries)
+            print_row("TimeSeriesStore", args.queries, seconds)
+            identical = actual == expected
+            mismatched = mismatched or not identical
+            print(f"    結果一致: {'OK' if identical else 'NG'}")
+
+    if mismatched:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""
+ベンチマーク共通ユーティリティ
+
+Azure Functions のフォルダ名はハイフンを含みパッケージとして import できないため、
+ファイルパスから直接読み込む。
+"""
+
+import importlib.util
+import os
+import sys
+import time
+
+FUNCTIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'functions')
+
+
+def load_function_package(folder_name):
+    """functions/<folder_name> をパッケージとして読み込む"""
+    module_name = folder_name.replace('-', '_')
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    path = os.path.join(FUNCTIONS_DIR, folder_name)
+    spec = importlib.util.spec_from_file_location(
+        module_name, os.path.join(path, '__init__.py'), submodule_search_locations=[path]
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def timed(func, *args, **kwargs):
+    """関数を実行し (結果, 経過秒) を返す"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def print_row(label, count, seconds):
+    """スループットを1行で表示"""
+    rate = count / seconds if seconds > 0 else float('inf')
+    print(f"  {label:<24} {count:>10,}件  {seconds:>8.3f}秒  {rate:>14,.0f}件/秒")
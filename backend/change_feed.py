@@ -0,0 +1,186 @@
+"""
+変更フィード（Server-Sent Events 配信用）
+
+ダッシュボードの定期取得の代わりに、設備の状態変化・新しいアラート・最新のセンサー値の
+差分だけを購読者へ送る。
+
+- 変更は1つの共有リングバッファ（容量 capacity）に連番付きで追加する。
+  SSE 形式へのエンコードも追加時に1回だけ行い、全購読者が同じバイト列を送る
+- 購読者は自分の読み取り位置（最後に受け取った連番）だけを持ち、購読者ごとのキューは持たない。
+  追加のコストは購読者数によらず一定
+- 送信の遅い購読者がいても追加側は待たない（バックプレッシャー）。
+  読み取り位置がリングバッファから外れた購読者には reset イベントを送り、
+  全体を取得し直させる
+- 再接続時は Last-Event-ID の続きから送る（リングバッファに残っている範囲）。
+  イベント ID は「フィードのインスタンス ID-連番」で、サーバー再起動前の ID には reset を送る
+
+環境変数:
+- CHANGE_FEED_CAPACITY: リングバッファに保持する変更の件数（既定 1000）
+- CHANGE_FEED_MAX_SUBSCRIBERS: 同時に購読できる数（既定 100）
+"""
+
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+DEFAULT_CAPACITY = int(os.environ.get('CHANGE_FEED_CAPACITY', 1000))
+DEFAULT_MAX_SUBSCRIBERS = int(os.environ.get('CHANGE_FEED_MAX_SUBSCRIBERS', 100))
+# 変更がない間に接続維持のコメント行を送る間隔（秒）
+HEARTBEAT_SECONDS = 15
+# クライアントの再接続までの待ち時間（ミリ秒、SSE の retry）
+RETRY_MILLISECONDS = 3000
+
+RESET_EVENT = 'reset'
+
+
+class TooManySubscribers(Exception):
+    """購読数が上限に達している"""
+
+
+class ChangeEvent:
+    """連番付きの変更（SSE 形式にエンコード済み）"""
+
+    __slots__ = ('id', 'type', 'data', 'encoded')
+
+    def __init__(self, instance, event_id, event_type, data):
+        self.id = event_id
+        self.type = event_type
+        self.data = data
+        self.encoded = (
+            f"id: {instance}-{event_id}\nevent: {event_type}\n"
+            f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+        ).encode('utf-8')
+
+
+def sse_comment(text):
+    return f": {text}\n\n".encode('utf-8')
+
+
+def sse_retry(milliseconds=RETRY_MILLISECONDS):
+    return f"retry: {milliseconds}\n\n".encode('utf-8')
+
+
+class ChangeFeed:
+    """全購読者で共有する変更のリングバッファ"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, max_subscribers=DEFAULT_MAX_SUBSCRIBERS):
+        self.capacity = capacity
+        self.max_subscribers = max_subscribers
+        self.subscribers = 0
+        self.instance = uuid.uuid4().hex[:8]
+        self._events = deque(maxlen=capacity)
+        self._last_id = 0
+        self._condition = threading.Condition()
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    def publish(self, event_type, data):
+        """変更を追加して待機中の購読者を起こす（購読者の送信は待たない）"""
+        with self._condition:
+            self._last_id += 1
+            event = ChangeEvent(self.instance, self._last_id, event_type, data)
+            self._events.append(event)
+            self._condition.notify_all()
+        return event
+
+    def subscribe(self, last_event_id=None, types=None):
+        """
+        購読を開始する
+
+        Args:
+            last_event_id: 再接続時の Last-Event-ID（None の場合は現在以降の変更のみ）
+            types: 受け取るイベント種別の集合（None の場合はすべて）
+        """
+        with self._condition:
+            if self.subscribers >= self.max_subscribers:
+                raise TooManySubscribers(f"購読数が上限（{self.max_subscribers}）に達しています")
+            self.subscribers += 1
+            cursor = self._last_id
+            reset = False
+            if last_event_id:
+                instance, _, sequence = str(last_event_id).rpartition('-')
+                if instance == self.instance and sequence.isdigit() and int(sequence) <= self._last_id:
+                    cursor = int(sequence)
+                else:
+                    # 再起動前（または不明）の ID からは続きを送れない
+                    reset = True
+        return Subscription(self, cursor, types, reset)
+
+    def _unsubscribe(self):
+        with self._condition:
+            self.subscribers -= 1
+
+    def _read(self, cursor, timeout):
+        """cursor より後の変更（なければ timeout 秒待つ）と、取りこぼしの有無を返す"""
+        with self._condition:
+            if self._last_id <= cursor:
+                self._condition.wait_for(lambda: self._last_id > cursor, timeout)
+            if self._last_id <= cursor:
+                return [], False
+            first_id = self._events[0].id
+            if cursor < first_id - 1:
+                return [], True
+            return list(itertools.islice(self._events, cursor - first_id + 1, None)), False
+
+
+class Subscription:
+    """1購読者の読み取り位置"""
+
+    def __init__(self, feed, cursor, types=None, reset=False):
+        self.feed = feed
+        self.cursor = cursor
+        self.types = types
+        self.closed = False
+        self._reset = reset
+
+    def wait(self, timeout=HEARTBEAT_SECONDS):
+        """
+        次の変更をまとめて返す（timeout 秒の間に変更がなければ空のリスト）
+
+        取りこぼした場合は reset イベントのみを返し、読み取り位置を最新に進める。
+        """
+        if self._reset:
+            self._reset = False
+            return [ChangeEvent(self.feed.instance, self.cursor, RESET_EVENT, {'reason': 'unknown-last-event-id'})]
+        events, lost = self.feed._read(self.cursor, timeout)
+        if lost:
+            self.cursor = self.feed.last_id
+            return [ChangeEvent(self.feed.instance, self.cursor, RESET_EVENT, {'reason': 'lagging'})]
+        if events:
+            self.cursor = events[-1].id
+        if self.types is not None:
+            events = [event for event in events if event.type in self.types]
+        return events
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.feed._unsubscribe()
+
+    def stream(self, heartbeat=HEARTBEAT_SECONDS):
+        """
+        SSE のバイト列を生成する（接続が切れて close されるまで続く）
+
+        購読しない種別の変更だけが続く場合も含め、heartbeat 秒の間に何も送っていなければ
+        接続維持のコメント行を送る（切断を書き込みの失敗で検知して close するため）。
+        """
+        try:
+            yield sse_retry()
+            sent_at = time.monotonic()
+            while True:
+                remaining = heartbeat - (time.monotonic() - sent_at)
+                events = self.wait(remaining) if remaining > 0 else []
+                if events:
+                    yield b''.join(event.encoded for event in events)
+                    sent_at = time.monotonic()
+                elif time.monotonic() - sent_at >= heartbeat:
+                    yield sse_comment('keepalive')
+                    sent_at = time.monotonic()
+        finally:
+            self.close()
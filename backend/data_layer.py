@@ -0,0 +1,137 @@
+"""
+共有データ層（app.py / simple_api.py 共通）
+
+設備（EquipmentRepository）とアラート（AlertLog）をプロセス内で1回だけ読み込み、
+両方のサーバーが同じデータ・同じ絞り込み規則でレスポンスを返す。
+
+- 読み取りは不変のスナップショットを参照するだけで、ロックもコピーも行わない
+- 更新はロック内で新しいスナップショットを作り、参照の代入（アトミック）で差し替える
+- スナップショット内の辞書は変更しない（更新は新しい辞書への置き換えで行う）
+
+標準ライブラリのみで動作する（simple_api.py からも利用するため）。
+"""
+
+import threading
+from datetime import datetime
+
+from equipment_repository import create_repository
+from sample_data import SAMPLE_ALERTS, SAMPLE_EQUIPMENT
+
+# アラート一覧の既定の件数
+DEFAULT_ALERT_LIMIT = 10
+# アラート一覧で status を指定しない場合に返す状態（all を指定すると絞り込まない）
+DEFAULT_ALERT_STATUS = 'active'
+
+
+def parse_alert_limit(value):
+    """アラート一覧の limit（未指定・無効な値は既定の件数）"""
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_ALERT_LIMIT
+    return limit if limit >= 0 else DEFAULT_ALERT_LIMIT
+
+
+class AlertSnapshot:
+    """ある時点のアラート（発生時刻の新しい順）とバージョン番号"""
+
+    __slots__ = ('version', 'alerts')
+
+    def __init__(self, version, alerts):
+        self.version = version
+        self.alerts = tuple(sorted(alerts, key=lambda alert: alert['timestamp'], reverse=True))
+
+
+class AlertLog:
+    """アラートの一覧・登録（登録のたびにスナップショットを差し替える）"""
+
+    def __init__(self, alerts=()):
+        self.snapshot = AlertSnapshot(1, [dict(alert) for alert in alerts])
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.snapshot.alerts)
+
+    @property
+    def version(self):
+        return self.snapshot.version
+
+    def list(self, severity=None, status=None, limit=DEFAULT_ALERT_LIMIT):
+        """条件に一致するアラート（新しい順に limit 件）"""
+        status = status or DEFAULT_ALERT_STATUS
+        alerts = self.snapshot.alerts
+        if severity:
+            alerts = [alert for alert in alerts if alert['severity'] == severity]
+        if status != 'all':
+            alerts = [alert for alert in alerts if alert['status'] == status]
+        return list(alerts[:limit])
+
+    def add(self, alerts, equipment_repository=None):
+        """
+        アラートを登録し、登録したアラートを返す
+
+        id を指定したアラート（iot-data-processor の AlertSuppressor が付ける、インシデントごとに
+        一定の id）は同じ id の既存アラートを置き換える（upsert）。id がなければ採番する。
+        timestamp / severity / status の既定値（置き換えの場合は既存の値）と、
+        設備が分かる場合は equipmentName を補う。
+        """
+        created = []
+        with self._lock:
+            snapshot = self.snapshot
+            by_id = {alert['id']: alert for alert in snapshot.alerts}
+            next_id = max((alert_id for alert_id in by_id if isinstance(alert_id, int)), default=0) + 1
+            for alert in alerts:
+                alert = dict(alert)
+                if alert.get('id') is None:
+                    alert['id'] = next_id
+                    next_id += 1
+                existing = by_id.get(alert['id'], {})
+                alert.setdefault('timestamp', existing.get('timestamp', datetime.now().isoformat()))
+                alert.setdefault('severity', existing.get('severity', 'warning'))
+                alert.setdefault('status', existing.get('status', 'active'))
+                equipment_id = alert.get('equipmentId', alert.get('deviceId'))
+                equipment = None
+                if equipment_repository is not None and str(equipment_id).isdigit():
+                    equipment = equipment_repository.get(int(equipment_id))
+                if equipment is not None:
+                    alert['equipmentId'] = equipment['id']
+                    alert.setdefault('equipmentName', equipment['name'])
+                by_id[alert['id']] = alert
+                created.append(alert)
+            self.snapshot = AlertSnapshot(snapshot.version + 1, by_id.values())
+        return created
+
+
+def is_valid_alert(alert):
+    """登録するアラートとして有効か（message が必須、id は省略するか文字列・整数）"""
+    if not isinstance(alert, dict) or not alert.get('message'):
+        return False
+    alert_id = alert.get('id')
+    return alert_id is None or (isinstance(alert_id, (str, int)) and not isinstance(alert_id, bool))
+
+
+class DataLayer:
+    """設備とアラート"""
+
+    def __init__(self, equipment, alerts):
+        self.equipment = equipment
+        self.alerts = alerts
+
+
+def load_data_layer(equipment=SAMPLE_EQUIPMENT, alerts=SAMPLE_ALERTS, backend=None):
+    """設備・アラートを読み込んだデータ層を生成する"""
+    return DataLayer(create_repository(equipment, backend=backend), AlertLog(alerts))
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_data_layer():
+    """プロセス内で共有するデータ層（最初の呼び出しでサンプルデータを読み込む）"""
+    global _shared
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = load_data_layer()
+    return _shared
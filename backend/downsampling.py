@@ -0,0 +1,189 @@
+"""
+センサーデータのダウンサンプリング
+
+長い期間のセンサーデータをグラフで描画できる点数に間引く。
+
+- バケット集計（minmax）: 一定幅のバケットごとに平均・最小・最大を求める。
+  最小・最大を残すため、間引いてもピークが消えない
+- LTTB（Largest-Triangle-Three-Buckets）: 指定した列の波形の形状を保つ点を
+  元データから選ぶ（値は元の計測値のまま）
+
+集計値は列ごとに [件数, 最小, 最大, 合計] の統計量で扱い、
+時系列ストアのロールアップ（1m / 1h / 1d）と同じ形式で合成できる。
+"""
+
+import math
+
+METHODS = ('minmax', 'lttb')
+# resolution の単位
+RESOLUTION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# 統計量の並び（列ごと）
+STAT_COUNT, STAT_MIN, STAT_MAX, STAT_SUM = range(4)
+STAT_SIZE = 4
+
+
+class DownsampleError(ValueError):
+    """maxPoints / resolution / method の指定が無効"""
+
+
+def parse_resolution(value):
+    """'30s' / '5m' / '1h' / '1d' または秒数を秒に変換"""
+    text = str(value).strip().lower()
+    try:
+        if text and text[-1] in RESOLUTION_UNITS:
+            seconds = float(text[:-1]) * RESOLUTION_UNITS[text[-1]]
+        else:
+            seconds = float(text)
+    except ValueError:
+        raise DownsampleError(f"resolution の形式が無効です: {value}")
+    if not seconds > 0:
+        raise DownsampleError("resolution は正の値を指定してください")
+    return seconds
+
+
+def parse_downsample_params(max_points=None, resolution=None, method=None):
+    """クエリパラメータの maxPoints / resolution / method を検証して返す"""
+    if max_points:
+        try:
+            max_points = int(max_points)
+        except ValueError:
+            raise DownsampleError(f"maxPoints の形式が無効です: {max_points}")
+        if max_points < 2:
+            raise DownsampleError("maxPoints は2以上を指定してください")
+    else:
+        max_points = None
+    resolution = parse_resolution(resolution) if resolution else None
+    method = method or 'minmax'
+    if method not in METHODS:
+        raise DownsampleError(f"未対応の method です: {method}（{' / '.join(METHODS)}）")
+    if method == 'lttb' and (max_points is None or resolution is not None):
+        raise DownsampleError("method=lttb は resolution ではなく maxPoints で点数を指定してください")
+    return max_points, resolution, method
+
+
+def empty_stats(column_count):
+    return [0.0, 0.0, 0.0, 0.0] * column_count
+
+
+def add_value(stats, offset, value):
+    """統計量に1件の値を加える（NaN は無視）"""
+    if value != value:  # NaN（集計の内側のループのため math.isnan の呼び出しを避ける）
+        return
+    if stats[offset + STAT_COUNT]:
+        if value < stats[offset + STAT_MIN]:
+            stats[offset + STAT_MIN] = value
+        if value > stats[offset + STAT_MAX]:
+            stats[offset + STAT_MAX] = value
+    else:
+        stats[offset + STAT_MIN] = stats[offset + STAT_MAX] = value
+    stats[offset + STAT_COUNT] += 1
+    stats[offset + STAT_SUM] += value
+
+
+def merge_stats(target, source):
+    """統計量を合成する（target を更新）"""
+    for offset in range(0, len(source), STAT_SIZE):
+        count = source[offset + STAT_COUNT]
+        if not count:
+            continue
+        if target[offset + STAT_COUNT]:
+            target[offset + STAT_MIN] = min(target[offset + STAT_MIN], source[offset + STAT_MIN])
+            target[offset + STAT_MAX] = max(target[offset + STAT_MAX], source[offset + STAT_MAX])
+        else:
+            target[offset + STAT_MIN] = source[offset + STAT_MIN]
+            target[offset + STAT_MAX] = source[offset + STAT_MAX]
+        target[offset + STAT_COUNT] += count
+        target[offset + STAT_SUM] += source[offset + STAT_SUM]
+
+
+def aggregate_rows(timestamps, columns, bucket_seconds):
+    """
+    行データをバケットごとの統計量に集計する
+
+    Args:
+        timestamps: 時刻（UNIX 秒、昇順）
+        columns: 列ごとの値の配列のリスト
+        bucket_seconds: バケット幅（バケットの開始時刻は UNIX 秒の倍数）
+
+    Returns:
+        {バケット開始時刻: 統計量}（挿入順 = 時刻順）
+    """
+    buckets = {}
+    column_count = len(columns)
+    for row, timestamp in enumerate(timestamps):
+        bucket = timestamp // bucket_seconds * bucket_seconds
+        stats = buckets.get(bucket)
+        if stats is None:
+            stats = buckets[bucket] = empty_stats(column_count)
+        for position, values in enumerate(columns):
+            add_value(stats, position * STAT_SIZE, values[row])
+    return buckets
+
+
+def merge_buckets(buckets, bucket_seconds):
+    """細かいバケットの統計量を bucket_seconds 幅のバケットに合成する"""
+    merged = {}
+    for timestamp, stats in buckets.items():
+        bucket = timestamp // bucket_seconds * bucket_seconds
+        if bucket in merged:
+            merge_stats(merged[bucket], stats)
+        else:
+            merged[bucket] = list(stats)
+    return merged
+
+
+def bucket_points(buckets, column_names):
+    """バケットの統計量を API レスポンスの点（平均・最小・最大）に変換する"""
+    points = []
+    for timestamp, stats in buckets.items():
+        point = {'timestamp': timestamp}
+        for position, column in enumerate(column_names):
+            offset = position * STAT_SIZE
+            count = stats[offset + STAT_COUNT]
+            point[column] = stats[offset + STAT_SUM] / count if count else None
+            point[f'{column}Min'] = stats[offset + STAT_MIN] if count else None
+            point[f'{column}Max'] = stats[offset + STAT_MAX] if count else None
+        points.append(point)
+    return points
+
+
+def lttb_indices(timestamps, values, threshold):
+    """
+    LTTB で残す行の位置を返す
+
+    前のバケットで選んだ点と次のバケットの平均点とで作る三角形の面積が
+    最大になる点を各バケットから1点ずつ選ぶ（先頭と末尾は必ず残す）。
+    values が NaN の行は対象外とする。
+    """
+    rows = [row for row, value in enumerate(values) if not math.isnan(value)]
+    if threshold >= len(rows):
+        return rows
+    if threshold < 3:
+        return [rows[0], rows[-1]][:threshold]
+    selected = [rows[0]]
+    every = (len(rows) - 2) / (threshold - 2)
+    previous = rows[0]
+    for bucket in range(threshold - 2):
+        start = int(bucket * every) + 1
+        stop = int((bucket + 1) * every) + 1
+        # 次のバケットの平均点（最後のバケットでは末尾の点）
+        next_stop = min(int((bucket + 2) * every) + 1, len(rows) - 1)
+        next_rows = rows[stop:next_stop] or rows[-1:]
+        average_x = math.fsum(timestamps[row] for row in next_rows) / len(next_rows)
+        average_y = math.fsum(values[row] for row in next_rows) / len(next_rows)
+        previous_x, previous_y = timestamps[previous], values[previous]
+        best_area = -1.0
+        best = rows[start]
+        for row in rows[start:stop]:
+            area = abs(
+                (previous_x - average_x) * (values[row] - previous_y)
+                - (previous_x - timestamps[row]) * (average_y - previous_y)
+            )
+            if area > best_area:
+                best_area = area
+                best = row
+        selected.append(best)
+        previous = best
+    selected.append(rows[-1])
+    return selected
@@ -0,0 +1,426 @@
+"""
+設備リポジトリ
+
+設備データへのアクセスを一元化し、主キー（id）と二次インデックス
+（location / status / type、SQL スキーマの IX_Equipment_* に対応）で検索する。
+一覧・詳細の取得はリストの線形走査ではなく、主キーは O(1)、
+条件検索は該当件数に比例するコストで行う。
+
+ストアは差し替え可能:
+- InMemoryEquipmentStore: 辞書によるインデックス（既定）
+- SqliteEquipmentStore: SQLite（ローカル検証用、ファイルまたは :memory:）
+
+環境変数:
+- EQUIPMENT_STORE: memory / sqlite（既定 memory）
+- EQUIPMENT_SQLITE_PATH: SQLite のファイルパス（既定 :memory:）
+
+ステータス別の件数（全体・location 別・type 別）は登録・更新・削除のたびに
+StatusCounters で差分更新し、サマリーは走査せずに O(1) で返す。
+
+メモリのストアと件数は不変のスナップショットとして保持し、更新時に差し替える。
+読み取り（取得・一覧・サマリー）はロックを取らず、更新と並行して行える。
+"""
+
+import json
+import os
+import sqlite3
+import threading
+
+# 二次インデックスを持つ項目（SQL スキーマの IX_Equipment_Type / Location / Status）
+INDEXED_FIELDS = ('location', 'status', 'type')
+# サマリーに常に含めるステータス
+SUMMARY_STATUSES = ('running', 'idle', 'maintenance', 'error')
+
+
+class InMemoryEquipmentStore:
+    """
+    主キーと二次インデックスを辞書で保持するストア（登録順を保持）
+
+    データは不変のスナップショット（主キーの辞書とインデックス）として保持する。
+    更新はロック内で変更部分だけをコピーした新しいスナップショットを作り、代入1回で差し替える。
+    読み取りは現在のスナップショットを参照するだけで、ロックを取らない
+    （返す設備の辞書はスナップショットと共有しているため、呼び出し側で変更しないこと）。
+    """
+
+    def __init__(self, indexed_fields=INDEXED_FIELDS):
+        self.indexed_fields = indexed_fields
+        # (id → 設備, 項目 → 値 → {id: None})（登録順を保つため dict を集合として使う）
+        self._snapshot = ({}, {field: {} for field in indexed_fields})
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._snapshot[0])
+
+    @staticmethod
+    def _bucket(indexes, copied, field, value):
+        """値の id 集合を変更用に取り出す（スナップショットと共有しないよう、更新ごとに1回だけコピーする）"""
+        ids = indexes[field].get(value)
+        if ids is None:
+            ids = indexes[field][value] = {}
+            copied.add((field, value))
+        elif (field, value) not in copied:
+            ids = indexes[field][value] = dict(ids)
+            copied.add((field, value))
+        return ids
+
+    def _index_add(self, indexes, copied, record):
+        for field in self.indexed_fields:
+            self._bucket(indexes, copied, field, record.get(field))[record['id']] = None
+
+    def _index_remove(self, indexes, copied, record):
+        for field in self.indexed_fields:
+            if record.get(field) not in indexes[field]:
+                continue
+            ids = self._bucket(indexes, copied, field, record.get(field))
+            ids.pop(record['id'], None)
+            if not ids:
+                del indexes[field][record.get(field)]
+
+    def _update(self, apply):
+        """スナップショットをコピーして apply(records, indexes, copied) で変更し、差し替える"""
+        with self._lock:
+            records, indexes = self._snapshot
+            records = dict(records)
+            indexes = {field: dict(values) for field, values in indexes.items()}
+            result = apply(records, indexes, set())
+            self._snapshot = (records, indexes)
+        return result
+
+    def get(self, equipment_id):
+        return self._snapshot[0].get(equipment_id)
+
+    def put(self, record):
+        """登録または更新（インデックスも更新する）"""
+        return self.put_many([record])[0]
+
+    def put_many(self, records):
+        """まとめて登録または更新（スナップショットの差し替えは1回）"""
+        records = [dict(record) for record in records]
+
+        def apply(current, indexes, copied):
+            for record in records:
+                previous = current.get(record['id'])
+                if previous is not None:
+                    self._index_remove(indexes, copied, previous)
+                current[record['id']] = record
+                self._index_add(indexes, copied, record)
+            return records
+
+        return self._update(apply)
+
+    def delete(self, equipment_id):
+        if equipment_id not in self._snapshot[0]:
+            return None
+
+        def apply(current, indexes, copied):
+            record = current.pop(equipment_id, None)
+            if record is not None:
+                self._index_remove(indexes, copied, record)
+            return record
+
+        return self._update(apply)
+
+    def find(self, **filters):
+        """インデックス項目の完全一致で検索（最も件数の少ないインデックスから絞り込む）"""
+        records, indexes = self._snapshot
+        filters = {field: value for field, value in filters.items() if value is not None}
+        if not filters:
+            return list(records.values())
+        candidates = []
+        for field, value in filters.items():
+            if field not in indexes:
+                raise ValueError(f"インデックスのない項目です: {field}")
+            ids = indexes[field].get(value)
+            if not ids:
+                return []
+            candidates.append(ids)
+        # 最小のインデックスの id を他のインデックスとの所属判定で絞り込む
+        candidates.sort(key=len)
+        ids = list(candidates[0])
+        for other in candidates[1:]:
+            ids = [equipment_id for equipment_id in ids if equipment_id in other]
+        return [records[equipment_id] for equipment_id in ids]
+
+    def count(self, **filters):
+        """件数（条件が1項目の場合はインデックスの大きさのみで求める）"""
+        records, indexes = self._snapshot
+        filters = {field: value for field, value in filters.items() if value is not None}
+        if not filters:
+            return len(records)
+        if len(filters) == 1:
+            (field, value), = filters.items()
+            if field not in indexes:
+                raise ValueError(f"インデックスのない項目です: {field}")
+            return len(indexes[field].get(value, ()))
+        return len(self.find(**filters))
+
+
+class SqliteEquipmentStore:
+    """SQLite によるストア（インデックス項目は列として持ち、設備データ全体は JSON で保存）"""
+
+    def __init__(self, path=':memory:', indexed_fields=INDEXED_FIELDS):
+        self.indexed_fields = indexed_fields
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        columns = ''.join(f', {field} TEXT' for field in indexed_fields)
+        with self._lock, self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS equipment ('
+                'seq INTEGER PRIMARY KEY AUTOINCREMENT, id INTEGER NOT NULL UNIQUE'
+                f'{columns}, data TEXT NOT NULL)'
+            )
+            for field in indexed_fields:
+                self._connection.execute(
+                    f'CREATE INDEX IF NOT EXISTS IX_equipment_{field} ON equipment({field})'
+                )
+
+    def __len__(self):
+        return self.count()
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._connection.execute(sql, params).fetchall()
+
+    def _where(self, filters):
+        filters = {field: value for field, value in filters.items() if value is not None}
+        for field in filters:
+            if field not in self.indexed_fields:
+                raise ValueError(f"インデックスのない項目です: {field}")
+        if not filters:
+            return '', ()
+        return ' WHERE ' + ' AND '.join(f'{field} = ?' for field in filters), tuple(filters.values())
+
+    def get(self, equipment_id):
+        rows = self._query('SELECT data FROM equipment WHERE id = ?', (equipment_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def put(self, record):
+        fields = ('id',) + self.indexed_fields + ('data',)
+        values = (record['id'],) + tuple(record.get(field) for field in self.indexed_fields) \
+            + (json.dumps(record, ensure_ascii=False),)
+        updates = ', '.join(f'{field} = excluded.{field}' for field in fields[1:])
+        with self._lock, self._connection:
+            self._connection.execute(
+                f'INSERT INTO equipment ({", ".join(fields)}) VALUES ({", ".join("?" * len(fields))}) '
+                f'ON CONFLICT(id) DO UPDATE SET {updates}',
+                values
+            )
+        return dict(record)
+
+    def put_many(self, records):
+        return [self.put(record) for record in records]
+
+    def delete(self, equipment_id):
+        record = self.get(equipment_id)
+        if record is not None:
+            with self._lock, self._connection:
+                self._connection.execute('DELETE FROM equipment WHERE id = ?', (equipment_id,))
+        return record
+
+    def find(self, **filters):
+        where, params = self._where(filters)
+        rows = self._query(f'SELECT data FROM equipment{where} ORDER BY seq', params)
+        return [json.loads(row[0]) for row in rows]
+
+    def count(self, **filters):
+        where, params = self._where(filters)
+        return self._query(f'SELECT COUNT(*) FROM equipment{where}', params)[0][0]
+
+
+class StatusCounters:
+    """
+    ステータス別の件数（全体・location 別・type 別）を差分で保持する
+
+    EquipmentRepository は copy() に差分を適用してから差し替えるため、
+    参照中のインスタンスが変更されることはない。
+    """
+
+    def __init__(self):
+        self._total = {}
+        self._by_location = {}
+        self._by_type = {}
+
+    def copy(self):
+        counters = StatusCounters()
+        counters._total = dict(self._total)
+        counters._by_location = {key: dict(counts) for key, counts in self._by_location.items()}
+        counters._by_type = {key: dict(counts) for key, counts in self._by_type.items()}
+        return counters
+
+    @staticmethod
+    def _adjust(counts, status, delta):
+        counts[status] = counts.get(status, 0) + delta
+        if not counts[status]:
+            del counts[status]
+
+    def _apply(self, record, delta):
+        status = record.get('status')
+        self._adjust(self._total, status, delta)
+        for breakdown, key in ((self._by_location, record.get('location')), (self._by_type, record.get('type'))):
+            counts = breakdown.setdefault(key, {})
+            self._adjust(counts, status, delta)
+            if not counts:
+                del breakdown[key]
+
+    def add(self, record):
+        self._apply(record, 1)
+
+    def remove(self, record):
+        self._apply(record, -1)
+
+    @staticmethod
+    def _summary(counts):
+        summary = {'total': sum(counts.values())}
+        for status in SUMMARY_STATUSES:
+            summary[status] = counts.get(status, 0)
+        return summary
+
+    def summary(self, location=None, equipment_type=None):
+        """
+        ステータス別の件数（total と SUMMARY_STATUSES の各件数）
+
+        location と equipment_type を両方指定した場合は個別の件数を持たないため、
+        EquipmentRepository.summary がインデックス検索で求める。
+        """
+        if location is not None:
+            counts = self._by_location.get(location, {})
+        elif equipment_type is not None:
+            counts = self._by_type.get(equipment_type, {})
+        else:
+            counts = self._total
+        return self._summary(counts)
+
+    def breakdown(self):
+        """location 別・type 別のサマリー"""
+        return {
+            'byLocation': {key: self._summary(counts) for key, counts in self._by_location.items()},
+            'byType': {key: self._summary(counts) for key, counts in self._by_type.items()}
+        }
+
+
+class EquipmentRepository:
+    """
+    設備データの取得・更新（API はこのクラスを経由してアクセスする）
+
+    更新は1つずつロック内で行い、ステータス別の件数も新しい StatusCounters に差し替える。
+    取得・サマリーはロックを取らない（メモリのストアではスナップショットの参照のみ）。
+    """
+
+    def __init__(self, store):
+        self.store = store
+        counters = StatusCounters()
+        # 既存データ（SQLite ファイルなど）の件数を初期化
+        for equipment in store.find():
+            counters.add(equipment)
+        self.counters = counters
+        # 登録・更新・削除のたびに増えるバージョン番号（ETag・キャッシュキーに使う）
+        self.version = 1
+        self._listeners = []
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.store)
+
+    def add_listener(self, listener):
+        """
+        登録・更新・削除の通知先を追加する
+
+        listener(previous, current) は変更の直後にロック内で呼ばれる（新規登録時の previous、
+        削除時の current は None）。変更の順序どおりに呼ばれるため、処理は短く保つこと。
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, previous, current):
+        for listener in self._listeners:
+            listener(previous, current)
+
+    def get(self, equipment_id):
+        """主キーで取得（存在しない場合は None）"""
+        return self.store.get(equipment_id)
+
+    def list(self, location=None, status=None, equipment_type=None):
+        """条件に一致する設備の一覧（未指定の条件は絞り込まない）"""
+        return self.store.find(location=location, status=status, type=equipment_type)
+
+    def count(self, location=None, status=None, equipment_type=None):
+        return self.store.count(location=location, status=status, type=equipment_type)
+
+    def summary(self, location=None, equipment_type=None, breakdown=False):
+        """ステータス別の件数（breakdown の場合は location 別・type 別も含める）"""
+        counters = self.counters
+        if location is not None and equipment_type is not None:
+            counts = {}
+            for equipment in self.list(location=location, equipment_type=equipment_type):
+                counts[equipment.get('status')] = counts.get(equipment.get('status'), 0) + 1
+            summary = StatusCounters._summary(counts)
+        else:
+            summary = counters.summary(location, equipment_type)
+        if breakdown:
+            summary.update(counters.breakdown())
+        return summary
+
+    def save(self, equipment):
+        """登録または更新（ステータス別の件数も差分で更新する）"""
+        return self.save_many([equipment])[0]
+
+    def save_many(self, equipment):
+        """まとめて登録または更新（ストア・件数の差し替えとバージョンの更新は1回）"""
+        with self._lock:
+            # 同じ id が複数ある場合は、直前の要素を変更前の値とする
+            latest = {}
+            previous = []
+            for item in equipment:
+                previous.append(latest[item['id']] if item['id'] in latest else self.store.get(item['id']))
+                latest[item['id']] = item
+            saved = self.store.put_many(equipment)
+            counters = self.counters.copy()
+            for before, after in zip(previous, saved):
+                if before is not None:
+                    counters.remove(before)
+                counters.add(after)
+            self.counters = counters
+            self.version += 1
+            for before, after in zip(previous, saved):
+                self._notify(before, after)
+        return saved
+
+    def update_status(self, equipment_id, status):
+        """ステータスを変更（存在しない場合は None）"""
+        with self._lock:
+            equipment = self.store.get(equipment_id)
+            if equipment is None:
+                return None
+            if equipment.get('status') == status:
+                # 変更がない場合はバージョンを進めない（キャッシュ・ETag を無効にしない）
+                return equipment
+            return self.save(dict(equipment, status=status))
+
+    def delete(self, equipment_id):
+        with self._lock:
+            equipment = self.store.delete(equipment_id)
+            if equipment is not None:
+                counters = self.counters.copy()
+                counters.remove(equipment)
+                self.counters = counters
+                self.version += 1
+                self._notify(equipment, None)
+        return equipment
+
+
+def create_store(backend=None, sqlite_path=None):
+    """環境変数 EQUIPMENT_STORE / EQUIPMENT_SQLITE_PATH に応じたストアを生成"""
+    backend = backend or os.environ.get('EQUIPMENT_STORE', 'memory')
+    if backend == 'memory':
+        return InMemoryEquipmentStore()
+    if backend == 'sqlite':
+        return SqliteEquipmentStore(sqlite_path or os.environ.get('EQUIPMENT_SQLITE_PATH', ':memory:'))
+    raise ValueError(f"未対応の設備ストアです: {backend}")
+
+
+def create_repository(seed=(), backend=None, sqlite_path=None):
+    """ストアを生成し、初期データを登録したリポジトリを返す"""
+    repository = EquipmentRepository(create_store(backend, sqlite_path))
+    seed = list(seed)
+    if seed:
+        repository.save_many(seed)
+    return repository
@@ -2,7 +2,20 @@ import azure.functions as func
 import logging
 import json
 from datetime import datetime, timedelta
+import io
 import os
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from .aggregation import PartialStateError, aggregate, aggregate_incremental
+from .parallel import DEFAULT_CHUNK_SIZE, aggregate_parallel
+from .sketches import merge_sensor_sketches
+from .time_bucketing import BUCKET_WIDTHS
+
+DEFAULT_PERCENTILES = [0.5, 0.95, 0.99]
+
+# 並列集計のワーカープロセス数（1 の場合は逐次実行）とタスクあたりのレコード数
+PARALLEL_WORKERS = int(os.environ.get('DATA_TRANSFORMER_WORKERS', '1'))
+PARALLEL_CHUNK_SIZE = int(os.environ.get('DATA_TRANSFORMER_CHUNK_SIZE', str(DEFAULT_CHUNK_SIZE)))
 
 def main(req: func.HttpRequest) -> func.HttpResponse:
     """
@@ -12,7 +25,7 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
 
     try:
         # リクエストからデータを取得
-        req_body = req.get_json()
+        req_body = parse_request_body(req)
         
         if not req_body:
             return func.HttpResponse(
@@ -21,28 +34,92 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
                 mimetype="application/json"
             )
 
-        # データの種類に応じて変換処理を実行
-        transform_type = req_body.get('transformType', 'default')
+        # 複数の変換種別を指定した場合は1回の走査でまとめて集計する
+        transform_types = req_body.get('transformTypes')
         raw_data = req_body.get('data', [])
+        options = {
+            'bucket_width': req_body.get('bucketWidth', '1h'),
+            'timezone': req_body.get('timezone'),
+            'percentiles': req_body.get('percentiles'),
+            'include_sketches': bool(req_body.get('includeSketches', False)),
+            # equipmentCount を推定値にしてデバイス数によらずメモリを一定にする
+            'approximate_counts': bool(req_body.get('approximateCounts', False))
+        }
+        if options['bucket_width'] not in BUCKET_WIDTHS:
+            return func.HttpResponse(
+                json.dumps({"error": f"bucketWidth は {', '.join(BUCKET_WIDTHS)} のいずれかを指定してください"}, ensure_ascii=False),
+                status_code=400,
+                mimetype="application/json"
+            )
+        if options['timezone'] and not is_valid_timezone(options['timezone']):
+            return func.HttpResponse(
+                json.dumps({"error": "timezone が無効です"}, ensure_ascii=False),
+                status_code=400,
+                mimetype="application/json"
+            )
+        parallel = {
+            'workers': req_body.get('parallelWorkers', PARALLEL_WORKERS),
+            'chunk_size': req_body.get('chunkSize', PARALLEL_CHUNK_SIZE)
+        }
+        if not all(isinstance(value, int) and value > 0 for value in parallel.values()):
+            return func.HttpResponse(
+                json.dumps({"error": "parallelWorkers / chunkSize は1以上の整数で指定してください"}, ensure_ascii=False),
+                status_code=400,
+                mimetype="application/json"
+            )
+        if options['percentiles'] and not all(
+            isinstance(q, (int, float)) and 0 <= q <= 1 for q in options['percentiles']
+        ):
+            return func.HttpResponse(
+                json.dumps({"error": "percentiles は0〜1の数値で指定してください"}, ensure_ascii=False),
+                status_code=400,
+                mimetype="application/json"
+            )
         
-        if transform_type == 'hourly_aggregation':
-            result = hourly_aggregation(raw_data)
-        elif transform_type == 'daily_summary':
-            result = daily_summary(raw_data)
-        elif transform_type == 'equipment_efficiency':
-            result = calculate_equipment_efficiency(raw_data)
+        # 保存済みの部分集計（baseStates）があれば新しいデータだけを追加で集計する
+        base_states = req_body.get('baseStates')
+        include_state = bool(req_body.get('includeState', False)) or bool(base_states)
+
+        if transform_types:
+            results, states = run_aggregation(raw_data, transform_types, options, base_states, include_state, parallel)
+            logging.info(f'データ変換が完了しました: {", ".join(transform_types)}')
+            response_data = {
+                "status": "success",
+                "transformTypes": transform_types,
+                "results": results,
+                "processedAt": datetime.now().isoformat(),
+                "recordCount": {
+                    transform_type: len(result) if isinstance(result, list) else 1
+                    for transform_type, result in results.items()
+                }
+            }
+            if include_state:
+                response_data["states"] = states
         else:
-            result = default_transformation(raw_data)
-        
-        logging.info(f'データ変換が完了しました: {transform_type}')
-        
-        response_data = {
-            "status": "success",
-            "transformType": transform_type,
-            "result": result,
-            "processedAt": datetime.now().isoformat(),
-            "recordCount": len(result) if isinstance(result, list) else 1
-        }
+            # データの種類に応じて変換処理を実行
+            transform_type = req_body.get('transformType', 'default')
+            states = None
+            if transform_type == 'merge_sketches':
+                # 別々の呼び出しで得た分位点スケッチを生データなしで統合
+                result = merge_sketches(raw_data, options['percentiles'] or DEFAULT_PERCENTILES)
+            else:
+                results, states = run_aggregation(
+                    raw_data, [transform_type], options,
+                    {transform_type: base_states} if base_states else None, include_state, parallel
+                )
+                result = results[transform_type]
+            
+            logging.info(f'データ変換が完了しました: {transform_type}')
+            
+            response_data = {
+                "status": "success",
+                "transformType": transform_type,
+                "result": result,
+                "processedAt": datetime.now().isoformat(),
+                "recordCount": len(result) if isinstance(result, list) else 1
+            }
+            if states:
+                response_data["state"] = states[transform_type]
 
         return func.HttpResponse(
             json.dumps(response_data, ensure_ascii=False),
@@ -50,6 +127,13 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             mimetype="application/json"
         )
 
+    except PartialStateError as e:
+        return func.HttpResponse(
+            json.dumps({"error": str(e)}, ensure_ascii=False),
+            status_code=400,
+            mimetype="application/json"
+        )
+
     except Exception as e:
         logging.error(f'データ変換中にエラーが発生しました: {str(e)}')
         return func.HttpResponse(
@@ -58,218 +142,71 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             mimetype="application/json"
         )
 
+def parse_request_body(req):
+    """
+    リクエストボディを解析
+
+    JSONとして解析できない場合は NDJSON（1行1レコード）として扱い、
+    変換種別はクエリパラメータ transformType（カンマ区切り）、
+    バケット幅・タイムゾーン・分位点は bucketWidth / timezone / percentiles から取得する。
+    レコードはジェネレータで1行ずつ集計に供給する。
+    """
+    try:
+        return req.get_json()
+    except ValueError:
+        return {
+            "transformTypes": req.params.get('transformType', 'default').split(','),
+            "bucketWidth": req.params.get('bucketWidth', '1h'),
+            "percentiles": [float(q) for q in req.params['percentiles'].split(',')] if req.params.get('percentiles') else None,
+            "timezone": req.params.get('timezone'),
+            "data": iter_ndjson(req.get_body())
+        }
+
+def is_valid_timezone(name):
+    """IANA タイムゾーン名として有効か判定"""
+    try:
+        ZoneInfo(name)
+        return True
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+
+def iter_ndjson(body):
+    """NDJSON を1行ずつ辞書に変換するジェネレータ"""
+    for line in io.BytesIO(body):
+        if line.strip():
+            yield json.loads(line)
+
+def run_aggregation(raw_data, transform_types, options, base_states, include_state, parallel):
+    """集計を実行し (結果, 部分集計) を返す（部分集計が不要な場合は None）"""
+    if not include_state:
+        if parallel['workers'] > 1:
+            return aggregate_parallel(
+                raw_data, transform_types,
+                workers=parallel['workers'], chunk_size=parallel['chunk_size'], **options
+            ), None
+        return aggregate(raw_data, transform_types, **options), None
+    return aggregate_incremental(raw_data, transform_types, base_states, **options)
+
+def merge_sketches(serialized_list, percentiles):
+    """シリアライズ済みスケッチ（結果の 'sketches'）を統合して分位点を返す"""
+    merged = merge_sensor_sketches(serialized_list)
+    return {
+        'percentiles': merged.percentiles(percentiles),
+        'sketches': merged.to_dict()
+    }
+
 def hourly_aggregation(data):
     """時間別集計処理"""
-    if not data:
-        return []
-    
-    # 時間別にデータをグループ化
-    hourly_groups = {}
-    
-    for record in data:
-        timestamp = record.get('timestamp', '')
-        if timestamp:
-            # 時間単位に丸める
-            dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-            hour_key = dt.strftime('%Y-%m-%d %H:00:00')
-            
-            if hour_key not in hourly_groups:
-                hourly_groups[hour_key] = {
-                    'timestamp': hour_key,
-                    'temperature_sum': 0,
-                    'pressure_sum': 0,
-                    'vibration_sum': 0,
-                    'count': 0,
-                    'equipment_ids': set()
-                }
-            
-            group = hourly_groups[hour_key]
-            sensor_data = record.get('sensorData', {})
-            
-            if 'temperature' in sensor_data:
-                group['temperature_sum'] += sensor_data['temperature'].get('value', 0)
-            if 'pressure' in sensor_data:
-                group['pressure_sum'] += sensor_data['pressure'].get('value', 0)
-            if 'vibration' in sensor_data:
-                group['vibration_sum'] += sensor_data['vibration'].get('value', 0)
-            
-            group['count'] += 1
-            if 'deviceId' in record:
-                group['equipment_ids'].add(record['deviceId'])
-    
-    # 平均値を計算
-    result = []
-    for hour_key, group in hourly_groups.items():
-        if group['count'] > 0:
-            result.append({
-                'timestamp': hour_key,
-                'averageTemperature': round(group['temperature_sum'] / group['count'], 2),
-                'averagePressure': round(group['pressure_sum'] / group['count'], 2),
-                'averageVibration': round(group['vibration_sum'] / group['count'], 2),
-                'equipmentCount': len(group['equipment_ids']),
-                'dataPointCount': group['count']
-            })
-    
-    return sorted(result, key=lambda x: x['timestamp'])
+    return aggregate(data, ['hourly_aggregation'])['hourly_aggregation']
 
 def daily_summary(data):
     """日別サマリー処理"""
-    if not data:
-        return {}
-    
-    # 日別統計を計算
-    daily_stats = {
-        'date': datetime.now().strftime('%Y-%m-%d'),
-        'totalRecords': len(data),
-        'equipmentCount': 0,
-        'averageTemperature': 0,
-        'averagePressure': 0,
-        'averageVibration': 0,
-        'maxTemperature': 0,
-        'minTemperature': float('inf'),
-        'alertCount': 0
-    }
-    
-    equipment_ids = set()
-    temp_sum = pressure_sum = vibration_sum = 0
-    temp_count = pressure_count = vibration_count = 0
-    
-    for record in data:
-        if 'deviceId' in record:
-            equipment_ids.add(record['deviceId'])
-        
-        sensor_data = record.get('sensorData', {})
-        
-        if 'temperature' in sensor_data:
-            temp = sensor_data['temperature'].get('value', 0)
-            temp_sum += temp
-            temp_count += 1
-            daily_stats['maxTemperature'] = max(daily_stats['maxTemperature'], temp)
-            daily_stats['minTemperature'] = min(daily_stats['minTemperature'], temp)
-        
-        if 'pressure' in sensor_data:
-            pressure_sum += sensor_data['pressure'].get('value', 0)
-            pressure_count += 1
-        
-        if 'vibration' in sensor_data:
-            vibration_sum += sensor_data['vibration'].get('value', 0)
-            vibration_count += 1
-        
-        # アラートカウント
-        if record.get('alerts'):
-            daily_stats['alertCount'] += len(record['alerts'])
-    
-    # 平均値を計算
-    daily_stats['equipmentCount'] = len(equipment_ids)
-    if temp_count > 0:
-        daily_stats['averageTemperature'] = round(temp_sum / temp_count, 2)
-    if pressure_count > 0:
-        daily_stats['averagePressure'] = round(pressure_sum / pressure_count, 2)
-    if vibration_count > 0:
-        daily_stats['averageVibration'] = round(vibration_sum / vibration_count, 2)
-    
-    if daily_stats['minTemperature'] == float('inf'):
-        daily_stats['minTemperature'] = 0
-    
-    return daily_stats
+    return aggregate(data, ['daily_summary'])['daily_summary']
 
 def calculate_equipment_efficiency(data):
     """設備効率計算"""
-    if not data:
-        return []
-    
-    equipment_stats = {}
-    
-    for record in data:
-        device_id = record.get('deviceId')
-        if not device_id:
-            continue
-        
-        if device_id not in equipment_stats:
-            equipment_stats[device_id] = {
-                'deviceId': device_id,
-                'totalDataPoints': 0,
-                'normalOperationTime': 0,
-                'warningTime': 0,
-                'errorTime': 0,
-                'averageTemperature': 0,
-                'averagePressure': 0,
-                'averageVibration': 0,
-                'temp_sum': 0,
-                'pressure_sum': 0,
-                'vibration_sum': 0,
-                'temp_count': 0,
-                'pressure_count': 0,
-                'vibration_count': 0
-            }
-        
-        stats = equipment_stats[device_id]
-        stats['totalDataPoints'] += 1
-        
-        # センサーデータの状態を確認
-        sensor_data = record.get('sensorData', {})
-        has_warning = False
-        has_error = False
-        
-        for sensor_type, sensor_info in sensor_data.items():
-            if isinstance(sensor_info, dict):
-                status = sensor_info.get('status', 'normal')
-                value = sensor_info.get('value', 0)
-                
-                if status == 'warning':
-                    has_warning = True
-                elif status == 'error':
-                    has_error = True
-                
-                # 平均値計算用の累積
-                if sensor_type == 'temperature':
-                    stats['temp_sum'] += value
-                    stats['temp_count'] += 1
-                elif sensor_type == 'pressure':
-                    stats['pressure_sum'] += value
-                    stats['pressure_count'] += 1
-                elif sensor_type == 'vibration':
-                    stats['vibration_sum'] += value
-                    stats['vibration_count'] += 1
-        
-        # 運転状態の分類
-        if has_error:
-            stats['errorTime'] += 1
-        elif has_warning:
-            stats['warningTime'] += 1
-        else:
-            stats['normalOperationTime'] += 1
-    
-    # 効率計算と平均値計算
-    result = []
-    for device_id, stats in equipment_stats.items():
-        if stats['totalDataPoints'] > 0:
-            efficiency = round((stats['normalOperationTime'] / stats['totalDataPoints']) * 100, 2)
-            
-            # 平均値計算
-            avg_temp = round(stats['temp_sum'] / stats['temp_count'], 2) if stats['temp_count'] > 0 else 0
-            avg_pressure = round(stats['pressure_sum'] / stats['pressure_count'], 2) if stats['pressure_count'] > 0 else 0
-            avg_vibration = round(stats['vibration_sum'] / stats['vibration_count'], 2) if stats['vibration_count'] > 0 else 0
-            
-            result.append({
-                'deviceId': device_id,
-                'efficiency': efficiency,
-                'totalDataPoints': stats['totalDataPoints'],
-                'normalOperationTime': stats['normalOperationTime'],
-                'warningTime': stats['warningTime'],
-                'errorTime': stats['errorTime'],
-                'averageTemperature': avg_temp,
-                'averagePressure': avg_pressure,
-                'averageVibration': avg_vibration
-            })
-    
-    return sorted(result, key=lambda x: x['efficiency'], reverse=True)
+    return aggregate(data, ['equipment_efficiency'])['equipment_efficiency']
 
 def default_transformation(data):
     """デフォルトの変換処理"""
-    return {
-        'transformationType': 'default',
-        'inputRecords': len(data),
-        'processedAt': datetime.now().isoformat(),
-        'summary': 'データの基本的な変換処理が完了しました'
-    }
\ No newline at end of file
+    return aggregate(data, ['default'])['default']
@@ -0,0 +1,476 @@
+"""
+単一走査の集計コア
+
+レコードのイテレータを1回だけ走査し、要求された複数の集計
+（時間別集計・日別サマリー・設備効率など）へ同時に供給する。
+入力はリストに限らずジェネレータも受け付けるため、大量データでも
+集計状態のぶんのメモリしか使用しない。
+
+各集計器は合計・件数・最小/最大・デバイス集合からなる部分集計（state）を
+JSON 形式で出力・再読込できる。時間ごとの部分集計を保存しておけば、
+直近24時間のような移動ウィンドウも新しいデータだけを追加して算出できる。
+
+equipmentCount は通常は正確な件数を返す。部分集計では大きなデバイス集合を
+HyperLogLog に圧縮して出力するため、それをマージした結果と、approximate_counts を
+指定した場合の結果は推定値になる。
+"""
+
+from datetime import datetime
+
+from .sketches import DeviceSet, SensorSketches
+from .time_bucketing import TimestampBucketer
+
+
+class PartialStateError(ValueError):
+    """部分集計の形式・条件が一致しない"""
+
+
+class PercentileMixin:
+    """分位点スケッチの生成と結果への付与"""
+
+    def _init_percentiles(self, percentiles, include_sketches):
+        self.percentiles = percentiles
+        self.include_sketches = include_sketches
+
+    def _new_sketches(self):
+        return SensorSketches() if self.percentiles or self.include_sketches else None
+
+    def _add_percentiles(self, entry, sketches):
+        if sketches is None:
+            return entry
+        if self.percentiles:
+            entry['percentiles'] = sketches.percentiles(self.percentiles)
+        if self.include_sketches:
+            entry['sketches'] = sketches.to_dict()
+        return entry
+
+    @staticmethod
+    def _merge_sketches(target, data):
+        """部分集計のスケッチを統合（スケッチ不要な集計では無視する）"""
+        if target is None:
+            return
+        if data is None:
+            raise PartialStateError("分位点スケッチを含まない部分集計とはマージできません")
+        target.merge(SensorSketches.from_dict(data))
+
+    @staticmethod
+    def _sketches_state(sketches):
+        return sketches.to_dict() if sketches is not None else None
+
+    @staticmethod
+    def _check_state_type(state, transform_type):
+        if state.get('type') != transform_type:
+            raise PartialStateError(f"部分集計の種別が一致しません: {state.get('type')}")
+
+
+class HourlyAggregator(PercentileMixin):
+    """時間別集計（バケット幅・タイムゾーンは変更可能）"""
+
+    OPTIONS = ('bucket_width', 'timezone', 'percentiles', 'include_sketches', 'approximate_counts')
+
+    def __init__(self, bucket_width='1h', timezone=None, percentiles=None, include_sketches=False,
+                 approximate_counts=False):
+        self.bucket_width = bucket_width
+        self.timezone = timezone
+        self.approximate_counts = approximate_counts
+        self.bucketer = TimestampBucketer(bucket_width, timezone)
+        self.groups = {}
+        self._init_percentiles(percentiles, include_sketches)
+
+    def _new_group(self):
+        return {
+            'temperature_sum': 0,
+            'pressure_sum': 0,
+            'vibration_sum': 0,
+            'count': 0,
+            'equipment_ids': DeviceSet(approximate=self.approximate_counts),
+            'sketches': self._new_sketches()
+        }
+
+    def add(self, record):
+        timestamp = record.get('timestamp', '')
+        if not timestamp:
+            return
+
+        # バケット単位に丸める
+        hour_key = self.bucketer.key(timestamp)
+
+        group = self.groups.get(hour_key)
+        if group is None:
+            group = self.groups[hour_key] = self._new_group()
+
+        sensor_data = record.get('sensorData', {})
+        if group['sketches'] is not None:
+            group['sketches'].add(sensor_data)
+        if 'temperature' in sensor_data:
+            group['temperature_sum'] += sensor_data['temperature'].get('value', 0)
+        if 'pressure' in sensor_data:
+            group['pressure_sum'] += sensor_data['pressure'].get('value', 0)
+        if 'vibration' in sensor_data:
+            group['vibration_sum'] += sensor_data['vibration'].get('value', 0)
+
+        group['count'] += 1
+        if 'deviceId' in record:
+            group['equipment_ids'].add(record['deviceId'])
+
+    def result(self):
+        # 平均値を計算
+        result = []
+        for hour_key, group in self.groups.items():
+            if group['count'] > 0:
+                result.append(self._add_percentiles({
+                    'timestamp': hour_key,
+                    'averageTemperature': round(group['temperature_sum'] / group['count'], 2),
+                    'averagePressure': round(group['pressure_sum'] / group['count'], 2),
+                    'averageVibration': round(group['vibration_sum'] / group['count'], 2),
+                    'equipmentCount': len(group['equipment_ids']),
+                    'dataPointCount': group['count']
+                }, group['sketches']))
+        return sorted(result, key=lambda x: x['timestamp'])
+
+    def to_state(self, exact_devices=False):
+        """部分集計（exact_devices=True の場合はデバイス集合を圧縮せずに出力する）"""
+        return {
+            'type': 'hourly_aggregation',
+            'bucketWidth': self.bucket_width,
+            'timezone': self.timezone,
+            'groups': {
+                hour_key: {
+                    'temperature_sum': group['temperature_sum'],
+                    'pressure_sum': group['pressure_sum'],
+                    'vibration_sum': group['vibration_sum'],
+                    'count': group['count'],
+                    'devices': group['equipment_ids'].to_dict(exact=exact_devices),
+                    'sketches': self._sketches_state(group['sketches'])
+                }
+                for hour_key, group in self.groups.items()
+            }
+        }
+
+    def merge_state(self, state):
+        self._check_state_type(state, 'hourly_aggregation')
+        if state.get('bucketWidth') != self.bucket_width or state.get('timezone') != self.timezone:
+            raise PartialStateError("バケット幅・タイムゾーンの異なる部分集計とはマージできません")
+        for hour_key, partial in state['groups'].items():
+            group = self.groups.get(hour_key)
+            if group is None:
+                group = self.groups[hour_key] = self._new_group()
+            group['temperature_sum'] += partial['temperature_sum']
+            group['pressure_sum'] += partial['pressure_sum']
+            group['vibration_sum'] += partial['vibration_sum']
+            group['count'] += partial['count']
+            group['equipment_ids'].merge(DeviceSet.from_dict(partial['devices']))
+            self._merge_sketches(group['sketches'], partial.get('sketches'))
+
+
+class DailySummaryAggregator(PercentileMixin):
+    """日別サマリー"""
+
+    OPTIONS = ('percentiles', 'include_sketches', 'approximate_counts')
+
+    def __init__(self, percentiles=None, include_sketches=False, approximate_counts=False):
+        self._init_percentiles(percentiles, include_sketches)
+        self.sketches = self._new_sketches()
+        self.total_records = 0
+        self.equipment_ids = DeviceSet(approximate=approximate_counts)
+        self.temp_sum = self.pressure_sum = self.vibration_sum = 0
+        self.temp_count = self.pressure_count = self.vibration_count = 0
+        self.max_temperature = 0
+        self.min_temperature = float('inf')
+        self.alert_count = 0
+
+    def add(self, record):
+        self.total_records += 1
+        if 'deviceId' in record:
+            self.equipment_ids.add(record['deviceId'])
+
+        sensor_data = record.get('sensorData', {})
+        if self.sketches is not None:
+            self.sketches.add(sensor_data)
+
+        if 'temperature' in sensor_data:
+            temp = sensor_data['temperature'].get('value', 0)
+            self.temp_sum += temp
+            self.temp_count += 1
+            self.max_temperature = max(self.max_temperature, temp)
+            self.min_temperature = min(self.min_temperature, temp)
+
+        if 'pressure' in sensor_data:
+            self.pressure_sum += sensor_data['pressure'].get('value', 0)
+            self.pressure_count += 1
+
+        if 'vibration' in sensor_data:
+            self.vibration_sum += sensor_data['vibration'].get('value', 0)
+            self.vibration_count += 1
+
+        # アラートカウント
+        if record.get('alerts'):
+            self.alert_count += len(record['alerts'])
+
+    def result(self):
+        if self.total_records == 0:
+            return {}
+
+        return self._add_percentiles({
+            'date': datetime.now().strftime('%Y-%m-%d'),
+            'totalRecords': self.total_records,
+            'equipmentCount': len(self.equipment_ids),
+            'averageTemperature': round(self.temp_sum / self.temp_count, 2) if self.temp_count > 0 else 0,
+            'averagePressure': round(self.pressure_sum / self.pressure_count, 2) if self.pressure_count > 0 else 0,
+            'averageVibration': round(self.vibration_sum / self.vibration_count, 2) if self.vibration_count > 0 else 0,
+            'maxTemperature': self.max_temperature,
+            'minTemperature': 0 if self.min_temperature == float('inf') else self.min_temperature,
+            'alertCount': self.alert_count
+        }, self.sketches)
+
+    def to_state(self, exact_devices=False):
+        """部分集計（exact_devices=True の場合はデバイス集合を圧縮せずに出力する）"""
+        return {
+            'type': 'daily_summary',
+            'totalRecords': self.total_records,
+            'devices': self.equipment_ids.to_dict(exact=exact_devices),
+            'temp_sum': self.temp_sum,
+            'pressure_sum': self.pressure_sum,
+            'vibration_sum': self.vibration_sum,
+            'temp_count': self.temp_count,
+            'pressure_count': self.pressure_count,
+            'vibration_count': self.vibration_count,
+            'maxTemperature': self.max_temperature,
+            'minTemperature': None if self.min_temperature == float('inf') else self.min_temperature,
+            'alertCount': self.alert_count,
+            'sketches': self._sketches_state(self.sketches)
+        }
+
+    def merge_state(self, state):
+        self._check_state_type(state, 'daily_summary')
+        self.total_records += state['totalRecords']
+        self.equipment_ids.merge(DeviceSet.from_dict(state['devices']))
+        self.temp_sum += state['temp_sum']
+        self.pressure_sum += state['pressure_sum']
+        self.vibration_sum += state['vibration_sum']
+        self.temp_count += state['temp_count']
+        self.pressure_count += state['pressure_count']
+        self.vibration_count += state['vibration_count']
+        self.max_temperature = max(self.max_temperature, state['maxTemperature'])
+        if state['minTemperature'] is not None:
+            self.min_temperature = min(self.min_temperature, state['minTemperature'])
+        self.alert_count += state['alertCount']
+        self._merge_sketches(self.sketches, state.get('sketches'))
+
+
+class EfficiencyAggregator(PercentileMixin):
+    """設備効率"""
+
+    OPTIONS = ('percentiles', 'include_sketches')
+    COUNTERS = (
+        'totalDataPoints', 'normalOperationTime', 'warningTime', 'errorTime',
+        'temp_sum', 'pressure_sum', 'vibration_sum',
+        'temp_count', 'pressure_count', 'vibration_count'
+    )
+
+    def __init__(self, percentiles=None, include_sketches=False):
+        self._init_percentiles(percentiles, include_sketches)
+        self.equipment_stats = {}
+
+    def _new_stats(self):
+        stats = dict.fromkeys(self.COUNTERS, 0)
+        stats['sketches'] = self._new_sketches()
+        return stats
+
+    def add(self, record):
+        device_id = record.get('deviceId')
+        if not device_id:
+            return
+
+        stats = self.equipment_stats.get(device_id)
+        if stats is None:
+            stats = self.equipment_stats[device_id] = self._new_stats()
+
+        stats['totalDataPoints'] += 1
+
+        # センサーデータの状態を確認
+        has_warning = False
+        has_error = False
+
+        sensor_data = record.get('sensorData', {})
+        if stats['sketches'] is not None:
+            stats['sketches'].add(sensor_data)
+
+        for sensor_type, sensor_info in sensor_data.items():
+            if isinstance(sensor_info, dict):
+                status = sensor_info.get('status', 'normal')
+                value = sensor_info.get('value', 0)
+
+                if status == 'warning':
+                    has_warning = True
+                elif status == 'error':
+                    has_error = True
+
+                # 平均値計算用の累積
+                if sensor_type == 'temperature':
+                    stats['temp_sum'] += value
+                    stats['temp_count'] += 1
+                elif sensor_type == 'pressure':
+                    stats['pressure_sum'] += value
+                    stats['pressure_count'] += 1
+                elif sensor_type == 'vibration':
+                    stats['vibration_sum'] += value
+                    stats['vibration_count'] += 1
+
+        # 運転状態の分類
+        if has_error:
+            stats['errorTime'] += 1
+        elif has_warning:
+            stats['warningTime'] += 1
+        else:
+            stats['normalOperationTime'] += 1
+
+    def result(self):
+        # 効率計算と平均値計算
+        result = []
+        for device_id, stats in self.equipment_stats.items():
+            if stats['totalDataPoints'] > 0:
+                efficiency = round((stats['normalOperationTime'] / stats['totalDataPoints']) * 100, 2)
+
+                avg_temp = round(stats['temp_sum'] / stats['temp_count'], 2) if stats['temp_count'] > 0 else 0
+                avg_pressure = round(stats['pressure_sum'] / stats['pressure_count'], 2) if stats['pressure_count'] > 0 else 0
+                avg_vibration = round(stats['vibration_sum'] / stats['vibration_count'], 2) if stats['vibration_count'] > 0 else 0
+
+                result.append(self._add_percentiles({
+                    'deviceId': device_id,
+                    'efficiency': efficiency,
+                    'totalDataPoints': stats['totalDataPoints'],
+                    'normalOperationTime': stats['normalOperationTime'],
+                    'warningTime': stats['warningTime'],
+                    'errorTime': stats['errorTime'],
+                    'averageTemperature': avg_temp,
+                    'averagePressure': avg_pressure,
+                    'averageVibration': avg_vibration
+                }, stats['sketches']))
+
+        return sorted(result, key=lambda x: x['efficiency'], reverse=True)
+
+    def to_state(self, exact_devices=False):
+        return {
+            'type': 'equipment_efficiency',
+            'devices': {
+                device_id: dict(
+                    {name: stats[name] for name in self.COUNTERS},
+                    sketches=self._sketches_state(stats['sketches'])
+                )
+                for device_id, stats in self.equipment_stats.items()
+            }
+        }
+
+    def merge_state(self, state):
+        self._check_state_type(state, 'equipment_efficiency')
+        for device_id, partial in state['devices'].items():
+            stats = self.equipment_stats.get(device_id)
+            if stats is None:
+                stats = self.equipment_stats[device_id] = self._new_stats()
+            for name in self.COUNTERS:
+                stats[name] += partial[name]
+            self._merge_sketches(stats['sketches'], partial.get('sketches'))
+
+
+class DefaultAggregator:
+    """デフォルトの変換処理（件数のみ）"""
+
+    OPTIONS = ()
+
+    def __init__(self):
+        self.count = 0
+
+    def add(self, record):
+        self.count += 1
+
+    def result(self):
+        return {
+            'transformationType': 'default',
+            'inputRecords': self.count,
+            'processedAt': datetime.now().isoformat(),
+            'summary': 'データの基本的な変換処理が完了しました'
+        }
+
+    def to_state(self, exact_devices=False):
+        return {'type': 'default', 'count': self.count}
+
+    def merge_state(self, state):
+        if state.get('type') != 'default':
+            raise PartialStateError(f"部分集計の種別が一致しません: {state.get('type')}")
+        self.count += state['count']
+
+
+AGGREGATORS = {
+    'hourly_aggregation': HourlyAggregator,
+    'daily_summary': DailySummaryAggregator,
+    'equipment_efficiency': EfficiencyAggregator,
+    'default': DefaultAggregator,
+}
+
+
+def create_aggregators(transform_types, **options):
+    """変換種別ごとの集計器を生成（未知の種別はデフォルト変換として扱う）"""
+    aggregators = {}
+    for transform_type in transform_types:
+        aggregator_class = AGGREGATORS.get(transform_type, DefaultAggregator)
+        kwargs = {name: options[name] for name in aggregator_class.OPTIONS if name in options}
+        aggregators[transform_type] = aggregator_class(**kwargs)
+    return aggregators
+
+
+def _feed(records, aggregators):
+    consumers = [aggregator.add for aggregator in aggregators.values()]
+    for record in records:
+        for add in consumers:
+            add(record)
+
+
+def aggregate(records, transform_types, **options):
+    """
+    レコードを1回だけ走査し、複数の集計を同時に計算する
+
+    Args:
+        records: レコードのイテラブル（リスト・ジェネレータ）
+        transform_types: 変換種別のリスト
+        options: 集計オプション
+            bucket_width: 時間別集計のバケット幅（1m / 5m / 15m / 1h / 1d）
+            timezone: 時間別集計のタイムゾーン（例: 'Asia/Tokyo'、省略時はタイムスタンプのオフセット）
+            percentiles: 算出する分位点のリスト（例: [0.5, 0.95, 0.99]）
+            include_sketches: マージ用の分位点スケッチを結果に含めるか
+            approximate_counts: equipmentCount を HyperLogLog で推定するか（デバイス数が多くてもメモリ一定）
+
+    Returns:
+        {変換種別: 集計結果}
+    """
+    aggregators = create_aggregators(transform_types, **options)
+    _feed(records, aggregators)
+    return {transform_type: aggregator.result() for transform_type, aggregator in aggregators.items()}
+
+
+def aggregate_incremental(records, transform_types, base_states=None, **options):
+    """
+    保存済みの部分集計に新しいレコードだけを追加して集計する
+
+    Args:
+        records: 追加するレコードのイテラブル
+        transform_types: 変換種別のリスト
+        base_states: {変換種別: 部分集計 または 部分集計のリスト}
+        options: aggregate() と同じ集計オプション
+
+    Returns:
+        ({変換種別: 集計結果}, {変換種別: 更新後の部分集計})
+    """
+    aggregators = create_aggregators(transform_types, **options)
+    for transform_type, states in (base_states or {}).items():
+        if transform_type not in aggregators:
+            continue
+        for state in states if isinstance(states, list) else [states]:
+            try:
+                aggregators[transform_type].merge_state(state)
+            except (KeyError, TypeError) as e:
+                raise PartialStateError(f"部分集計の形式が無効です: {e}")
+    _feed(records, aggregators)
+    results = {transform_type: aggregator.result() for transform_type, aggregator in aggregators.items()}
+    states = {transform_type: aggregator.to_state() for transform_type, aggregator in aggregators.items()}
+    return results, states
@@ -0,0 +1,155 @@
+"""
+並列シャード集計
+
+1か月分の工場データのような大量レコードを、プロセスプールで並列に集計する。
+レコードを集計グループのキー（設備効率は deviceId、時間別集計は時間バケット）で
+シャードに分け、各ワーカーが担当シャードの部分集計（state）を作成し、
+親プロセスが部分集計をマージして最終結果を得る。
+
+- 1つのグループのレコードは必ず同じシャードに入り、元の順序のまま集計されるため、
+  浮動小数点の加算順序も含めて逐次実行（aggregate()）と同一の結果になる
+- シャードはキーの初出順に chunk_size 件を目安にまとめ、初出順にマージするため
+  結果の並び順も逐次実行と一致する
+- グループが1つしかない集計（日別サマリー・デフォルト）はシャードに分けず、
+  親プロセスでの振り分けと同じ走査で集計する
+
+ワーカーは fork で起動し、振り分け済みのレコードは親プロセスのメモリを
+そのまま参照する（タスク一覧はプールの initargs として fork 時に引き継ぎ、
+レコードをシリアライズして送らず、タスク番号だけを渡す）。
+タスク一覧はプールごとに渡すため、同じプロセスでの同時呼び出しが互いに干渉しない。
+fork を使えないプラットフォームでは逐次実行する。
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from .aggregation import create_aggregators
+from .time_bucketing import TimestampBucketer
+
+DEFAULT_CHUNK_SIZE = 50000
+
+# ワーカープロセス内のタスク一覧（プールの initializer で設定する。親プロセスでは使わない）
+_worker_tasks = []
+
+
+def _shard_key_func(transform_type, options):
+    """シャード分割のキー関数（分割しない集計は None）"""
+    if transform_type == 'equipment_efficiency':
+        return lambda record: record.get('deviceId') or None
+
+    if transform_type == 'hourly_aggregation':
+        bucket_key = TimestampBucketer(options.get('bucket_width', '1h'), options.get('timezone')).key
+
+        def key(record):
+            timestamp = record.get('timestamp', '')
+            return bucket_key(timestamp) if timestamp else None
+        return key
+
+    return None
+
+
+def _pack_chunks(groups, chunk_size):
+    """キーの初出順にグループをまとめ、おおよそ chunk_size 件ずつのチャンクにする"""
+    chunks = []
+    current = []
+    for records in groups.values():
+        if current and len(current) + len(records) > chunk_size:
+            chunks.append(current)
+            current = []
+        current.extend(records)
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _aggregate_chunk(task):
+    """1チャンク分の部分集計を返す"""
+    transform_type, records, options = task
+    aggregator = create_aggregators([transform_type], **options)[transform_type]
+    for record in records:
+        aggregator.add(record)
+    # 親プロセスでのマージ用のため、デバイス集合は圧縮せず正確な件数を保つ
+    return aggregator.to_state(exact_devices=True)
+
+
+def _init_worker(tasks):
+    """ワーカーの初期化: fork 時に引き継いだタスク一覧を保持する"""
+    global _worker_tasks
+    _worker_tasks = tasks
+
+
+def _aggregate_task(index):
+    """ワーカー: タスク一覧から1件を集計する"""
+    return _aggregate_chunk(_worker_tasks[index])
+
+
+def _fork_context():
+    try:
+        return multiprocessing.get_context('fork')
+    except ValueError:
+        return None
+
+
+def aggregate_parallel(records, transform_types, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, **options):
+    """
+    レコードをシャードに分けてプロセスプールで並列に集計する
+
+    Args:
+        records: レコードのイテラブル（リスト・ジェネレータ）
+        transform_types: 変換種別のリスト
+        workers: ワーカープロセス数（省略時は CPU コア数）
+        chunk_size: 1タスクあたりのレコード数の目安
+        options: aggregate() と同じ集計オプション
+
+    Returns:
+        {変換種別: 集計結果}（aggregate() と同一）
+    """
+    workers = workers or os.cpu_count() or 1
+    aggregators = create_aggregators(transform_types, **options)
+
+    key_funcs = {}
+    serial = []
+    for transform_type, aggregator in aggregators.items():
+        key_func = _shard_key_func(transform_type, options)
+        if key_func is None:
+            serial.append(aggregator.add)
+        else:
+            key_funcs[transform_type] = key_func
+
+    # 1回の走査でシャードへの振り分けと分割しない集計を行う
+    groups = {transform_type: {} for transform_type in key_funcs}
+    shard_keys = list(key_funcs.items())
+    for record in records:
+        for add in serial:
+            add(record)
+        for transform_type, key_func in shard_keys:
+            key = key_func(record)
+            if key is None:
+                continue
+            group = groups[transform_type].get(key)
+            if group is None:
+                group = groups[transform_type][key] = []
+            group.append(record)
+
+    tasks = [
+        (transform_type, chunk, options)
+        for transform_type, type_groups in groups.items()
+        for chunk in _pack_chunks(type_groups, chunk_size)
+    ]
+
+    context = _fork_context() if workers > 1 and len(tasks) > 1 else None
+    if context is not None:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(tasks)), mp_context=context,
+            initializer=_init_worker, initargs=(tasks,)
+        ) as executor:
+            states = list(executor.map(_aggregate_task, range(len(tasks))))
+    else:
+        states = [_aggregate_chunk(task) for task in tasks]
+
+    # タスクの順（＝キーの初出順）にマージする
+    for (transform_type, _, _), state in zip(tasks, states):
+        aggregators[transform_type].merge_state(state)
+
+    return {transform_type: aggregator.result() for transform_type, aggregator in aggregators.items()}
@@ -0,0 +1,337 @@
+"""
+分位点スケッチ
+
+生データを保持・ソートせずに p95 / p99 などの分位点を求めるための
+DDSketch 方式のスケッチ。値を対数スケールのビンに数えるだけなので、
+メモリはビン数の上限で固定され、相対誤差 alpha 以内の分位点を返す。
+スケッチ同士はビンの加算だけでマージでき、コンパクトな辞書形式で
+シリアライズできるため、別々の Function 呼び出しで作った部分集計を
+生データを読み直さずに統合できる。
+
+デバイスの重複なし件数には HyperLogLog を用いる。件数が少ないうちは
+ID をそのまま保持して正確な件数を返し、上限を超えた時点で HyperLogLog に切り替える。
+"""
+
+import base64
+import hashlib
+import math
+
+SENSOR_TYPES = ('temperature', 'pressure', 'vibration')
+
+# これより絶対値が小さい値はゼロとして数える
+MIN_INDEXABLE_VALUE = 1e-9
+
+
+def percentile_label(q):
+    """0.95 → 'p95'、0.999 → 'p99.9'"""
+    return f"p{round(q * 100, 6):g}"
+
+
+class _Bins:
+    """対数スケールのビン（キー → 件数）"""
+
+    __slots__ = ('counts', 'max_bins')
+
+    def __init__(self, max_bins):
+        self.counts = {}
+        self.max_bins = max_bins
+
+    def add(self, key, count=1):
+        self.counts[key] = self.counts.get(key, 0) + count
+        if len(self.counts) > self.max_bins:
+            self._collapse()
+
+    def _collapse(self):
+        """上限を超えたら最小側のビンをまとめる（高分位点の精度を優先）"""
+        keys = sorted(self.counts)
+        overflow = len(keys) - self.max_bins
+        merged = sum(self.counts.pop(key) for key in keys[:overflow])
+        self.counts[keys[overflow]] += merged
+
+    def merge(self, other_counts):
+        for key, count in other_counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+        while len(self.counts) > self.max_bins:
+            self._collapse()
+
+    def to_dict(self):
+        """先頭キーと連続した件数配列の形式で表す"""
+        if not self.counts:
+            return None
+        offset = min(self.counts)
+        dense = [0] * (max(self.counts) - offset + 1)
+        for key, count in self.counts.items():
+            dense[key - offset] = count
+        return [offset, dense]
+
+    @staticmethod
+    def counts_from_dict(data):
+        if not data:
+            return {}
+        offset, dense = data
+        return {offset + i: count for i, count in enumerate(dense) if count}
+
+
+class QuantileSketch:
+    """相対誤差 alpha の DDSketch"""
+
+    def __init__(self, alpha=0.01, max_bins=2048):
+        self.alpha = alpha
+        self.max_bins = max_bins
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.log_gamma = math.log(self.gamma)
+        self.positive = _Bins(max_bins)
+        self.negative = _Bins(max_bins)
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _key(self, magnitude):
+        return math.ceil(math.log(magnitude) / self.log_gamma)
+
+    def _value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value):
+        if value > MIN_INDEXABLE_VALUE:
+            self.positive.add(self._key(value))
+        elif value < -MIN_INDEXABLE_VALUE:
+            self.negative.add(self._key(-value))
+        else:
+            self.zero_count += 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """同じ alpha のスケッチを統合する"""
+        if other.alpha != self.alpha:
+            raise ValueError("alpha の異なるスケッチはマージできません")
+        self.positive.merge(other.positive.counts)
+        self.negative.merge(other.negative.counts)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q):
+        """分位点（0 ≤ q ≤ 1）を返す。データがない場合は None"""
+        if self.count == 0:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        rank = q * (self.count - 1)
+
+        seen = 0
+        # 負の値は絶対値の大きい順（＝値の小さい順）
+        for key in sorted(self.negative.counts, reverse=True):
+            seen += self.negative.counts[key]
+            if seen > rank:
+                return max(-self._value(key), self.min)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive.counts):
+            seen += self.positive.counts[key]
+            if seen > rank:
+                return min(self._value(key), self.max)
+        return self.max
+
+    def to_dict(self):
+        """コンパクトなシリアライズ形式"""
+        return {
+            'alpha': self.alpha,
+            'count': self.count,
+            'sum': self.total,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+            'zero': self.zero_count,
+            'pos': self.positive.to_dict(),
+            'neg': self.negative.to_dict()
+        }
+
+    @classmethod
+    def from_dict(cls, data, max_bins=2048):
+        sketch = cls(data['alpha'], max_bins)
+        sketch.positive.merge(_Bins.counts_from_dict(data.get('pos')))
+        sketch.negative.merge(_Bins.counts_from_dict(data.get('neg')))
+        sketch.zero_count = data.get('zero', 0)
+        sketch.count = data['count']
+        sketch.total = data.get('sum', 0.0)
+        if sketch.count:
+            sketch.min = data['min']
+            sketch.max = data['max']
+        return sketch
+
+
+class SensorSketches:
+    """センサー種別（温度・圧力・振動）ごとのスケッチの組"""
+
+    def __init__(self, alpha=0.01):
+        self.alpha = alpha
+        self.sketches = {}
+
+    def add(self, sensor_data):
+        """レコードの sensorData（{種別: {'value': 値}}）を追加"""
+        for sensor_type in SENSOR_TYPES:
+            sensor_info = sensor_data.get(sensor_type)
+            if isinstance(sensor_info, dict):
+                sketch = self.sketches.get(sensor_type)
+                if sketch is None:
+                    sketch = self.sketches[sensor_type] = QuantileSketch(self.alpha)
+                sketch.add(sensor_info.get('value', 0))
+
+    def merge(self, other):
+        for sensor_type, sketch in other.sketches.items():
+            if sensor_type in self.sketches:
+                self.sketches[sensor_type].merge(sketch)
+            else:
+                merged = self.sketches[sensor_type] = QuantileSketch(sketch.alpha)
+                merged.merge(sketch)
+
+    def percentiles(self, quantiles):
+        """{種別: {'p95': 値, ...}}"""
+        return {
+            sensor_type: {percentile_label(q): sketch.quantile(q) for q in quantiles}
+            for sensor_type, sketch in self.sketches.items()
+        }
+
+    def to_dict(self):
+        return {sensor_type: sketch.to_dict() for sensor_type, sketch in self.sketches.items()}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketches = cls()
+        for sensor_type, sketch_data in data.items():
+            sketches.sketches[sensor_type] = QuantileSketch.from_dict(sketch_data)
+            sketches.alpha = sketches.sketches[sensor_type].alpha
+        return sketches
+
+
+def merge_sensor_sketches(serialized_list):
+    """シリアライズ済みの SensorSketches を統合する"""
+    merged = SensorSketches()
+    for data in serialized_list:
+        merged.merge(SensorSketches.from_dict(data))
+    return merged
+
+
+class HyperLogLog:
+    """重複なし件数を推定する HyperLogLog（レジスタ数 2^precision）"""
+
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+
+    @staticmethod
+    def _hash(value):
+        return int.from_bytes(hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest(), 'big')
+
+    def add(self, value):
+        hashed = self._hash(value)
+        index = hashed >> (64 - self.precision)
+        remaining = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remaining.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("precision の異なる HyperLogLog はマージできません")
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def estimate(self):
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        harmonic = sum(2.0 ** -register for register in self.registers)
+        estimate = alpha * self.size * self.size / harmonic
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.size and zeros:
+            # 小さい件数は線形カウントで補正
+            estimate = self.size * math.log(self.size / zeros)
+        return round(estimate)
+
+    def to_dict(self):
+        return {'p': self.precision, 'registers': base64.b64encode(bytes(self.registers)).decode('ascii')}
+
+    @classmethod
+    def from_dict(cls, data):
+        hll = cls(data['p'])
+        hll.registers = bytearray(base64.b64decode(data['registers']))
+        return hll
+
+
+class DeviceSet:
+    """
+    デバイスIDの集合
+
+    通常は正確な集合を保持し、件数も正確に返す。HyperLogLog による推定に切り替えるのは
+    - 部分集計としてシリアライズする場合（exact_limit 件を超える集合のみ。to_dict(exact=True) で無効）
+    - approximate=True を指定した場合（exact_limit 件を超えた時点で切り替え、メモリを一定に保つ）
+    - HyperLogLog でシリアライズされた部分集計をマージした場合
+    のみで、その場合の件数は推定値になる。
+    """
+
+    __slots__ = ('ids', 'hll', 'exact_limit', 'approximate')
+
+    def __init__(self, exact_limit=512, approximate=False):
+        self.ids = set()
+        self.hll = None
+        self.exact_limit = exact_limit
+        self.approximate = approximate
+
+    def add(self, device_id):
+        if self.hll is not None:
+            self.hll.add(device_id)
+            return
+        self.ids.add(device_id)
+        if self.approximate and len(self.ids) > self.exact_limit:
+            self._to_hll()
+
+    def _to_hll(self):
+        self.hll = self._hll_of(self.ids)
+        self.ids = set()
+
+    @staticmethod
+    def _hll_of(ids):
+        hll = HyperLogLog()
+        for device_id in ids:
+            hll.add(device_id)
+        return hll
+
+    def merge(self, other):
+        if other.hll is not None:
+            if self.hll is None:
+                self._to_hll()
+            self.hll.merge(other.hll)
+        else:
+            for device_id in other.ids:
+                self.add(device_id)
+
+    def __len__(self):
+        return self.hll.estimate() if self.hll is not None else len(self.ids)
+
+    def to_dict(self, exact=False):
+        """シリアライズする（exact=True の場合は推定に切り替えていない集合を正確なまま出力する）"""
+        if self.hll is not None:
+            return {'hll': self.hll.to_dict()}
+        if not exact and len(self.ids) > self.exact_limit:
+            return {'hll': self._hll_of(self.ids).to_dict()}
+        return {'ids': sorted(self.ids, key=str)}
+
+    @classmethod
+    def from_dict(cls, data):
+        device_set = cls()
+        if 'hll' in data:
+            device_set.hll = HyperLogLog.from_dict(data['hll'])
+        else:
+            device_set.ids.update(data.get('ids', []))
+        return device_set
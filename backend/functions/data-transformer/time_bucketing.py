@@ -0,0 +1,72 @@
+"""
+タイムスタンプのバケット化
+
+ISO 8601 形式のタイムスタンプを集計用のバケットキー（'YYYY-MM-DD HH:MM:00'）に変換する。
+レコードごとに datetime を生成する代わりに「分」までの接頭辞とUTCオフセットを
+キーとして結果をキャッシュするため、同じ分のレコードは辞書参照だけで処理できる。
+
+- バケット幅: 1m / 5m / 15m / 1h / 1d
+- timezone 指定時はそのタイムゾーンの壁時計でバケット化する（例: 'Asia/Tokyo'）
+  オフセットを持たないタイムスタンプは指定タイムゾーンの時刻とみなす
+- timezone 未指定時はタイムスタンプ自身のオフセットの時刻でバケット化する（従来の動作）
+"""
+
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+BUCKET_WIDTHS = {
+    '1m': 1,
+    '5m': 5,
+    '15m': 15,
+    '1h': 60,
+    '1d': 1440,
+}
+
+# キャッシュの上限（超えた場合は破棄して作り直す）
+MAX_CACHE_SIZE = 100000
+
+
+class TimestampBucketer:
+    """タイムスタンプ文字列からバケットキーを生成する"""
+
+    def __init__(self, width='1h', timezone=None):
+        if width not in BUCKET_WIDTHS:
+            raise ValueError(f"未対応のバケット幅です: {width}")
+        self.width = width
+        self.width_minutes = BUCKET_WIDTHS[width]
+        self.tz = ZoneInfo(timezone) if timezone else None
+        self._cache = {}
+
+    def key(self, timestamp):
+        """バケットキーを返す（不正なタイムスタンプは ValueError）"""
+        # UTCオフセットを '±HH:MM' に正規化（それ以外の表記は None）
+        if timestamp[-1:] == 'Z':
+            offset = '+00:00'
+        elif timestamp[-6:-5] in ('+', '-') and timestamp[-3:-2] == ':':
+            offset = timestamp[-6:]
+        elif '+' in timestamp[16:] or '-' in timestamp[16:]:
+            offset = None
+        else:
+            offset = ''
+
+        if offset is not None:
+            cache_key = timestamp[:16] + offset
+            bucket = self._cache.get(cache_key)
+            if bucket is not None:
+                return bucket
+            # 標準的な 'YYYY-MM-DDTHH:MM...' 形式のみキャッシュする
+            if len(timestamp) >= 16 and timestamp[4] == '-' and timestamp[7] == '-' \
+                    and timestamp[10] in 'T ' and timestamp[13] == ':':
+                if len(self._cache) >= MAX_CACHE_SIZE:
+                    self._cache.clear()
+                bucket = self._cache[cache_key] = self._bucket(datetime.fromisoformat(cache_key))
+                return bucket
+
+        return self._bucket(datetime.fromisoformat(timestamp.replace('Z', '+00:00')))
+
+    def _bucket(self, dt):
+        if self.tz is not None:
+            dt = dt.astimezone(self.tz) if dt.tzinfo else dt.replace(tzinfo=self.tz)
+        minutes = dt.hour * 60 + dt.minute
+        minutes -= minutes % self.width_minutes
+        return f"{dt.year:04d}-{dt.month:02d}-{dt.day:02d} {minutes // 60:02d}:{minutes % 60:02d}:00"
@@ -4,6 +4,32 @@ import json
 from datetime import datetime
 import os
 
+from .alert_suppression import AlertSuppressor
+from .anomaly_engine import SENSOR_COLUMNS, detect_anomalies_columnar, to_column
+from .rule_store import ALERT_LABELS, get_rule_store, resolve_rule
+from .streaming_detector import StreamingDetector
+
+# バッチモードの設定
+REQUIRED_FIELDS = ['deviceId', 'timestamp', 'sensorData']
+MAX_BATCH_SIZE = int(os.environ.get('IOT_MAX_BATCH_SIZE', 10000))
+
+# ストリーミング異常検知（ウォームインスタンス内でデバイスごとの移動統計を保持）
+streaming_detector = StreamingDetector(
+    window_size=int(os.environ.get('IOT_STREAMING_WINDOW', 60)),
+    max_devices=int(os.environ.get('IOT_STREAMING_MAX_DEVICES', 10000)),
+    idle_seconds=int(os.environ.get('IOT_STREAMING_IDLE_SECONDS', 3600))
+) if os.environ.get('IOT_STREAMING_DETECTION', '').lower() == 'true' else None
+
+# アラート重複抑止（抑止期間0で無効）
+ALERT_HOLD_DOWN_SECONDS = int(os.environ.get('IOT_ALERT_HOLD_DOWN_SECONDS', 300))
+alert_suppressor = AlertSuppressor(
+    hold_down_seconds=ALERT_HOLD_DOWN_SECONDS,
+    max_entries=int(os.environ.get('IOT_ALERT_SUPPRESSION_MAX_KEYS', 10000))
+) if ALERT_HOLD_DOWN_SECONDS > 0 else None
+
+class InvalidBodyError(ValueError):
+    """リクエストボディが JSON としても NDJSON としても解析できない"""
+
 def main(req: func.HttpRequest) -> func.HttpResponse:
     """
     IoTデバイスからのセンサーデータを処理する Azure Function
@@ -11,8 +37,15 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
     logging.info('IoT データ処理 Function が開始されました')
 
     try:
-        # リクエストからIoTデータを取得
-        req_body = req.get_json()
+        # リクエストからIoTデータを取得（単一JSON・JSON配列・NDJSONに対応）
+        try:
+            req_body = parse_request_body(req)
+        except InvalidBodyError:
+            return func.HttpResponse(
+                json.dumps({"error": "JSONの形式が無効です"}, ensure_ascii=False),
+                status_code=400,
+                mimetype="application/json"
+            )
         
         if not req_body:
             return func.HttpResponse(
@@ -21,11 +54,15 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
                 mimetype="application/json"
             )
 
+        # 配列の場合はバッチモードで一括処理
+        if isinstance(req_body, list):
+            return handle_batch(req_body)
+
         # IoTデータの検証
-        required_fields = ['deviceId', 'timestamp', 'sensorData']
-        if not all(field in req_body for field in required_fields):
+        error = validate_reading(req_body)
+        if error:
             return func.HttpResponse(
-                json.dumps({"error": "必須フィールドが不足しています"}, ensure_ascii=False),
+                json.dumps({"error": error}, ensure_ascii=False),
                 status_code=400,
                 mimetype="application/json"
             )
@@ -34,14 +71,23 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
         timestamp = req_body['timestamp']
         sensor_data = req_body['sensorData']
 
+        # 閾値ルール（Sensors テーブルのキャッシュ、未設定時は既定値）
+        rules = get_rule_store()
+
         # センサーデータの処理
-        processed_data = process_sensor_data(device_id, timestamp, sensor_data)
+        processed_data = process_sensor_data(device_id, timestamp, sensor_data, rules)
         
         # 異常検知
-        alerts = detect_anomalies(device_id, sensor_data)
+        alerts = detect_anomalies(device_id, sensor_data, rules)
+        if streaming_detector is not None:
+            alerts += streaming_detector.update(device_id, timestamp, sensor_data)
         
         # Cosmos DBに保存（実際の実装では接続文字列を使用）
         # save_to_cosmosdb(processed_data)
+
+        # 重複アラートをまとめ、Alerts コンテナへの書き込み対象を決定
+        stored_alerts = suppress_alerts(alerts)
+        # save_alerts_to_cosmosdb(stored_alerts)
         
         logging.info(f'デバイス {device_id} のデータ処理が完了しました')
         
@@ -49,6 +95,7 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             "status": "success",
             "processedData": processed_data,
             "alerts": alerts,
+            "storedAlerts": stored_alerts,
             "timestamp": datetime.now().isoformat()
         }
 
@@ -66,7 +113,154 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             mimetype="application/json"
         )
 
-def process_sensor_data(device_id, timestamp, sensor_data):
+def parse_request_body(req):
+    """リクエストボディを解析（JSONとして解析できない場合はNDJSONとして扱う）"""
+    try:
+        return req.get_json()
+    except ValueError:
+        return parse_ndjson(req.get_body())
+
+def parse_ndjson(body):
+    """
+    NDJSON（1行1レコード）を解析。解析できない行はNoneとして位置を保持する
+
+    1行も解析できない場合は NDJSON ではないとみなし InvalidBodyError を送出する。
+    """
+    try:
+        lines = body.decode('utf-8').splitlines()
+    except UnicodeDecodeError:
+        raise InvalidBodyError("UTF-8 として解析できません")
+    readings = []
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            readings.append(json.loads(line))
+        except ValueError:
+            readings.append(None)
+    if readings and all(reading is None for reading in readings):
+        raise InvalidBodyError("JSON として解析できる行がありません")
+    return readings
+
+def validate_reading(reading):
+    """1件分のIoTデータを検証し、問題があればエラーメッセージを返す"""
+    if not isinstance(reading, dict):
+        return "レコードの形式が無効です"
+    if not all(field in reading for field in REQUIRED_FIELDS):
+        return "必須フィールドが不足しています"
+    # deviceId はアラート抑制のキーや集計に使うため文字列か整数に限る
+    if not isinstance(reading['deviceId'], (str, int)) or isinstance(reading['deviceId'], bool):
+        return "deviceIdの形式が無効です"
+    if not isinstance(reading['sensorData'], dict):
+        return "sensorDataの形式が無効です"
+    return None
+
+def handle_batch(readings):
+    """バッチモードのリクエスト処理"""
+    if len(readings) > MAX_BATCH_SIZE:
+        return func.HttpResponse(
+            json.dumps({"error": f"バッチサイズが上限（{MAX_BATCH_SIZE}件）を超えています"}, ensure_ascii=False),
+            status_code=413,
+            mimetype="application/json"
+        )
+
+    batch_result = process_batch(readings)
+    summary = batch_result["summary"]
+
+    # save_to_cosmosdb は成功したレコードのみを対象とする想定
+    # save_alerts_to_cosmosdb(batch_result["storedAlerts"])
+
+    logging.info(
+        f'バッチ処理が完了しました: {summary["total"]}件中 成功 {summary["succeeded"]}件, '
+        f'失敗 {summary["failed"]}件'
+    )
+
+    response_data = {
+        "status": "success" if summary["failed"] == 0 else "partial_success",
+        "summary": summary,
+        "results": batch_result["results"],
+        "storedAlerts": batch_result["storedAlerts"],
+        "timestamp": datetime.now().isoformat()
+    }
+
+    return func.HttpResponse(
+        json.dumps(response_data, ensure_ascii=False),
+        status_code=200,
+        mimetype="application/json"
+    )
+
+def process_batch(readings):
+    """
+    複数件のIoTデータを1回の走査で処理する
+
+    1件の不正データでバッチ全体が失敗しないよう、エラーはインデックスごとに記録する。
+    異常検知は正常レコードをまとめて列指向エンジンで一括評価する。
+    """
+    rules = get_rule_store()
+    results = [None] * len(readings)
+    valid_rows = []
+
+    for index, reading in enumerate(readings):
+        error = validate_reading(reading)
+        if not error:
+            try:
+                processed_data = process_sensor_data(reading['deviceId'], reading['timestamp'], reading['sensorData'], rules)
+            except (TypeError, ValueError) as e:
+                error = f"センサー値が無効です: {e}"
+
+        if error:
+            results[index] = {"index": index, "status": "error", "error": error}
+        else:
+            valid_rows.append((index, processed_data))
+
+    # 正規化済みの値から列を組み立て、全ルールを1回のベクトル演算で評価
+    device_ids = [processed["deviceId"] for _, processed in valid_rows]
+    columns = {
+        sensor_type: to_column([
+            processed["sensorData"][sensor_type]["value"] if sensor_type in processed["sensorData"] else None
+            for _, processed in valid_rows
+        ])
+        for sensor_type in SENSOR_COLUMNS
+    }
+    alerts_by_row = detect_anomalies_columnar(device_ids, rules=rules, **columns)
+
+    detected_alerts = []
+    for row, (index, processed_data) in enumerate(valid_rows):
+        alerts = alerts_by_row.get(row, [])
+        if streaming_detector is not None:
+            # 傾向検知はデバイスごとの時系列順に状態を更新する
+            reading = readings[index]
+            alerts = alerts + streaming_detector.update(reading['deviceId'], reading['timestamp'], reading['sensorData'])
+        detected_alerts.extend(alerts)
+        results[index] = {
+            "index": index,
+            "status": "success",
+            "processedData": processed_data,
+            "alerts": alerts
+        }
+
+    stored_alerts = suppress_alerts(detected_alerts)
+
+    return {
+        "results": results,
+        "storedAlerts": stored_alerts,
+        "summary": {
+            "total": len(readings),
+            "succeeded": len(valid_rows),
+            "failed": len(readings) - len(valid_rows),
+            "alertCount": len(detected_alerts),
+            "storedAlertCount": len(stored_alerts),
+            "deviceCount": len(set(device_ids))
+        }
+    }
+
+def suppress_alerts(alerts):
+    """重複抑止キャッシュを通して保存対象のアラートを返す（無効時はそのまま）"""
+    if alert_suppressor is None:
+        return alerts
+    return alert_suppressor.process(alerts)
+
+def process_sensor_data(device_id, timestamp, sensor_data, rules=None):
     """センサーデータの処理とフォーマット"""
     processed = {
         "deviceId": device_id,
@@ -75,84 +269,61 @@ def process_sensor_data(device_id, timestamp, sensor_data):
         "sensorData": {}
     }
     
-    # 各センサーデータの正規化と検証
+    # 各センサーデータの正規化と検証（閾値は設備・センサー種別ごとのルールを参照）
     for sensor_type, value in sensor_data.items():
-        if sensor_type == 'temperature':
-            # 温度データの処理
-            processed["sensorData"][sensor_type] = {
-                "value": float(value),
-                "unit": "°C",
-                "status": "normal" if 20 <= float(value) <= 85 else "warning"
-            }
-        elif sensor_type == 'pressure':
-            # 圧力データの処理
-            processed["sensorData"][sensor_type] = {
-                "value": float(value),
-                "unit": "%",
-                "status": "normal" if 0 <= float(value) <= 95 else "warning"
-            }
-        elif sensor_type == 'vibration':
-            # 振動データの処理
-            processed["sensorData"][sensor_type] = {
-                "value": float(value),
-                "unit": "mm/s",
-                "status": "normal" if 0 <= float(value) <= 8 else "warning"
-            }
+        rule = resolve_rule(rules, device_id, sensor_type)
+        if rule is None:
+            continue
+        value = float(value)
+        processed["sensorData"][sensor_type] = {
+            "value": value,
+            "unit": rule.unit,
+            "status": "normal" if within_range(value, rule.normal_min, rule.normal_max) else "warning"
+        }
     
     return processed
 
-def detect_anomalies(device_id, sensor_data):
+def within_range(value, lower, upper):
+    """下限・上限（Noneは制限なし）の範囲内か判定"""
+    return (lower is None or lower <= value) and (upper is None or value <= upper)
+
+def detect_anomalies(device_id, sensor_data, rules=None):
     """異常検知処理"""
     alerts = []
     
-    # 温度異常チェック
-    if 'temperature' in sensor_data:
-        temp = float(sensor_data['temperature'])
-        if temp > 85:
+    # 温度 → 圧力 → 振動の順にチェック
+    for sensor_type in SENSOR_COLUMNS:
+        if sensor_type not in sensor_data:
+            continue
+        rule = resolve_rule(rules, device_id, sensor_type)
+        value = float(sensor_data[sensor_type])
+        if rule.alert_max is not None and value > rule.alert_max:
             alerts.append({
-                "type": "temperature_high",
+                "type": f"{sensor_type}_high",
                 "deviceId": device_id,
-                "message": f"高温異常: {temp}°C",
-                "severity": "error" if temp > 90 else "warning",
+                "message": f"{ALERT_LABELS[(sensor_type, 'high')]}: {value}{rule.unit}",
+                "severity": "error" if rule.error_max is not None and value > rule.error_max else "warning",
                 "timestamp": datetime.now().isoformat()
             })
-        elif temp < 10:
+        elif rule.alert_min is not None and value < rule.alert_min:
             alerts.append({
-                "type": "temperature_low",
+                "type": f"{sensor_type}_low",
                 "deviceId": device_id,
-                "message": f"低温異常: {temp}°C",
+                "message": f"{ALERT_LABELS[(sensor_type, 'low')]}: {value}{rule.unit}",
                 "severity": "warning",
                 "timestamp": datetime.now().isoformat()
             })
     
-    # 圧力異常チェック
-    if 'pressure' in sensor_data:
-        pressure = float(sensor_data['pressure'])
-        if pressure > 95:
-            alerts.append({
-                "type": "pressure_high",
-                "deviceId": device_id,
-                "message": f"高圧異常: {pressure}%",
-                "severity": "error",
-                "timestamp": datetime.now().isoformat()
-            })
-    
-    # 振動異常チェック
-    if 'vibration' in sensor_data:
-        vibration = float(sensor_data['vibration'])
-        if vibration > 8:
-            alerts.append({
-                "type": "vibration_high",
-                "deviceId": device_id,
-                "message": f"振動異常: {vibration}mm/s",
-                "severity": "error" if vibration > 10 else "warning",
-                "timestamp": datetime.now().isoformat()
-            })
-    
     return alerts
 
 def save_to_cosmosdb(data):
     """Cosmos DBへの保存（実装例）"""
     # 本番環境では実際のCosmos DB接続を実装
     logging.info(f"Cosmos DBに保存: {data['deviceId']}")
+    pass
+
+def save_alerts_to_cosmosdb(alerts):
+    """Alerts コンテナへの保存（実装例）"""
+    # 本番環境では id をキーに upsert し、同一インシデントの発生回数を更新する
+    logging.info(f"Alerts コンテナに保存: {len(alerts)}件")
     pass
\ No newline at end of file
@@ -0,0 +1,122 @@
+"""
+アラート重複抑止キャッシュ
+
+同一デバイスが閾値を超え続けると、計測のたびに同じアラートが生成され
+Alerts コンテナへの書き込みが急増する。(deviceId, type, severity) をキーに
+発生中のインシデントを保持し、繰り返しは1件のアラートにまとめて
+発生回数（occurrenceCount）と初回・最終発生時刻（firstSeen / lastSeen）で表す。
+
+- 新しいインシデントの初回アラートは即時に保存対象とする
+- 抑止期間（hold-down）内の繰り返しは件数だけ加算して保存しない
+- 抑止期間を過ぎて発生が続く場合は、同じ id のアラートを最新の件数で再保存（upsert）する
+- hold-down 期間発生がなければインシデント終了とし、次の発生は新しいアラートになる
+- キーの保持数は上限を超えると最も古いものから破棄し、未保存の件数はその時点で保存対象とする
+"""
+
+import time
+import uuid
+from collections import OrderedDict
+
+
+class _Incident:
+    __slots__ = ('record', 'last_seen_at', 'reported_at', 'pending')
+
+    def __init__(self, record, now):
+        self.record = record
+        self.last_seen_at = now
+        self.reported_at = now
+        self.pending = 0
+
+
+class AlertSuppressor:
+    """(deviceId, type, severity) 単位でアラートをまとめる LRU キャッシュ"""
+
+    def __init__(self, hold_down_seconds=300, max_entries=10000, clock=time.monotonic):
+        self.hold_down_seconds = hold_down_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+        self._incidents = OrderedDict()
+        self.suppressed_count = 0
+
+    def __len__(self):
+        return len(self._incidents)
+
+    @staticmethod
+    def key_for(alert):
+        return (alert.get('deviceId'), alert.get('type'), alert.get('severity'))
+
+    def process(self, alerts):
+        """
+        検出したアラートを抑止キャッシュに通し、保存すべきアラートを返す
+
+        Args:
+            alerts: detect_anomalies() 形式のアラートのリスト
+
+        Returns:
+            Alerts コンテナへ書き込む（upsert する）アラートのリスト
+        """
+        now = self.clock()
+        to_store = []
+        # 同一呼び出し内で保存対象にしたインシデント（繰り返しは最新の件数で置き換える）
+        stored_in_call = {}
+
+        for alert in alerts:
+            key = self.key_for(alert)
+            incident = self._incidents.pop(key, None)
+
+            if incident and now - incident.last_seen_at <= self.hold_down_seconds:
+                # 発生中のインシデントの繰り返し
+                record = incident.record
+                record['occurrenceCount'] += 1
+                record['lastSeen'] = alert.get('timestamp')
+                record['message'] = alert.get('message')
+                incident.last_seen_at = now
+                self.suppressed_count += 1
+                if key in stored_in_call:
+                    to_store[stored_in_call[key]] = dict(record)
+                elif now - incident.reported_at >= self.hold_down_seconds:
+                    incident.reported_at = now
+                    incident.pending = 0
+                    stored_in_call[key] = len(to_store)
+                    to_store.append(dict(record))
+                else:
+                    incident.pending += 1
+            else:
+                if incident and incident.pending:
+                    # 終了したインシデントの未保存分を確定
+                    to_store.append(dict(incident.record))
+                record = dict(
+                    alert,
+                    id=str(uuid.uuid4()),
+                    occurrenceCount=1,
+                    firstSeen=alert.get('timestamp'),
+                    lastSeen=alert.get('timestamp')
+                )
+                incident = _Incident(record, now)
+                stored_in_call[key] = len(to_store)
+                to_store.append(dict(record))
+
+            self._incidents[key] = incident
+
+        to_store.extend(self._evict())
+        return to_store
+
+    def _evict(self):
+        """上限を超えたキーを古い順に破棄し、未保存の件数があれば返す"""
+        evicted = []
+        while len(self._incidents) > self.max_entries:
+            _, incident = self._incidents.popitem(last=False)
+            if incident.pending:
+                evicted.append(dict(incident.record))
+        return evicted
+
+    def flush(self):
+        """未保存の件数を持つインシデントをすべて保存対象として返す"""
+        now = self.clock()
+        to_store = []
+        for incident in self._incidents.values():
+            if incident.pending:
+                incident.pending = 0
+                incident.reported_at = now
+                to_store.append(dict(incident.record))
+        return to_store
@@ -0,0 +1,124 @@
+"""
+列指向の異常検知エンジン
+
+バッチ・リプレイデータ向けに、温度・圧力・振動の配列へ全閾値ルールを
+1回のベクトル演算で適用し、アラートが発生した行だけを組み立てる。
+出力は detect_anomalies() と同一形式・同一順序（温度 → 圧力 → 振動）。
+閾値はルールストア（Sensors テーブル）から解決する。
+"""
+
+from datetime import datetime
+
+import numpy as np
+
+from .rule_store import ALERT_LABELS, DEFAULT_RULES, resolve_rule
+
+SENSOR_COLUMNS = ('temperature', 'pressure', 'vibration')
+
+
+def to_column(values):
+    """値のリストをfloat64配列に変換（欠損値は None → NaN として扱う）"""
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+def columns_from_readings(sensor_data_list):
+    """sensorData の辞書リストを列（センサー種別ごとの配列）に変換"""
+    nan = np.nan
+    return {
+        sensor_type: np.array([
+            float(sensor_data[sensor_type]) if sensor_type in sensor_data else nan
+            for sensor_data in sensor_data_list
+        ], dtype=np.float64)
+        for sensor_type in SENSOR_COLUMNS
+    }
+
+
+def _threshold_columns(device_ids, sensor_type, rules):
+    """
+    行ごとの閾値配列 (alert_min, alert_max, error_max) を返す
+
+    ルールストアが無効な場合はスカラー値をそのままブロードキャストする。
+    有効な場合もルール参照はデバイスごとに1回だけ行う。
+    """
+    if rules is None:
+        rule = DEFAULT_RULES[sensor_type]
+        return [rule], None
+
+    device_slots = {}
+    inverse = np.array([device_slots.setdefault(d, len(device_slots)) for d in device_ids], dtype=np.intp)
+    device_rules = [resolve_rule(rules, d, sensor_type) for d in device_slots]
+    return device_rules, inverse
+
+
+def _bound(device_rules, inverse, field, missing):
+    values = np.array(
+        [missing if getattr(rule, field) is None else getattr(rule, field) for rule in device_rules],
+        dtype=np.float64
+    )
+    return values[0] if inverse is None else values[inverse]
+
+
+def detect_anomalies_columnar(device_ids, temperature=None, pressure=None, vibration=None, now=None, rules=None):
+    """
+    列データに対する異常検知
+
+    Args:
+        device_ids: 各行のデバイスID
+        temperature, pressure, vibration: 各行の値の配列（欠損はNaN、列ごと省略可）
+        now: アラートのタイムスタンプ（省略時は呼び出し時刻を1回だけ取得）
+        rules: 閾値ルールストア（省略時は既定ルール）
+
+    Returns:
+        {行インデックス: アラートのリスト}（アラートが発生した行のみ）
+    """
+    columns = {'temperature': temperature, 'pressure': pressure, 'vibration': vibration}
+    checks = []
+    any_alert = np.zeros(len(device_ids), dtype=bool)
+
+    # NaN との比較は常に False になるため、欠損値はアラート対象外となる
+    for sensor_type in SENSOR_COLUMNS:
+        if columns[sensor_type] is None:
+            continue
+        values = np.asarray(columns[sensor_type], dtype=np.float64)
+        device_rules, inverse = _threshold_columns(device_ids, sensor_type, rules)
+        high = values > _bound(device_rules, inverse, 'alert_max', np.inf)
+        low = values < _bound(device_rules, inverse, 'alert_min', -np.inf)
+        error = values > _bound(device_rules, inverse, 'error_max', np.inf)
+        any_alert |= high | low
+        checks.append((sensor_type, values, high, low, error, device_rules, inverse))
+
+    rows = np.flatnonzero(any_alert)
+    if rows.size == 0:
+        return {}
+
+    timestamp = (now or datetime.now()).isoformat()
+    row_list = rows.tolist()
+    alerts_by_row = {row: [] for row in row_list}
+
+    # 対象行だけをPythonオブジェクトに変換してから組み立てる（温度 → 圧力 → 振動の順）
+    for sensor_type, values, high, low, error, device_rules, inverse in checks:
+        high_label = ALERT_LABELS[(sensor_type, 'high')]
+        low_label = ALERT_LABELS[(sensor_type, 'low')]
+        slots = [0] * rows.size if inverse is None else inverse[rows].tolist()
+        for row, value, is_high, is_low, is_error, slot in zip(
+            row_list, values[rows].tolist(), high[rows].tolist(), low[rows].tolist(),
+            error[rows].tolist(), slots
+        ):
+            if is_high:
+                alerts_by_row[row].append({
+                    "type": f"{sensor_type}_high",
+                    "deviceId": device_ids[row],
+                    "message": f"{high_label}: {value}{device_rules[slot].unit}",
+                    "severity": "error" if is_error else "warning",
+                    "timestamp": timestamp
+                })
+            elif is_low:
+                alerts_by_row[row].append({
+                    "type": f"{sensor_type}_low",
+                    "deviceId": device_ids[row],
+                    "message": f"{low_label}: {value}{device_rules[slot].unit}",
+                    "severity": "warning",
+                    "timestamp": timestamp
+                })
+
+    return alerts_by_row
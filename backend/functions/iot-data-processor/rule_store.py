@@ -0,0 +1,211 @@
+"""
+閾値ルールストア
+
+Sensors テーブルの MinThreshold / MaxThreshold を一度だけ読み込み、
+(equipmentId, sensorType) をキーとするメモリ上のインデックスに保持する。
+TTL 経過後はバージョンスタンプ（件数と最終更新日時）だけを確認し、
+変化があった場合のみ再読み込みするため、リクエストごとのDBアクセスは発生しない。
+
+接続先は環境変数で指定する:
+    IOT_RULES_SQL_CONNECTION  Azure SQL Database の ODBC 接続文字列（pyodbc）
+    IOT_RULES_SQLITE_PATH     ローカル検証用の SQLite ファイル
+    IOT_RULES_TTL_SECONDS     バージョン確認の間隔（秒、既定 300）
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+# alert_min / alert_max を外れるとアラート、error_max を超えると重大度 error
+ThresholdRule = namedtuple(
+    'ThresholdRule',
+    ['sensor_type', 'unit', 'normal_min', 'normal_max', 'alert_min', 'alert_max', 'error_max']
+)
+
+# Sensors テーブルにルールがない場合の既定値（従来のハードコード値）
+DEFAULT_RULES = {
+    'temperature': ThresholdRule('temperature', '°C', 20, 85, 10, 85, 90),
+    'pressure': ThresholdRule('pressure', '%', 0, 95, None, 95, 95),
+    'vibration': ThresholdRule('vibration', 'mm/s', 0, 8, None, 8, 10),
+}
+
+# アラートメッセージの見出し
+ALERT_LABELS = {
+    ('temperature', 'high'): '高温異常',
+    ('temperature', 'low'): '低温異常',
+    ('pressure', 'high'): '高圧異常',
+    ('pressure', 'low'): '低圧異常',
+    ('vibration', 'high'): '振動異常',
+    ('vibration', 'low'): '振動低下',
+}
+
+# MaxThreshold を閾値幅のこの割合以上超えた場合は重大度 error とする
+ERROR_MARGIN_RATIO = 0.1
+
+RULES_QUERY = (
+    "SELECT EquipmentId, SensorType, MeasurementUnit, MinThreshold, MaxThreshold "
+    "FROM Sensors WHERE Status = 'Active'"
+)
+VERSION_QUERY = "SELECT COUNT(*), MAX(UpdatedAt) FROM Sensors"
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS Sensors (
+    SensorId INTEGER PRIMARY KEY AUTOINCREMENT,
+    EquipmentId INTEGER NOT NULL,
+    SensorType TEXT NOT NULL,
+    SensorName TEXT NOT NULL,
+    MeasurementUnit TEXT NOT NULL,
+    MinThreshold REAL,
+    MaxThreshold REAL,
+    Status TEXT DEFAULT 'Active',
+    UpdatedAt TEXT DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+def rule_from_row(sensor_type, unit, min_threshold, max_threshold):
+    """Sensors テーブルの1行からルールを生成"""
+    min_value = float(min_threshold) if min_threshold is not None else None
+    max_value = float(max_threshold) if max_threshold is not None else None
+    default = DEFAULT_RULES.get(sensor_type)
+    error_max = max_value
+    if max_value is not None and min_value is not None:
+        error_max = max_value + (max_value - min_value) * ERROR_MARGIN_RATIO
+    return ThresholdRule(
+        sensor_type,
+        unit or (default.unit if default else ''),
+        min_value,
+        max_value,
+        min_value,
+        max_value,
+        error_max
+    )
+
+
+class SqlSensorSource:
+    """DB-API 互換の接続（pyodbc / sqlite3）から Sensors テーブルを読み込む"""
+
+    def __init__(self, connect):
+        """
+        Args:
+            connect: 新しいDB接続を返す関数
+        """
+        self.connect = connect
+
+    def _query(self, sql):
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(sql)
+            return cursor.fetchall()
+        finally:
+            conn.close()
+
+    def version(self):
+        """変更検知用のバージョンスタンプ（件数, 最終更新日時）"""
+        count, updated_at = self._query(VERSION_QUERY)[0]
+        return (count, str(updated_at))
+
+    def load_rules(self):
+        """(equipmentId, sensorType) をキーとするルールのインデックスを返す"""
+        return {
+            (str(equipment_id), sensor_type): rule_from_row(sensor_type, unit, min_threshold, max_threshold)
+            for equipment_id, sensor_type, unit, min_threshold, max_threshold in self._query(RULES_QUERY)
+        }
+
+
+class RuleStore:
+    """TTL とバージョンスタンプで更新されるメモリ上の閾値ルールインデックス"""
+
+    def __init__(self, source, ttl_seconds=300, clock=time.monotonic):
+        self.source = source
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._index = {}
+        self._version = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def refresh(self, force=False):
+        """バージョンが変化している場合のみルールを再読み込みする"""
+        with self._lock:
+            self._checked_at = self.clock()
+            version = self.source.version()
+            if not force and version == self._version:
+                return False
+            # インデックスは丸ごと差し替えるため、参照中の読み取りはロック不要
+            self._index = self.source.load_rules()
+            self._version = version
+            logging.info(f'閾値ルールを読み込みました: {len(self._index)}件')
+            return True
+
+    def _ensure_fresh(self):
+        if self._checked_at is None or self.clock() - self._checked_at >= self.ttl_seconds:
+            try:
+                self.refresh()
+            except Exception as e:
+                # DBに接続できない場合は前回読み込んだルールで継続する
+                logging.warning(f'閾値ルールの更新に失敗しました: {str(e)}')
+
+    def get(self, equipment_id, sensor_type):
+        """ルールを取得（該当がなければ既定ルール、未対応のセンサー種別はNone）"""
+        self._ensure_fresh()
+        return self._index.get((str(equipment_id), sensor_type)) or DEFAULT_RULES.get(sensor_type)
+
+    def __len__(self):
+        return len(self._index)
+
+
+def create_sqlite_database(path, sensors=()):
+    """
+    ローカル検証用の SQLite 版 Sensors テーブルを作成
+
+    Args:
+        path: SQLite ファイルのパス
+        sensors: (EquipmentId, SensorType, SensorName, MeasurementUnit, MinThreshold, MaxThreshold) のリスト
+    """
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute(SQLITE_SCHEMA)
+        conn.executemany(
+            "INSERT INTO Sensors (EquipmentId, SensorType, SensorName, MeasurementUnit, MinThreshold, MaxThreshold) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            sensors
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def sqlite_source(path):
+    return SqlSensorSource(lambda: sqlite3.connect(path))
+
+
+def odbc_source(connection_string):
+    import pyodbc
+    return SqlSensorSource(lambda: pyodbc.connect(connection_string))
+
+
+_rule_store = None
+
+
+def get_rule_store():
+    """環境変数の設定からルールストアを生成（未設定の場合はNone＝既定ルールのみ）"""
+    global _rule_store
+    if _rule_store is None:
+        ttl_seconds = int(os.environ.get('IOT_RULES_TTL_SECONDS', 300))
+        if os.environ.get('IOT_RULES_SQL_CONNECTION'):
+            _rule_store = RuleStore(odbc_source(os.environ['IOT_RULES_SQL_CONNECTION']), ttl_seconds)
+        elif os.environ.get('IOT_RULES_SQLITE_PATH'):
+            _rule_store = RuleStore(sqlite_source(os.environ['IOT_RULES_SQLITE_PATH']), ttl_seconds)
+    return _rule_store
+
+
+def resolve_rule(rules, device_id, sensor_type):
+    """ルールストアが無効な場合は既定ルールを返す"""
+    if rules is None:
+        return DEFAULT_RULES.get(sensor_type)
+    return rules.get(device_id, sensor_type)
@@ -0,0 +1,232 @@
+"""
+ストリーミング異常検知
+
+単発の閾値判定では検出できない傾向（緩やかな温度上昇など）を検出するため、
+デバイス・センサー種別ごとに固定長のリングバッファで移動統計を保持する。
+
+- EWMA（指数加重移動平均）
+- 移動平均・移動標準偏差（Welford 法による O(1) 更新。誤差が蓄積しないよう、
+  ウィンドウを1周するごとにバッファから正確に計算し直す）
+- 変化率（ウィンドウ先頭から現在までの EWMA の単位時間あたり変化量。
+  ノイズを平滑化した値で比較するため、緩やかな上昇も検出できる）
+
+1件あたりの更新は O(1)、状態はデバイスあたり固定サイズで、
+一定時間更新のないデバイスおよび上限を超えたデバイスは古い順に破棄する。
+"""
+
+import math
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+
+# センサー種別ごとの変化率の上限（単位/分）
+DEFAULT_MAX_RATES = {
+    'temperature': 0.05,
+    'pressure': 2.0,
+    'vibration': 0.5,
+}
+
+# Zスコアの分母に使う標準偏差の下限（センサーの分解能程度。値が一定のウィンドウで
+# わずかな変化が大きなZスコアにならないようにする）
+DEFAULT_MIN_STDDEVS = {
+    'temperature': 0.1,
+    'pressure': 0.5,
+    'vibration': 0.05,
+}
+
+# 傾向の検出に必要な上昇幅（ウィンドウの標準偏差の倍数。ノイズによる EWMA の揺れを除く）
+TREND_MIN_RISE_STDDEVS = 2.0
+
+ZSCORE_LABELS = {
+    'temperature': '温度の急変',
+    'pressure': '圧力の急変',
+    'vibration': '振動の急変',
+}
+
+TREND_LABELS = {
+    'temperature': '温度上昇傾向',
+    'pressure': '圧力上昇傾向',
+    'vibration': '振動増加傾向',
+}
+
+
+def parse_epoch_seconds(timestamp):
+    """ISO 8601 形式のタイムスタンプをエポック秒に変換（解析できない場合はNone）"""
+    try:
+        return datetime.fromisoformat(str(timestamp).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+class RollingWindow:
+    """1センサー分の固定長リングバッファと移動統計"""
+
+    __slots__ = ('values', 'times', 'ewmas', 'size', 'count', 'head', 'average', 'm2', 'ewma', 'alpha')
+
+    def __init__(self, size, alpha):
+        self.values = array('d', bytes(8 * size))
+        self.times = array('d', bytes(8 * size))
+        # 各値を追加した時点の EWMA（変化率の計算に使う）
+        self.ewmas = array('d', bytes(8 * size))
+        self.size = size
+        self.count = 0
+        self.head = 0
+        self.average = 0.0
+        # 平均からの偏差の二乗和
+        self.m2 = 0.0
+        self.ewma = None
+        self.alpha = alpha
+
+    def mean(self):
+        return self.average
+
+    def stddev(self):
+        if self.count < 2:
+            return 0.0
+        return math.sqrt(self.m2 / (self.count - 1)) if self.m2 > 0 else 0.0
+
+    def oldest(self):
+        """ウィンドウ内で最も古い (時刻, 値, EWMA)"""
+        index = (self.head - self.count) % self.size
+        return self.times[index], self.values[index], self.ewmas[index]
+
+    def push(self, epoch, value):
+        """値を追加（満杯の場合は最も古い値を押し出す）"""
+        if self.count == self.size:
+            # 押し出す値を置き換える Welford 法の更新
+            evicted = self.values[self.head]
+            previous = self.average
+            self.average += (value - evicted) / self.count
+            self.m2 += (value - evicted) * (value - self.average + evicted - previous)
+        else:
+            self.count += 1
+            delta = value - self.average
+            self.average += delta / self.count
+            self.m2 += delta * (value - self.average)
+        self.ewma = value if self.ewma is None else self.alpha * value + (1 - self.alpha) * self.ewma
+        self.values[self.head] = value
+        self.times[self.head] = epoch
+        self.ewmas[self.head] = self.ewma
+        self.head = (self.head + 1) % self.size
+        if self.head == 0 and self.count == self.size:
+            self._recompute()
+
+    def _recompute(self):
+        """バッファから平均と偏差の二乗和を計算し直す（ウィンドウ1周ごと、1件あたり O(1) 相当）"""
+        self.average = math.fsum(self.values) / self.count
+        self.m2 = math.fsum((value - self.average) ** 2 for value in self.values)
+
+
+class StreamingDetector:
+    """デバイスごとの移動統計に基づく傾向・外れ値検知"""
+
+    def __init__(self, window_size=60, min_samples=10, z_threshold=4.0, ewma_alpha=0.2,
+                 max_rates=None, min_stddevs=None, max_devices=10000, idle_seconds=3600, clock=time.monotonic):
+        self.window_size = window_size
+        self.min_samples = min_samples
+        self.z_threshold = z_threshold
+        self.ewma_alpha = ewma_alpha
+        self.max_rates = dict(DEFAULT_MAX_RATES, **(max_rates or {}))
+        self.min_stddevs = dict(DEFAULT_MIN_STDDEVS, **(min_stddevs or {}))
+        self.max_devices = max_devices
+        self.idle_seconds = idle_seconds
+        self.clock = clock
+        # deviceId -> (最終更新時刻, {sensorType: RollingWindow})、最終更新の古い順
+        self._devices = OrderedDict()
+
+    def __len__(self):
+        return len(self._devices)
+
+    def _windows_for(self, device_id, now):
+        entry = self._devices.pop(device_id, None)
+        windows = entry[1] if entry else {}
+        self._devices[device_id] = (now, windows)
+        self._evict(now)
+        return windows
+
+    def _evict(self, now):
+        """アイドル状態のデバイスと上限超過分を古い順に破棄"""
+        while self._devices:
+            device_id, (last_seen, _) = next(iter(self._devices.items()))
+            if len(self._devices) > self.max_devices or now - last_seen > self.idle_seconds:
+                del self._devices[device_id]
+            else:
+                break
+
+    def stats(self, device_id, sensor_type):
+        """現在の移動統計（未観測の場合はNone）"""
+        entry = self._devices.get(device_id)
+        window = entry[1].get(sensor_type) if entry else None
+        if window is None or window.count == 0:
+            return None
+        return {
+            "count": window.count,
+            "mean": window.mean(),
+            "stddev": window.stddev(),
+            "ewma": window.ewma,
+        }
+
+    def update(self, device_id, timestamp, sensor_data):
+        """
+        1件分のセンサー値で状態を更新し、検出したアラートを返す
+
+        Args:
+            device_id: デバイスID
+            timestamp: 計測時刻（ISO 8601、解析できない場合は受信時刻を使用）
+            sensor_data: {sensorType: 値}
+        """
+        now = self.clock()
+        epoch = parse_epoch_seconds(timestamp)
+        if epoch is None:
+            epoch = time.time()
+        windows = self._windows_for(device_id, now)
+        alerts = []
+
+        for sensor_type, max_rate in self.max_rates.items():
+            if sensor_type not in sensor_data:
+                continue
+            value = float(sensor_data[sensor_type])
+            window = windows.get(sensor_type)
+            if window is None:
+                window = windows[sensor_type] = RollingWindow(self.window_size, self.ewma_alpha)
+
+            min_stddev = self.min_stddevs.get(sensor_type, 0.0)
+            if window.count >= self.min_samples:
+                # Zスコア（追加前のウィンドウ統計と比較）
+                stddev = max(window.stddev(), min_stddev)
+                if stddev > 0:
+                    zscore = (value - window.mean()) / stddev
+                    if abs(zscore) > self.z_threshold:
+                        alerts.append(self._alert(
+                            f"{sensor_type}_zscore", device_id,
+                            f"{ZSCORE_LABELS[sensor_type]}: {value} (zスコア {zscore:.2f})"
+                        ))
+
+            window.push(epoch, value)
+
+            if window.count == window.size:
+                # 変化率（ウィンドウ先頭から現在までの EWMA の1分あたり変化量）
+                # 満杯になるまでは先頭の EWMA が初期値に近くノイズを平滑化できていないため判定しない
+                oldest_epoch, _, oldest_ewma = window.oldest()
+                elapsed_minutes = (epoch - oldest_epoch) / 60
+                rise = window.ewma - oldest_ewma
+                if elapsed_minutes > 0 and rise > TREND_MIN_RISE_STDDEVS * max(window.stddev(), min_stddev):
+                    rate = rise / elapsed_minutes
+                    if rate > max_rate:
+                        alerts.append(self._alert(
+                            f"{sensor_type}_trend", device_id,
+                            f"{TREND_LABELS[sensor_type]}: {rate:.2f}/分 (平均 {window.mean():.2f} → {value})"
+                        ))
+
+        return alerts
+
+    @staticmethod
+    def _alert(alert_type, device_id, message):
+        return {
+            "type": alert_type,
+            "deviceId": device_id,
+            "message": message,
+            "severity": "warning",
+            "timestamp": datetime.now().isoformat()
+        }
@@ -0,0 +1,250 @@
+"""
+HTTP キャッシュ（ETag / 条件付き GET / シリアライズ済みレスポンス）
+
+ダッシュボードは同じ一覧・サマリーを定期的に取得するが、設備の状態が変わらない間は
+内容も変わらない。データのバージョン番号とクエリから ETag を決め、
+If-None-Match が一致する場合はペイロードを組み立てずに 304 を返す。
+200 の場合も、(リソース, バージョン, クエリ) ごとに JSON をエンコード済みのバイト列を
+ResponseCache（容量上限付きの LRU）に保持し、2回目以降は json.dumps を行わない。
+
+レスポンスの timestamp は、そのバージョンのレスポンスを生成した時刻になる
+（キャッシュしたバイト列は ETag と1対1に対応し、同じ ETag のレスポンスは常に同じ内容）。
+
+圧縮（Accept-Encoding のネゴシエーション）:
+- COMPRESS_MIN_BYTES 以上の本文を br（brotli がインストールされている場合）または gzip で圧縮する
+- キャッシュしたレスポンスの圧縮結果は形式ごとに同じエントリーに保持し、2回目以降は圧縮しない
+- 圧縮したレスポンスの ETag は弱い ETag（W/）にする（無圧縮と同じバージョンを表す）
+
+標準ライブラリのみで動作する（simple_api.py からも利用するため）。brotli は任意で、
+インストールされていない場合は gzip のみを使う。
+
+環境変数:
+- API_CACHE_MAX_AGE: Cache-Control の max-age（秒、既定 0 = 毎回再検証）
+- API_RESPONSE_CACHE_MAX_BYTES: キャッシュするレスポンスの合計サイズの上限（既定 32MB、0 で無効）
+- API_RESPONSE_CACHE_MAX_ENTRIES: キャッシュするレスポンス数の上限（既定 1024）
+- API_COMPRESS_MIN_BYTES: 圧縮する本文の最小サイズ（既定 1024 バイト）
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CACHE_MAX_AGE = int(os.environ.get('API_CACHE_MAX_AGE', 0))
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('API_RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('API_RESPONSE_CACHE_MAX_ENTRIES', 1024))
+COMPRESS_MIN_BYTES = int(os.environ.get('API_COMPRESS_MIN_BYTES', 1024))
+# 圧縮レベル（キャッシュしないレスポンスは要求ごとに圧縮するため、速度との兼ね合いで中程度にする）
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+# 使用できる圧縮形式（同じ q 値の場合は先頭を優先する）
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+# バージョン番号はプロセスごとに 1 から数えるため、再起動前・別プロセスの ETag と区別する
+INSTANCE_ID = uuid.uuid4().hex[:8]
+
+
+def cache_control(max_age=None):
+    """Cache-Control ヘッダーの値（max_age が 0 の場合は毎回 ETag で再検証させる）"""
+    max_age = CACHE_MAX_AGE if max_age is None else max_age
+    if max_age > 0:
+        return f'private, max-age={max_age}, must-revalidate'
+    return 'no-cache'
+
+
+def normalize_query(params):
+    """
+    クエリパラメータを ETag・キャッシュキー用に正規化する
+
+    値が空のパラメータは未指定と同じ扱いとし、名前順に並べる。
+    params は {名前: 値} または {名前: [値, ...]}（parse_qs の形式）。
+    """
+    items = []
+    for name, value in params.items():
+        values = value if isinstance(value, (list, tuple)) else [value]
+        items.extend((name, str(item)) for item in values if item not in (None, ''))
+    return tuple(sorted(items))
+
+
+def make_etag(resource, version, query=()):
+    """
+    リソース名・データのバージョン・正規化したクエリから強い ETag（引用符なし）を作る
+
+    同じプロセス・同じバージョン・同じクエリのレスポンスは同じ内容を表す。
+    """
+    digest = hashlib.sha1(repr(query).encode('utf-8')).hexdigest()[:12] if query else '0'
+    return f'{resource}-{INSTANCE_ID}.{version}-{digest}'
+
+
+def if_none_match(header, etag):
+    """
+    If-None-Match ヘッダーが etag（引用符なし）に一致するか
+
+    If-None-Match は弱い比較（W/ の有無を問わない）で判定する。
+    """
+    if not header:
+        return False
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate.strip('"') == etag:
+            return True
+    return False
+
+
+def encode_json(payload):
+    """JSON レスポンスの本文（UTF-8）"""
+    return json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+
+def negotiate_encoding(accept_encoding, encodings=ENCODINGS):
+    """
+    Accept-Encoding から圧縮形式を選ぶ（圧縮しない場合は None）
+
+    q 値の最も大きい形式を選び、q=0 の形式は使わない。* は明示されていない形式に適用する。
+    """
+    if not accept_encoding:
+        return None
+    qualities = {}
+    for item in accept_encoding.split(','):
+        name, *params = item.split(';')
+        name = name.strip().lower()
+        quality = 1.0
+        for param in params:
+            param = param.strip()
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if name:
+            qualities[name] = quality
+    best = None
+    best_quality = 0.0
+    for encoding in encodings:
+        quality = qualities.get(encoding, qualities.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def choose_encoding(accept_encoding, size):
+    """本文の大きさと Accept-Encoding から圧縮形式を選ぶ（小さい本文は圧縮しない）"""
+    if size < COMPRESS_MIN_BYTES:
+        return None
+    return negotiate_encoding(accept_encoding)
+
+
+def compress(body, encoding):
+    if encoding == 'gzip':
+        # mtime を固定し、同じ本文からは同じバイト列を作る
+        return gzip.compress(body, GZIP_LEVEL, mtime=0)
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    raise ValueError(f"未対応の圧縮形式です: {encoding}")
+
+
+class CachedResponse:
+    """エンコード済みのレスポンス本文と ETag（圧縮した本文も形式ごとに保持する）"""
+
+    __slots__ = ('key', 'body', 'etag', 'compressed')
+
+    def __init__(self, key, body, etag):
+        self.key = key
+        self.body = body
+        self.etag = etag
+        self.compressed = {}
+
+    @property
+    def size(self):
+        return len(self.body) + sum(len(body) for body in self.compressed.values())
+
+
+class ResponseCache:
+    """
+    エンコード済みレスポンスの LRU キャッシュ
+
+    キーは (リソース名, データのバージョン, 正規化したクエリ)。
+    データが更新されるとバージョンが変わり、古いキーは参照されなくなって LRU で追い出される。
+    """
+
+    def __init__(self, max_bytes=RESPONSE_CACHE_MAX_BYTES, max_entries=RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(resource, version, query=()):
+        return resource, version, query
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, payload):
+        """payload をエンコードして保持し、CachedResponse を返す（上限を超える本文は保持しない）"""
+        entry = CachedResponse(key, encode_json(payload), make_etag(*key))
+        size = len(entry.body)
+        if size > self.max_bytes or self.max_entries <= 0:
+            return entry
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous.size
+            self._entries[key] = entry
+            self.size += size
+            self._evict()
+        return entry
+
+    def _evict(self):
+        while self.size > self.max_bytes or len(self._entries) > self.max_entries:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= evicted.size
+
+    def compressed(self, entry, encoding):
+        """entry の本文を encoding で圧縮したもの（キャッシュ中のエントリーは圧縮結果も保持する）"""
+        body = entry.compressed.get(encoding)
+        if body is not None:
+            return body
+        body = compress(entry.body, encoding)
+        with self._lock:
+            if self._entries.get(entry.key) is entry and encoding not in entry.compressed:
+                entry.compressed[encoding] = body
+                self.size += len(body)
+                self._evict()
+        return body
+
+    def get_or_build(self, key, build):
+        """キャッシュにあればそれを、なければ build() のペイロードをエンコードして返す"""
+        entry = self.get(key)
+        if entry is None:
+            entry = self.put(key, build())
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
@@ -0,0 +1,241 @@
+"""
+ルーティングテーブル（simple_api.py / app.py 共通）
+
+API のパスは API_ROUTES に1か所で定義し、simple_api.py は Router で、
+app.py は flask_rule() で Flask のルールに変換して登録する。
+
+Router はルートの登録時にパターンを解析しておき、リクエストごとには
+- パラメータのないパスは辞書で1回の検索
+- パラメータを含むパスはセグメント単位のトライ木をたどる（固定のセグメントを優先）
+で解決する。パラメータの型変換（{equipment_id:int} など）もマッチ時に1回だけ行い、
+パラメータを含むパスの解決結果はパスごとに保持して、同じパスの2回目以降は辞書の検索だけで返す
+（ダッシュボードは同じ設備 ID のパスを繰り返し取得する）。
+
+パスの末尾のスラッシュは無視する（/api/equipment/ は /api/equipment と同じ）。
+
+標準ライブラリのみで動作する（simple_api.py からも利用するため）。
+"""
+
+import re
+
+# 名前: (メソッド, パターン)
+API_ROUTES = {
+    'health': ('GET', '/api/health'),
+    'equipment_list': ('GET', '/api/equipment'),
+    'equipment_detail': ('GET', '/api/equipment/{equipment_id:int}'),
+    'equipment_summary': ('GET', '/api/equipment/summary'),
+    'equipment_status': ('PUT', '/api/equipment/{equipment_id:int}/status'),
+    'alerts': ('GET', '/api/alerts'),
+    'create_alerts': ('POST', '/api/alerts'),
+    'sensor_data': ('GET', '/api/sensor-data/{equipment_id:int}'),
+    'append_sensor_data': ('POST', '/api/sensor-data/{equipment_id:int}'),
+    'stream': ('GET', '/api/stream'),
+}
+
+
+def _to_int(value):
+    """0 以上の整数（Flask の int コンバーターと同じく、符号・全角数字などは受け付けない）"""
+    if not (value.isascii() and value.isdigit()):
+        raise ValueError(value)
+    return int(value)
+
+
+# パラメータの型: (変換関数, Flask のコンバーター名)
+CONVERTERS = {
+    'int': (_to_int, 'int'),
+    'str': (str, 'string'),
+}
+
+_PARAMETER = re.compile(r'^\{(\w+)(?::(\w+))?\}$')
+# 解決結果を保持するパスの数（超えたら破棄して保持し直す）
+MATCH_CACHE_SIZE = 1024
+
+
+class RouteError(Exception):
+    """ルートを解決できない"""
+
+
+class RouteNotFound(RouteError):
+    """パスに一致するルートがない"""
+
+
+class MethodNotAllowed(RouteError):
+    """パスには一致するが、メソッドが登録されていない"""
+
+    def __init__(self, allowed):
+        super().__init__(f"許可されていないメソッドです（{', '.join(sorted(allowed))}）")
+        self.allowed = allowed
+
+
+class InvalidParameter(RouteError):
+    """パスのパラメータを型変換できない（/api/equipment/abc など）"""
+
+    def __init__(self, name, value):
+        super().__init__(f"パラメータ {name} の値が無効です: {value}")
+        self.name = name
+        self.value = value
+
+
+def split_path(path):
+    """パスをセグメントに分割する（先頭・末尾・連続するスラッシュは無視する）"""
+    segments = path.strip('/').split('/')
+    if '' in segments:
+        segments = [segment for segment in segments if segment]
+    return segments
+
+
+def parse_segment(segment):
+    """パターンのセグメントを (パラメータ名, 変換関数) に変換する（固定のセグメントは None）"""
+    match = _PARAMETER.match(segment)
+    if match is None:
+        return None
+    name, type_name = match.group(1), match.group(2) or 'str'
+    if type_name not in CONVERTERS:
+        raise ValueError(f"未対応のパラメータ型です: {type_name}")
+    return name, CONVERTERS[type_name][0]
+
+
+def flask_rule(pattern):
+    """パターンを Flask のルールに変換する（{equipment_id:int} → <int:equipment_id>）"""
+    segments = []
+    for segment in split_path(pattern):
+        match = _PARAMETER.match(segment)
+        if match is None:
+            segments.append(segment)
+        else:
+            segments.append(f"<{CONVERTERS[match.group(2) or 'str'][1]}:{match.group(1)}>")
+    return '/' + '/'.join(segments)
+
+
+class _Node:
+    """トライ木のノード（セグメント1つ分）"""
+
+    __slots__ = ('children', 'parameter', 'handlers')
+
+    def __init__(self):
+        self.children = {}
+        # (パラメータ名, 変換関数, 子ノード)
+        self.parameter = None
+        # {メソッド: ハンドラー}
+        self.handlers = {}
+
+
+class Router:
+    """メソッドとパスからハンドラーとパラメータを解決する"""
+
+    def __init__(self, cache_size=MATCH_CACHE_SIZE):
+        # 正規化したパス → {メソッド: ハンドラー}（パラメータのないルート）
+        self._static = {}
+        self._root = _Node()
+        # パス → ({メソッド: ハンドラー}, パラメータ) または解決できなかった場合の RouteError
+        self._matches = {}
+        self.cache_size = cache_size
+
+    def add(self, method, pattern, handler):
+        segments = split_path(pattern)
+        parsed = [parse_segment(segment) for segment in segments]
+        if not any(parsed):
+            self._static.setdefault('/' + '/'.join(segments), {})[method] = handler
+        node = self._root
+        for segment, parameter in zip(segments, parsed):
+            if parameter is None:
+                node = node.children.setdefault(segment, _Node())
+                continue
+            name, convert = parameter
+            if node.parameter is None:
+                node.parameter = (name, convert, _Node())
+            elif node.parameter[:2] != (name, convert):
+                raise ValueError(f"同じ位置に異なるパラメータがあります: {pattern}")
+            node = node.parameter[2]
+        node.handlers[method] = handler
+        self._matches.clear()
+
+    def match(self, method, path):
+        """
+        (ハンドラー, {パラメータ名: 変換済みの値}) を返す
+
+        Raises:
+            RouteNotFound: 一致するパスがない
+            MethodNotAllowed: パスには一致するがメソッドが登録されていない
+            InvalidParameter: パラメータの位置に型変換できない値がある
+        """
+        handlers = self._static.get(path)
+        params = {}
+        if handlers is None:
+            matched = self._matches.get(path)
+            if matched is None:
+                try:
+                    matched = self._resolve(path)
+                except RouteError as e:
+                    matched = e
+                if len(self._matches) >= self.cache_size:
+                    self._matches.clear()
+                self._matches[path] = matched
+            if isinstance(matched, RouteError):
+                raise matched.with_traceback(None)
+            handlers, params = matched
+        handler = handlers.get(method)
+        if handler is None:
+            raise MethodNotAllowed(handlers)
+        # 保持している解決結果を呼び出し側が変更しないようにコピーを返す
+        return handler, dict(params)
+
+    def _resolve(self, path):
+        """パスを ({メソッド: ハンドラー}, パラメータ) に解決する"""
+        if path.endswith('/'):
+            handlers = self._static.get(path.rstrip('/') or '/')
+            if handlers is not None:
+                return handlers, {}
+        segments = split_path(path)
+        params = {}
+        node = self._walk(segments, params)
+        if node is None:
+            params = {}
+            invalid = []
+            node = self._find(self._root, segments, 0, params, invalid)
+            if node is None:
+                if invalid:
+                    raise InvalidParameter(*invalid[0])
+                raise RouteNotFound(path)
+        return node.handlers, params
+
+    def _walk(self, segments, params):
+        """後戻りせずにトライ木をたどる（一致しない場合は None を返し、_find で探し直す）"""
+        node = self._root
+        for segment in segments:
+            child = node.children.get(segment)
+            if child is None:
+                if node.parameter is None:
+                    return None
+                name, convert, child = node.parameter
+                try:
+                    params[name] = convert(segment)
+                except ValueError:
+                    return None
+            node = child
+        return node if node.handlers else None
+
+    def _find(self, node, segments, index, params, invalid):
+        """segments[index:] に一致するハンドラー付きのノードを探す（固定のセグメントを優先して後戻りする）"""
+        if index == len(segments):
+            return node if node.handlers else None
+        segment = segments[index]
+        child = node.children.get(segment)
+        if child is not None:
+            found = self._find(child, segments, index + 1, params, invalid)
+            if found is not None:
+                return found
+        if node.parameter is not None:
+            name, convert, child = node.parameter
+            try:
+                value = convert(segment)
+            except ValueError:
+                # 残りのパスが一致する場合のみ、404 ではなくパラメータの誤りとする
+                if self._find(child, segments, index + 1, {}, []) is not None:
+                    invalid.append((name, segment))
+                return None
+            found = self._find(child, segments, index + 1, params, invalid)
+            if found is not None:
+                params[name] = value
+                return found
+        return None
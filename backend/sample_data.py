@@ -0,0 +1,151 @@
+"""
+設備・アラートのサンプルデータ（app.py / simple_api.py で共有）
+"""
+
+from datetime import datetime, timedelta
+
+SAMPLE_EQUIPMENT = [
+    {
+        "id": 1,
+        "name": "射出成形機-1",
+        "type": "射出成形機",
+        "status": "running",
+        "location": "ライン A",
+        "operatingHours": 2450,
+        "lastMaintenance": "2024-01-15",
+        "temperature": 75,
+        "pressure": 82,
+        "vibration": 4.2,
+        "history": [
+            {"id": 1, "timestamp": "2024-01-20 10:30", "event": "稼働開始"},
+            {"id": 2, "timestamp": "2024-01-15 15:00", "event": "定期メンテナンス完了"}
+        ]
+    },
+    {
+        "id": 2,
+        "name": "射出成形機-2",
+        "type": "射出成形機",
+        "status": "running",
+        "location": "ライン A",
+        "operatingHours": 2380,
+        "lastMaintenance": "2024-01-10",
+        "temperature": 78,
+        "pressure": 85,
+        "vibration": 3.8,
+        "history": [
+            {"id": 1, "timestamp": "2024-01-20 09:15", "event": "稼働開始"},
+            {"id": 2, "timestamp": "2024-01-10 14:30", "event": "定期メンテナンス完了"}
+        ]
+    },
+    {
+        "id": 3,
+        "name": "組立ロボット-1",
+        "type": "組立ロボット",
+        "status": "idle",
+        "location": "ライン B",
+        "operatingHours": 1680,
+        "lastMaintenance": "2024-01-05",
+        "temperature": 45,
+        "pressure": 65,
+        "vibration": 2.1,
+        "history": [
+            {"id": 1, "timestamp": "2024-01-20 11:00", "event": "待機状態"},
+            {"id": 2, "timestamp": "2024-01-05 16:45", "event": "定期メンテナンス完了"}
+        ]
+    },
+    {
+        "id": 4,
+        "name": "組立ロボット-2",
+        "type": "組立ロボット",
+        "status": "running",
+        "location": "ライン B",
+        "operatingHours": 1720,
+        "lastMaintenance": "2024-01-08",
+        "temperature": 52,
+        "pressure": 72,
+        "vibration": 2.8,
+        "history": [
+            {"id": 1, "timestamp": "2024-01-20 08:30", "event": "稼働開始"},
+            {"id": 2, "timestamp": "2024-01-08 13:20", "event": "定期メンテナンス完了"}
+        ]
+    },
+    {
+        "id": 5,
+        "name": "検査装置-1",
+        "type": "検査装置",
+        "status": "maintenance",
+        "location": "ライン C",
+        "operatingHours": 3200,
+        "lastMaintenance": "2024-01-20",
+        "temperature": 35,
+        "pressure": 0,
+        "vibration": 0,
+        "history": [
+            {"id": 1, "timestamp": "2024-01-20 13:00", "event": "メンテナンス開始"},
+            {"id": 2, "timestamp": "2024-01-18 17:30", "event": "稼働停止"}
+        ]
+    },
+    {
+        "id": 6,
+        "name": "コンプレッサー-1",
+        "type": "コンプレッサー",
+        "status": "running",
+        "location": "共通設備",
+        "operatingHours": 5680,
+        "lastMaintenance": "2023-12-20",
+        "temperature": 68,
+        "pressure": 88,
+        "vibration": 5.2,
+        "history": [
+            {"id": 1, "timestamp": "2024-01-01 00:00", "event": "連続稼働中"},
+            {"id": 2, "timestamp": "2023-12-20 10:00", "event": "定期メンテナンス完了"}
+        ]
+    },
+    {
+        "id": 7,
+        "name": "コンプレッサー-2",
+        "type": "コンプレッサー",
+        "status": "error",
+        "location": "共通設備",
+        "operatingHours": 5420,
+        "lastMaintenance": "2023-12-15",
+        "temperature": 95,
+        "pressure": 102,
+        "vibration": 8.5,
+        "history": [
+            {"id": 1, "timestamp": "2024-01-20 14:25", "event": "温度異常検出"},
+            {"id": 2, "timestamp": "2024-01-20 14:20", "event": "アラート発生"}
+        ]
+    }
+]
+
+# アラートの発生時刻は読み込み時点からの相対時刻
+SAMPLE_ALERTS = [
+    {
+        "id": 1,
+        "timestamp": (datetime.now() - timedelta(minutes=5)).isoformat(),
+        "message": "温度異常が検出されました",
+        "equipmentName": "コンプレッサー-2",
+        "equipmentId": 7,
+        "severity": "error",
+        "status": "active"
+    },
+    {
+        "id": 2,
+        "timestamp": (datetime.now() - timedelta(minutes=30)).isoformat(),
+        "message": "メンテナンス時期に到達しました",
+        "equipmentName": "検査装置-1",
+        "equipmentId": 5,
+        "severity": "warning",
+        "status": "active"
+    },
+    {
+        "id": 3,
+        "timestamp": (datetime.now() - timedelta(hours=2)).isoformat(),
+        "message": "センサー通信エラー",
+        "equipmentName": "組立ロボット-1",
+        "equipmentId": 3,
+        "severity": "warning",
+        "status": "resolved"
+    }
+]
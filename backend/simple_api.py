@@ -4,71 +4,174 @@
 """
 
 from http.server import BaseHTTPRequestHandler, HTTPServer
+import os
+import queue
+import threading
 import json
 import urllib.parse
-from datetime import datetime, timedelta
-import random
+from datetime import datetime
+
+from data_layer import is_valid_alert, parse_alert_limit, shared_data_layer
+from downsampling import DownsampleError, parse_downsample_params
+from equipment_repository import SUMMARY_STATUSES
+from http_cache import (
+    ResponseCache, cache_control, choose_encoding, compress, encode_json, if_none_match, make_etag, normalize_query
+)
+from router import API_ROUTES, MethodNotAllowed, RouteError, Router
+from timeseries_store import (
+    INVALID_READINGS_ERROR, TimeRangeError, create_store, format_timestamp, parse_time_range, readings_from_body
+)
+
+# 設備・アラートは app.py と共通のデータ層から読む（起動時に1回だけ読み込み、要求ごとに組み立てない）
+data_layer = shared_data_layer()
+equipment_repository = data_layer.equipment
+alert_log = data_layer.alerts
+# センサーデータは app.py と同じ時系列ストア（SENSOR_DATA_PATH）から取得
+sensor_store = create_store()
+# エンコード済みレスポンスのキャッシュ（app.py と同じく (リソース, バージョン, クエリ) ごと）
+response_cache = ResponseCache()
+# 同時接続数の上限（ワーカースレッド数の上限。超えた接続には 503 を返す）
+MAX_CONNECTIONS = int(os.environ.get('SIMPLE_API_MAX_CONNECTIONS', 128))
+# keep-alive の接続で次のリクエストを待つ時間（秒）。リクエストの受信が途中で止まった場合もこの時間で切断する
+KEEPALIVE_TIMEOUT = float(os.environ.get('SIMPLE_API_KEEPALIVE_TIMEOUT', 15))
 
 class APIHandler(BaseHTTPRequestHandler):
+    # keep-alive（レスポンスは常に Content-Length 付きで返す）
+    protocol_version = 'HTTP/1.1'
+    timeout = KEEPALIVE_TIMEOUT
+    # ヘッダーと本文を別々に書き込むため、keep-alive の接続では Nagle アルゴリズムと
+    # 遅延 ACK の組み合わせで応答ごとに約 40ms 待たされる
+    disable_nagle_algorithm = True
     
     def do_OPTIONS(self):
         """CORS preflight request handling"""
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Methods', ALLOWED_METHODS)
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Content-Length', '0')
         self.end_headers()
     
     def do_GET(self):
         """GET request handling"""
+        self.dispatch('GET')
+    
+    def do_POST(self):
+        """POST request handling"""
+        self.dispatch('POST')
+    
+    def do_PUT(self):
+        """PUT request handling"""
+        self.dispatch('PUT')
+    
+    def dispatch(self, method):
+        """ルーティングテーブルからハンドラーを解決して呼び出す"""
         # URLパスを解析
-        parsed_path = urllib.parse.urlparse(self.path)
-        path = parsed_path.path
-        query_params = urllib.parse.parse_qs(parsed_path.query)
+        path, _, query = self.path.partition('?')
+        query_params = urllib.parse.parse_qs(query)
         
         try:
-            if path == '/api/health':
-                self.handle_health()
-            elif path == '/api/equipment':
-                self.handle_equipment_list(query_params)
-            elif path.startswith('/api/equipment/') and path.endswith('/'):
-                # Remove trailing slash and try again
-                path = path.rstrip('/')
-                if path.startswith('/api/equipment/') and path != '/api/equipment':
-                    equipment_id = path.split('/')[-1]
-                    if equipment_id == 'summary':
-                        self.handle_equipment_summary()
-                    else:
-                        self.handle_equipment_detail(equipment_id)
-                else:
-                    self.send_error(404)
-            elif path.startswith('/api/equipment/') and path != '/api/equipment':
-                equipment_id = path.split('/')[-1]
-                if equipment_id == 'summary':
-                    self.handle_equipment_summary()
-                else:
-                    self.handle_equipment_detail(equipment_id)
-            elif path == '/api/alerts':
-                self.handle_alerts(query_params)
-            elif path.startswith('/api/sensor-data/'):
-                equipment_id = path.split('/')[-1]
-                self.handle_sensor_data(equipment_id)
-            else:
-                self.send_error(404)
+            # keep-alive の接続で次のリクエストと混ざらないよう、ルートの解決前に本文を読み切る
+            length = self.content_length()
+            if length is None:
+                # 本文の終わりが分からないため、応答後に接続を閉じる
+                self.close_connection = True
+                self.send_json_response({'error': 'Content-Length が無効です'}, 400)
+                return
+            self.json_body = self.read_json_body(length)
+            try:
+                handler, params = ROUTER.match(method, path)
+            except MethodNotAllowed as e:
+                self.send_response(405)
+                self.send_header('Allow', ', '.join(sorted(e.allowed)))
+                self.send_header('Access-Control-Allow-Origin', '*')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            except RouteError:
+                # app.py（Flask）と同じく、型変換できないパラメータ（/api/equipment/abc）も 404
+                self.send_json_response({'error': NOT_FOUND_ERROR}, 404)
+                return
+            handler(self, query_params, **params)
         except Exception as e:
             print(f"Error handling request: {e}")
             self.send_error(500)
     
-    def send_json_response(self, data, status_code=200):
-        """JSONレスポンスを送信"""
+    def content_length(self):
+        """Content-Length の値（ヘッダーがない場合は 0、数値でない・負の場合は None）"""
+        value = self.headers.get('Content-Length')
+        if not value:
+            return 0
+        try:
+            length = int(value)
+        except ValueError:
+            return None
+        return length if length >= 0 else None
+    
+    def read_json_body(self, length):
+        """リクエストの本文を JSON として読む（本文がない・解析できない場合は None）"""
+        if length <= 0:
+            return None
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return None
+    
+    def send_json_response(self, data, status_code=200, cache_key=None):
+        """JSONレスポンスを送信（cache_key を指定した場合はエンコード済みの本文をキャッシュする）"""
+        if cache_key is not None and status_code == 200:
+            self.send_cached_body(response_cache.put(cache_key, data))
+            return
+        body = encode_json(data)
+        encoding = choose_encoding(self.headers.get('Accept-Encoding'), len(body))
+        if encoding:
+            body = compress(body, encoding)
+        self.send_body(body, status_code, encoding=encoding)
+    
+    def send_cached_response(self, cache_key):
+        """
+        キャッシュ済みのレスポンスを送信（送信した場合は True）
+        
+        If-None-Match が ETag と一致する場合は本文なしの 304 を返す。
+        """
+        etag = make_etag(*cache_key)
+        if if_none_match(self.headers.get('If-None-Match'), etag):
+            self.send_response(304)
+            self.send_header('ETag', f'"{etag}"')
+            self.send_header('Cache-Control', cache_control())
+            self.send_header('Vary', 'Accept-Encoding')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            return True
+        cached = response_cache.get(cache_key)
+        if cached is None:
+            return False
+        self.send_cached_body(cached)
+        return True
+    
+    def send_cached_body(self, cached):
+        """キャッシュのエントリーを送信（圧縮する場合は圧縮済みの本文を再利用する）"""
+        encoding = choose_encoding(self.headers.get('Accept-Encoding'), len(cached.body))
+        body = response_cache.compressed(cached, encoding) if encoding else cached.body
+        self.send_body(body, 200, cached.etag, encoding)
+    
+    def send_body(self, body, status_code=200, etag=None, encoding=None):
+        """本文を送信（encoding は圧縮済みの本文の形式）"""
         self.send_response(status_code)
         self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Vary', 'Accept-Encoding')
         self.send_header('Access-Control-Allow-Origin', '*')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        if etag is not None:
+            # 圧縮した表現は無圧縮と同じバージョンを表す弱い ETag にする
+            self.send_header('ETag', f'W/"{etag}"' if encoding else f'"{etag}"')
+            self.send_header('Cache-Control', cache_control())
         self.end_headers()
-        response_json = json.dumps(data, ensure_ascii=False)
-        self.wfile.write(response_json.encode('utf-8'))
+        self.wfile.write(body)
     
-    def handle_health(self):
+    def handle_health(self, query_params):
         """ヘルスチェック"""
         response = {
             'status': 'healthy',
@@ -79,295 +182,268 @@ class APIHandler(BaseHTTPRequestHandler):
     
     def handle_equipment_list(self, query_params):
         """設備一覧取得"""
-        # サンプルデータ
-        equipment_data = [
-            {
-                "id": 1,
-                "name": "射出成形機-1",
-                "type": "射出成形機",
-                "status": "running",
-                "location": "ライン A",
-                "operatingHours": 2450,
-                "lastMaintenance": "2024-01-15",
-                "temperature": 75,
-                "pressure": 82,
-                "vibration": 4.2,
-                "history": [
-                    {"id": 1, "timestamp": "2024-01-20 10:30", "event": "稼働開始"},
-                    {"id": 2, "timestamp": "2024-01-15 15:00", "event": "定期メンテナンス完了"}
-                ]
-            },
-            {
-                "id": 2,
-                "name": "射出成形機-2",
-                "type": "射出成形機",
-                "status": "running",
-                "location": "ライン A",
-                "operatingHours": 2380,
-                "lastMaintenance": "2024-01-10",
-                "temperature": 78,
-                "pressure": 85,
-                "vibration": 3.8,
-                "history": [
-                    {"id": 1, "timestamp": "2024-01-20 09:15", "event": "稼働開始"},
-                    {"id": 2, "timestamp": "2024-01-10 14:30", "event": "定期メンテナンス完了"}
-                ]
-            },
-            {
-                "id": 3,
-                "name": "組立ロボット-1",
-                "type": "組立ロボット",
-                "status": "idle",
-                "location": "ライン B",
-                "operatingHours": 1680,
-                "lastMaintenance": "2024-01-05",
-                "temperature": 45,
-                "pressure": 65,
-                "vibration": 2.1,
-                "history": [
-                    {"id": 1, "timestamp": "2024-01-20 11:00", "event": "待機状態"},
-                    {"id": 2, "timestamp": "2024-01-05 16:45", "event": "定期メンテナンス完了"}
-                ]
-            },
-            {
-                "id": 4,
-                "name": "組立ロボット-2",
-                "type": "組立ロボット",
-                "status": "running",
-                "location": "ライン B",
-                "operatingHours": 1720,
-                "lastMaintenance": "2024-01-08",
-                "temperature": 52,
-                "pressure": 72,
-                "vibration": 2.8,
-                "history": [
-                    {"id": 1, "timestamp": "2024-01-20 08:30", "event": "稼働開始"},
-                    {"id": 2, "timestamp": "2024-01-08 13:20", "event": "定期メンテナンス完了"}
-                ]
-            },
-            {
-                "id": 5,
-                "name": "検査装置-1",
-                "type": "検査装置",
-                "status": "maintenance",
-                "location": "ライン C",
-                "operatingHours": 3200,
-                "lastMaintenance": "2024-01-20",
-                "temperature": 35,
-                "pressure": 0,
-                "vibration": 0,
-                "history": [
-                    {"id": 1, "timestamp": "2024-01-20 13:00", "event": "メンテナンス開始"},
-                    {"id": 2, "timestamp": "2024-01-18 17:30", "event": "稼働停止"}
-                ]
-            },
-            {
-                "id": 6,
-                "name": "コンプレッサー-1",
-                "type": "コンプレッサー",
-                "status": "running",
-                "location": "共通設備",
-                "operatingHours": 5680,
-                "lastMaintenance": "2023-12-20",
-                "temperature": 68,
-                "pressure": 88,
-                "vibration": 5.2,
-                "history": [
-                    {"id": 1, "timestamp": "2024-01-01 00:00", "event": "連続稼働中"},
-                    {"id": 2, "timestamp": "2023-12-20 10:00", "event": "定期メンテナンス完了"}
-                ]
-            },
-            {
-                "id": 7,
-                "name": "コンプレッサー-2",
-                "type": "コンプレッサー",
-                "status": "error",
-                "location": "共通設備",
-                "operatingHours": 5420,
-                "lastMaintenance": "2023-12-15",
-                "temperature": 95,
-                "pressure": 102,
-                "vibration": 8.5,
-                "history": [
-                    {"id": 1, "timestamp": "2024-01-20 14:25", "event": "温度異常検出"},
-                    {"id": 2, "timestamp": "2024-01-20 14:20", "event": "アラート発生"}
-                ]
-            }
-        ]
-        
-        # フィルタリング
-        filtered_equipment = equipment_data
-        if 'location' in query_params and query_params['location'][0]:
-            location = query_params['location'][0]
-            filtered_equipment = [eq for eq in filtered_equipment if eq['location'] == location]
+        cache_key = response_cache.key('equipment', equipment_repository.version, normalize_query(query_params))
+        if self.send_cached_response(cache_key):
+            return
         
-        if 'status' in query_params and query_params['status'][0]:
-            status = query_params['status'][0]
-            filtered_equipment = [eq for eq in filtered_equipment if eq['status'] == status]
+        param = lambda name: query_params.get(name, [None])[0] or None
+        filtered_equipment = equipment_repository.list(
+            location=param('location'),
+            status=param('status'),
+            equipment_type=param('type')
+        )
         
         response = {
             'equipment': filtered_equipment,
             'total': len(filtered_equipment),
             'timestamp': datetime.now().isoformat()
         }
-        self.send_json_response(response)
+        self.send_json_response(response, cache_key=cache_key)
     
-    def handle_equipment_detail(self, equipment_id):
-        """設備詳細取得"""
-        # サンプルデータから検索
-        equipment_data = [
-            {
-                "id": 1,
-                "name": "射出成形機-1",
-                "type": "射出成形機",
-                "status": "running",
-                "location": "ライン A",
-                "operatingHours": 2450,
-                "lastMaintenance": "2024-01-15",
-                "temperature": 75,
-                "pressure": 82,
-                "vibration": 4.2,
-                "history": [
-                    {"id": 1, "timestamp": "2024-01-20 10:30", "event": "稼働開始"},
-                    {"id": 2, "timestamp": "2024-01-15 15:00", "event": "定期メンテナンス完了"}
-                ]
-            }
-        ]
+    def handle_equipment_detail(self, query_params, equipment_id):
+        """設備詳細取得（存在しない設備は If-None-Match によらず 404）"""
+        equipment = equipment_repository.get(equipment_id)
+        if not equipment:
+            self.send_json_response({'error': '設備が見つかりません'}, 404)
+            return
         
-        try:
-            eq_id = int(equipment_id)
-            equipment = next((eq for eq in equipment_data if eq['id'] == eq_id), None)
-            
-            if equipment:
-                response = {
-                    'equipment': equipment,
-                    'timestamp': datetime.now().isoformat()
-                }
-                self.send_json_response(response)
-            else:
-                self.send_json_response({'error': '設備が見つかりません'}, 404)
-        except ValueError:
-            self.send_json_response({'error': '無効な設備IDです'}, 400)
+        cache_key = response_cache.key(f'equipment{equipment_id}', equipment_repository.version)
+        if self.send_cached_response(cache_key):
+            return
+        
+        response = {
+            'equipment': equipment,
+            'timestamp': datetime.now().isoformat()
+        }
+        self.send_json_response(response, cache_key=cache_key)
     
-    def handle_equipment_summary(self):
+    def handle_equipment_summary(self, query_params):
         """設備サマリー取得"""
+        cache_key = response_cache.key('summary', equipment_repository.version, normalize_query(query_params))
+        if self.send_cached_response(cache_key):
+            return
+        
+        location = query_params.get('location', [None])[0] or None
+        equipment_type = query_params.get('type', [None])[0] or None
+        breakdown = query_params.get('breakdown', [''])[0].lower() in ('1', 'true')
         response = {
-            'summary': {
-                'total': 7,
-                'running': 4,
-                'idle': 1,
-                'maintenance': 1,
-                'error': 1
-            },
+            'summary': equipment_repository.summary(location, equipment_type, breakdown),
+            'timestamp': datetime.now().isoformat()
+        }
+        self.send_json_response(response, cache_key=cache_key)
+    
+    def handle_equipment_status(self, query_params, equipment_id):
+        """設備の状態を変更"""
+        status = (self.json_body if isinstance(self.json_body, dict) else {}).get('status')
+        if status not in SUMMARY_STATUSES:
+            self.send_json_response({'error': f"status は {' / '.join(SUMMARY_STATUSES)} のいずれかを指定してください"}, 400)
+            return
+        
+        equipment = equipment_repository.update_status(equipment_id, status)
+        if equipment is None:
+            self.send_json_response({'error': '設備が見つかりません'}, 404)
+            return
+        
+        response = {
+            'equipment': equipment,
             'timestamp': datetime.now().isoformat()
         }
         self.send_json_response(response)
     
     def handle_alerts(self, query_params):
         """アラート一覧取得"""
-        alerts_data = [
-            {
-                "id": 1,
-                "timestamp": (datetime.now() - timedelta(minutes=5)).isoformat(),
-                "message": "温度異常が検出されました",
-                "equipmentName": "コンプレッサー-2",
-                "equipmentId": 7,
-                "severity": "error",
-                "status": "active"
-            },
-            {
-                "id": 2,
-                "timestamp": (datetime.now() - timedelta(minutes=30)).isoformat(),
-                "message": "メンテナンス時期に到達しました",
-                "equipmentName": "検査装置-1",
-                "equipmentId": 5,
-                "severity": "warning",
-                "status": "active"
-            }
-        ]
+        cache_key = response_cache.key('alerts', alert_log.version, normalize_query(query_params))
+        if self.send_cached_response(cache_key):
+            return
         
-        # フィルタリング
-        filtered_alerts = alerts_data
-        if 'severity' in query_params and query_params['severity'][0]:
-            severity = query_params['severity'][0]
-            filtered_alerts = [alert for alert in filtered_alerts if alert['severity'] == severity]
+        # 最新のアラートから指定件数を返す（status 未指定時は active のみ、all で全件）
+        param = lambda name: query_params.get(name, [None])[0]
+        filtered_alerts = alert_log.list(param('severity'), param('status'), parse_alert_limit(param('limit')))
         
-        if 'status' in query_params and query_params['status'][0]:
-            status = query_params['status'][0]
-            filtered_alerts = [alert for alert in filtered_alerts if alert['status'] == status]
+        response = {
+            'alerts': filtered_alerts,
+            'total': len(filtered_alerts),
+            'timestamp': datetime.now().isoformat()
+        }
+        self.send_json_response(response, cache_key=cache_key)
+    
+    def handle_create_alerts(self, query_params):
+        """アラート登録（1件または配列）"""
+        body = self.json_body
+        alerts = body if isinstance(body, list) else [body]
+        if not alerts or not all(is_valid_alert(alert) for alert in alerts):
+            self.send_json_response({'error': 'message を含むアラートを指定してください（id は文字列または整数）'}, 400)
+            return
         
-        # 件数制限
-        limit = 10
-        if 'limit' in query_params and query_params['limit'][0]:
-            try:
-                limit = int(query_params['limit'][0])
-            except ValueError:
-                pass
+        created = alert_log.add(alerts, equipment_repository)
+        self.send_json_response({'alerts': created, 'total': len(created)}, 201)
+    
+    def handle_sensor_data(self, query_params, equipment_id):
+        """センサーデータ取得（from / to の期間、maxPoints / resolution 指定時は間引く）"""
+        if equipment_repository.get(equipment_id) is None:
+            self.send_json_response({'error': '設備が見つかりません'}, 404)
+            return
         
-        filtered_alerts = filtered_alerts[:limit]
+        param = lambda name: query_params.get(name, [None])[0]
+        try:
+            start, end = parse_time_range(param('from'), param('to'))
+            max_points, resolution, method = parse_downsample_params(
+                param('maxPoints'), param('resolution'), param('method')
+            )
+            sample = sensor_store.sample(equipment_id, start, end, max_points, resolution, method, param('column'))
+        except (TimeRangeError, DownsampleError) as e:
+            self.send_json_response({'error': str(e)}, 400)
+            return
         
         response = {
-            'alerts': filtered_alerts,
-            'total': len(filtered_alerts),
+            'equipmentId': equipment_id,
+            'from': format_timestamp(start),
+            'to': format_timestamp(end),
+            'count': len(sample['sensorData']),
+            'sensorData': sample['sensorData'],
+            'downsampling': {
+                'method': sample['method'],
+                'resolution': sample['resolution'],
+                'source': sample['source']
+            },
             'timestamp': datetime.now().isoformat()
         }
         self.send_json_response(response)
+
+    def handle_append_sensor_data(self, query_params, equipment_id):
+        """センサーデータ登録（1件または配列、時系列ストアに追記する）"""
+        if equipment_repository.get(equipment_id) is None:
+            self.send_json_response({'error': '設備が見つかりません'}, 404)
+            return
+        
+        readings = readings_from_body(self.json_body)
+        if readings is None:
+            self.send_json_response({'error': INVALID_READINGS_ERROR}, 400)
+            return
+        try:
+            readings = [dict(reading, deviceId=str(equipment_id), equipmentId=str(equipment_id)) for reading in readings]
+            # 全件を検証してから書き込む（形式の誤りがあれば1件も追記しない）
+            count = sensor_store.append_readings(readings)
+        except (TypeError, ValueError):
+            self.send_json_response({'error': INVALID_READINGS_ERROR}, 400)
+            return
+        
+        self.send_json_response({'equipmentId': equipment_id, 'count': count}, 201)
+
+# ルーティングテーブル（パスは app.py と共通の router.API_ROUTES、ハンドラーは APIHandler.handle_<名前>）
+# /api/stream（Server-Sent Events）は app.py のみで提供する
+SIMPLE_API_ROUTES = (
+    'health', 'equipment_list', 'equipment_detail', 'equipment_summary', 'equipment_status',
+    'alerts', 'create_alerts', 'sensor_data', 'append_sensor_data'
+)
+ROUTER = Router()
+for name in SIMPLE_API_ROUTES:
+    ROUTER.add(*API_ROUTES[name], getattr(APIHandler, f'handle_{name}'))
+# CORS preflight で許可するメソッド（登録したルートのメソッド）
+ALLOWED_METHODS = ', '.join(sorted({API_ROUTES[name][0] for name in SIMPLE_API_ROUTES}) + ['OPTIONS'])
+# 一致するルートがない場合のエラーメッセージ（app.py の 404 と共通）
+NOT_FOUND_ERROR = 'エンドポイントが見つかりません'
+
+class PooledHTTPServer(HTTPServer):
+    """
+    接続をワーカースレッドで並行に処理する HTTP サーバー
+    
+    HTTPServer は1リクエストずつ処理するため、応答の遅いクライアントが1つあると
+    すべてのダッシュボードが待たされる。受け付けた接続はキュー経由でワーカーに渡し、
+    接続が終わったワーカーは次の接続に再利用する。ワーカーは同時接続数に合わせて増やし、
+    max_connections を超えない（上限を超えた接続には 503 を返してすぐに切断する）。
+    """
     
-    def handle_sensor_data(self, equipment_id):
-        """センサーデータ取得"""
+    daemon_threads = True
+    # 同時に接続してくるクライアント数に合わせて listen のバックログを増やす（HTTPServer は 5）
+    request_queue_size = 128
+    
+    def __init__(self, server_address, handler_class, max_connections=MAX_CONNECTIONS):
+        super().__init__(server_address, handler_class)
+        self.max_connections = max_connections
+        self.connections = 0
+        self.rejected = 0
+        self._workers = []
+        self._pending = queue.SimpleQueue()
+        self._lock = threading.Lock()
+    
+    def process_request(self, request, client_address):
+        """受け付けた接続をワーカーに渡す（受け付けスレッドでは処理しない）"""
+        with self._lock:
+            if self.connections >= self.max_connections:
+                self.rejected += 1
+                accepted = False
+            else:
+                accepted = True
+                self.connections += 1
+                # 処理中・待機中の接続数だけワーカーがあれば、キューの接続はすぐに処理される
+                if self.connections > len(self._workers):
+                    worker = threading.Thread(target=self._work, daemon=self.daemon_threads)
+                    self._workers.append(worker)
+                    worker.start()
+        if accepted:
+            self._pending.put((request, client_address))
+        else:
+            self.reject_request(request)
+    
+    def reject_request(self, request):
+        body = encode_json({'error': f"同時接続数が上限（{self.max_connections}）に達しています"})
         try:
-            eq_id = int(equipment_id)
-            
-            # サンプルセンサーデータを生成
-            sensor_data = []
-            base_time = datetime.now() - timedelta(hours=24)
-            
-            for i in range(24):  # 1時間ごとのデータ
-                timestamp = base_time + timedelta(hours=i)
-                
-                # 基準値からの変動を追加
-                temp_variation = random.uniform(-5, 5)
-                pressure_variation = random.uniform(-3, 3)
-                vibration_variation = random.uniform(-0.5, 0.5)
-                
-                base_temp = 75
-                base_pressure = 82
-                base_vibration = 4.2
-                
-                sensor_data.append({
-                    'timestamp': timestamp.isoformat(),
-                    'temperature': max(0, base_temp + temp_variation),
-                    'pressure': max(0, base_pressure + pressure_variation),
-                    'vibration': max(0, base_vibration + vibration_variation)
-                })
-            
-            response = {
-                'equipmentId': eq_id,
-                'sensorData': sensor_data,
-                'timestamp': datetime.now().isoformat()
-            }
-            self.send_json_response(response)
-            
-        except ValueError:
-            self.send_json_response({'error': '無効な設備IDです'}, 400)
+            request.sendall(
+                b'HTTP/1.1 503 Service Unavailable\r\n'
+                b'Content-Type: application/json\r\n'
+                b'Access-Control-Allow-Origin: *\r\n'
+                b'Retry-After: 1\r\n'
+                b'Connection: close\r\n'
+                + f'Content-Length: {len(body)}\r\n\r\n'.encode('ascii') + body
+            )
+        except OSError:
+            pass
+        self.shutdown_request(request)
+    
+    def _work(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+                with self._lock:
+                    self.connections -= 1
+    
+    def server_close(self):
+        super().server_close()
+        with self._lock:
+            workers = list(self._workers)
+        for _ in workers:
+            self._pending.put(None)
 
-def run_server(port=5000):
+def run_server(port=5000, max_connections=MAX_CONNECTIONS):
     """HTTPサーバーを起動"""
     server_address = ('', port)
-    httpd = HTTPServer(server_address, APIHandler)
+    httpd = PooledHTTPServer(server_address, APIHandler, max_connections)
     print(f"バックエンドAPIサーバーが起動しました: http://localhost:{port}")
+    print(f"同時接続数の上限: {max_connections}（keep-alive のタイムアウト {KEEPALIVE_TIMEOUT:g}秒）")
     print("利用可能なエンドポイント:")
     print("  GET /api/health")
     print("  GET /api/equipment")
     print("  GET /api/equipment/{id}")
     print("  GET /api/equipment/summary")
+    print("  PUT /api/equipment/{id}/status")
     print("  GET /api/alerts")
+    print("  POST /api/alerts")
     print("  GET /api/sensor-data/{id}")
+    print("  POST /api/sensor-data/{id}")
     try:
         httpd.serve_forever()
     except KeyboardInterrupt:
         print("\nサーバーを停止します...")
-        httpd.shutdown()
+        httpd.server_close()
 
 if __name__ == '__main__':
-    run_server()
\ No newline at end of file
+    run_server(int(os.environ.get('PORT', 5000)))
\ No newline at end of file
@@ -0,0 +1,786 @@
+#!/usr/bin/env python3
+"""
+センサーデータの時系列ストア（ローカル検証用のファイル実装）
+
+iot-data-processor が処理したセンサーデータを設備（デバイス）ごとに保存し、
+/api/sensor-data/<id>?from=&to= の任意の期間をファイル全体を走査せずに返す。
+
+ディレクトリ構成:
+    <root>/<デバイスID>/<YYYYMMDD>/<セグメント番号>/
+        timestamp.f64      時刻（UNIX 秒、UTC）
+        temperature.f64    列ごとの値（欠損は NaN）
+        pressure.f64
+        vibration.f64
+        index.f64          疎な時刻インデックス（INDEX_INTERVAL 行ごとの先頭時刻）
+
+- 日付（UTC）ごとにパーティションを分け、期間外のパーティションは開かない
+- 列ごとの追記専用ファイル（float64 の配列）で、1行 = 各ファイルの同じ位置
+- 期間の検索は疎インデックスを二分探索してブロックを特定し、
+  そのブロックの時刻だけを読んで境界を二分探索する（読み込みは該当行のみ）
+- 1セグメント内の時刻は昇順。最終時刻より古いデータ（遅延到着）は
+  新しいセグメントに追記し、検索時に時刻順にマージする
+- 追記はデバイスごとのロックファイル（<root>/<デバイスID>/.lock）を fcntl.flock で
+  保持して行い、同じ保存先に書き込む別プロセスと排他する（fcntl のない Windows では
+  プロセス内のみ）。追記の前に時刻列の行数に合わせて他の列を揃え、中断した書き込みを取り除く
+
+ロールアップ（ダウンサンプリング用の事前集計）:
+    <root>/<デバイスID>/_rollup/<1m|1h|1d>/<パーティション開始日>.f64
+
+- 追記のたびに 1m → 1h → 1d の順に、列ごとの [件数, 最小, 最大, 合計] を更新する
+- バケット位置が時刻から決まる固定長の配列で、更新は該当範囲の読み書きのみ
+- maxPoints / resolution 指定の検索は、要求された幅以下で最も粗い階層から集計する
+
+標準ライブラリのみで動作する（simple_api.py からも利用するため）。
+
+環境変数:
+- SENSOR_DATA_PATH: 保存先ディレクトリ（既定 backend/data/sensor-data）
+
+使用方法:
+    python backend/timeseries_store.py ingest readings.ndjson [...]
+    python backend/timeseries_store.py generate --devices 1-7 --days 1 --interval 60
+    python backend/timeseries_store.py rollup --devices 1-7   # 既存データのロールアップを再作成
+"""
+
+import argparse
+import array
+import bisect
+import contextlib
+import heapq
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+import shutil
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows ではプロセス間のロックを行わない
+    fcntl = None
+
+from downsampling import (
+    STAT_SIZE, DownsampleError, aggregate_rows, bucket_points, lttb_indices, merge_buckets, merge_stats
+)
+
+SENSOR_COLUMNS = ('temperature', 'pressure', 'vibration')
+TIMESTAMP_COLUMN = 'timestamp'
+INDEX_FILE = 'index.f64'
+# 疎インデックスの間隔（行数）
+INDEX_INTERVAL = 512
+ITEM_SIZE = array.array('d').itemsize
+SECONDS_PER_DAY = 86400
+# from / to 未指定時の期間（直近24時間）
+DEFAULT_RANGE_SECONDS = 24 * 3600
+# ロールアップの階層（名前, バケット幅（秒）, 1ファイルの期間（秒））
+ROLLUP_TIERS = (
+    ('1m', 60, SECONDS_PER_DAY),
+    ('1h', 3600, 32 * SECONDS_PER_DAY),
+    ('1d', SECONDS_PER_DAY, 366 * SECONDS_PER_DAY),
+)
+ROLLUP_DIR = '_rollup'
+# デバイスごとの書き込みロック（同じ保存先に書き込む別プロセスとの排他）
+LOCK_FILE = '.lock'
+# バケット幅を階層の倍数に切り上げるときに許容する粗さ（要求された幅に対する倍率）
+ROLLUP_TOLERANCE = 1.25
+# LTTB の入力にする点数の上限（超える場合はロールアップの平均値から選ぶ）
+LTTB_SOURCE_LIMIT = 200_000
+DEFAULT_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'sensor-data')
+
+_SWAP_BYTES = sys.byteorder != 'little'
+
+
+# センサーデータの登録で形式が無効な場合のエラーメッセージ（例外の内容は返さない）
+INVALID_READINGS_ERROR = (
+    'センサーデータの形式が無効です（timestamp と、sensorData に temperature / pressure / vibration の'
+    'いずれかを含むオブジェクトまたはその配列を指定してください）'
+)
+
+
+class TimeRangeError(ValueError):
+    """from / to の指定が無効"""
+
+
+def parse_timestamp(value):
+    """ISO 8601 文字列または UNIX 秒を UNIX 秒に変換（タイムゾーンなしは UTC とみなす）"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip()
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    try:
+        parsed = datetime.fromisoformat(text.replace('Z', '+00:00'))
+    except ValueError:
+        raise TimeRangeError(f"日時の形式が無効です: {value}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def format_timestamp(seconds):
+    return datetime.fromtimestamp(seconds, timezone.utc).isoformat()
+
+
+def parse_time_range(from_value=None, to_value=None, now=None):
+    """
+    クエリパラメータの from / to を (開始, 終了) の UNIX 秒に変換
+
+    未指定の場合は終了を現在時刻、開始を終了の DEFAULT_RANGE_SECONDS 前とする。
+    """
+    end = parse_timestamp(to_value) if to_value else (time.time() if now is None else now)
+    start = parse_timestamp(from_value) if from_value else end - DEFAULT_RANGE_SECONDS
+    if start > end:
+        raise TimeRangeError("from は to 以前の日時を指定してください")
+    return start, end
+
+
+def readings_from_body(body):
+    """
+    POST の本文（1件のオブジェクトまたはオブジェクトの配列）をセンサーデータのリストにする
+
+    形式が無効な場合は None を返す。
+    """
+    readings = body if isinstance(body, list) else [body]
+    if not readings or not all(
+        isinstance(reading, dict) and isinstance(reading.get('sensorData') or {}, dict) for reading in readings
+    ):
+        return None
+    return readings
+
+
+def normalize_reading(reading):
+    """
+    センサーデータ1件を (デバイスID, 時刻, {列: 値}) に変換
+
+    対応する形式:
+    - iot-data-processor の入力 {deviceId, timestamp, sensorData: {temperature: 75.2, ...}}
+    - iot-data-processor の processedData（sensorData の値が {value, unit, status}）
+    - SensorData コンテナのアイテム {equipmentId, sensorType, measurementValue, timestamp}
+    """
+    if 'sensorType' in reading:
+        device_id = reading.get('equipmentId', reading.get('deviceId'))
+        values = {reading['sensorType']: reading.get('measurementValue')}
+    else:
+        device_id = reading.get('deviceId', reading.get('equipmentId'))
+        values = {
+            sensor_type: value.get('value') if isinstance(value, dict) else value
+            for sensor_type, value in (reading.get('sensorData') or {}).items()
+        }
+    if device_id is None or reading.get('timestamp') is None:
+        raise ValueError("deviceId（equipmentId）と timestamp は必須です")
+    return str(device_id), parse_timestamp(reading['timestamp']), values
+
+
+def _to_bytes(values):
+    if _SWAP_BYTES:
+        values = array.array('d', values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _read_doubles(path, start, stop):
+    """float64 ファイルの start 行目から stop 行目の手前までを読む"""
+    values = array.array('d')
+    if stop <= start:
+        return values
+    with open(path, 'rb') as f:
+        f.seek(start * ITEM_SIZE)
+        values.frombytes(f.read((stop - start) * ITEM_SIZE))
+    if _SWAP_BYTES:
+        values.byteswap()
+    return values
+
+
+class Segment:
+    """時刻昇順の列指向セグメント（追記専用）"""
+
+    def __init__(self, path, columns=SENSOR_COLUMNS):
+        self.path = path
+        self.columns = columns
+        self._index = array.array('d')
+        self._index_size = 0
+        self._index_lock = threading.Lock()
+
+    def _file(self, column):
+        return os.path.join(self.path, f'{column}.f64')
+
+    def __len__(self):
+        try:
+            return os.path.getsize(self._file(TIMESTAMP_COLUMN)) // ITEM_SIZE
+        except FileNotFoundError:
+            return 0
+
+    def last_timestamp(self):
+        rows = len(self)
+        return _read_doubles(self._file(TIMESTAMP_COLUMN), rows - 1, rows)[0] if rows else None
+
+    def append(self, timestamps, values):
+        """
+        行を追記する（timestamps は昇順で、最終時刻以降であること）
+
+        値の列を先に書き、行数を決める時刻列を最後に書くことで、
+        書き込み中の読み取りでも列の長さが揃わない行は見えない。
+        呼び出し側はプロセス間のロック（TimeSeriesStore._device_lock）を保持すること。
+        """
+        os.makedirs(self.path, exist_ok=True)
+        rows = self._repair()
+        for column in self.columns:
+            with open(self._file(column), 'ab') as f:
+                f.write(_to_bytes(array.array('d', values[column])))
+        with open(self._file(TIMESTAMP_COLUMN), 'ab') as f:
+            f.write(_to_bytes(array.array('d', timestamps)))
+        first = -rows % INDEX_INTERVAL
+        entries = array.array('d', timestamps[first::INDEX_INTERVAL])
+        if entries:
+            with open(os.path.join(self.path, INDEX_FILE), 'ab') as f:
+                f.write(_to_bytes(entries))
+
+    def _repair(self):
+        """
+        書き込みの途中で中断した追記の残りを取り除き、行数を返す
+
+        時刻列の行数を正とし、値の列は余分な行を切り詰め（不足分は欠損値で埋め）、
+        疎インデックスは時刻列から過不足を直す。揃えずに追記すると以降の行がすべてずれる。
+        """
+        rows = len(self)
+        self._resize(self._file(TIMESTAMP_COLUMN), rows)
+        for column in self.columns:
+            self._resize(self._file(column), rows)
+        path = os.path.join(self.path, INDEX_FILE)
+        entries = -(-rows // INDEX_INTERVAL)
+        size = os.path.getsize(path) // ITEM_SIZE if os.path.exists(path) else 0
+        self._resize(path, min(size, entries))
+        if size > entries:
+            with self._index_lock:
+                self._index = array.array('d')
+                self._index_size = 0
+        elif size < entries:
+            timestamps = _read_doubles(self._file(TIMESTAMP_COLUMN), 0, rows)
+            with open(path, 'ab') as f:
+                f.write(_to_bytes(timestamps[size * INDEX_INTERVAL::INDEX_INTERVAL]))
+        return rows
+
+    @staticmethod
+    def _resize(path, rows):
+        """float64 ファイルを rows 行に揃える（不足分は NaN）"""
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size > rows * ITEM_SIZE:
+            with open(path, 'r+b') as f:
+                f.truncate(rows * ITEM_SIZE)
+        elif size < rows * ITEM_SIZE:
+            with open(path, 'ab') as f:
+                f.truncate(size - size % ITEM_SIZE)
+                f.write(_to_bytes(array.array('d', [math.nan]) * (rows - size // ITEM_SIZE)))
+
+    def _load_index(self):
+        """疎インデックス（追記のみのため、増えた分だけ読み足す）"""
+        path = os.path.join(self.path, INDEX_FILE)
+        try:
+            size = os.path.getsize(path) // ITEM_SIZE
+        except FileNotFoundError:
+            return self._index
+        with self._index_lock:
+            if size > self._index_size:
+                self._index.extend(_read_doubles(path, self._index_size, size))
+                self._index_size = size
+            return self._index
+
+    def _boundary(self, index, rows, value, right):
+        """value の挿入位置（right の場合は value と等しい行の後ろ）を二分探索で求める"""
+        find = bisect.bisect_right if right else bisect.bisect_left
+        block = max(find(index, value) - 1, 0)
+        start = block * INDEX_INTERVAL
+        # 最後のブロックは追記中でインデックスが未反映の行も含めて読む
+        stop = rows if block == len(index) - 1 else min(start + INDEX_INTERVAL, rows)
+        return start + find(_read_doubles(self._file(TIMESTAMP_COLUMN), start, stop), value)
+
+    def count(self, start, end):
+        """start 以上 end 以下の行数（時刻の境界のみ読む）"""
+        rows = len(self)
+        index = self._load_index()
+        if not rows or not index or start > end:
+            return 0
+        return max(self._boundary(index, rows, end, right=True) - self._boundary(index, rows, start, right=False), 0)
+
+    def query(self, start, end, columns=None):
+        """start 以上 end 以下の行を {列: array} で返す"""
+        columns = columns or self.columns
+        rows = len(self)
+        index = self._load_index()
+        if not rows or not index or start > end:
+            return None
+        lo = self._boundary(index, rows, start, right=False)
+        hi = self._boundary(index, rows, end, right=True)
+        if lo >= hi:
+            return None
+        result = {TIMESTAMP_COLUMN: _read_doubles(self._file(TIMESTAMP_COLUMN), lo, hi)}
+        for column in columns:
+            result[column] = _read_doubles(self._file(column), lo, hi)
+        return result
+
+
+class RollupTier:
+    """
+    1階層分のロールアップ
+
+    ファイルはバケット位置が (時刻 - ファイルの開始時刻) / バケット幅 で決まる固定長の配列で、
+    1バケット = 列ごとの [件数, 最小, 最大, 合計]（件数 0 は空のバケット）。
+    """
+
+    def __init__(self, name, seconds, partition_seconds, columns):
+        self.name = name
+        self.seconds = seconds
+        self.partition_seconds = partition_seconds
+        self.columns = columns
+        self.record_size = STAT_SIZE * len(columns)
+        self.buckets_per_file = partition_seconds // seconds
+
+    def _path(self, device_path, partition):
+        name = datetime.fromtimestamp(partition * self.partition_seconds, timezone.utc).strftime('%Y%m%d')
+        return os.path.join(device_path, ROLLUP_DIR, self.name, f'{name}.f64')
+
+    def _position(self, bucket):
+        partition = int(bucket // self.partition_seconds)
+        return partition, int((bucket - partition * self.partition_seconds) // self.seconds)
+
+    def update(self, device_path, buckets):
+        """{バケット開始時刻: 統計量} を既存のバケットに合成して書き込む"""
+        by_partition = {}
+        for bucket, stats in buckets.items():
+            partition, position = self._position(bucket)
+            by_partition.setdefault(partition, {})[position] = stats
+        for partition, updates in by_partition.items():
+            path = self._path(device_path, partition)
+            first, last = min(updates), max(updates) + 1
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as f:
+                    f.truncate(self.buckets_per_file * self.record_size * ITEM_SIZE)
+            records = _read_doubles(path, first * self.record_size, last * self.record_size)
+            for position, stats in updates.items():
+                offset = (position - first) * self.record_size
+                current = records[offset:offset + self.record_size]
+                merge_stats(current, stats)
+                records[offset:offset + self.record_size] = current
+            with open(path, 'r+b') as f:
+                f.seek(first * self.record_size * ITEM_SIZE)
+                f.write(_to_bytes(records))
+
+    def read(self, device_path, start, end):
+        """start を含むバケットから end を含むバケットまでの、空でないバケットの {開始時刻: 統計量}"""
+        buckets = {}
+        first_bucket = start // self.seconds * self.seconds
+        for partition in range(int(start // self.partition_seconds), int(end // self.partition_seconds) + 1):
+            path = self._path(device_path, partition)
+            if not os.path.exists(path):
+                continue
+            partition_start = partition * self.partition_seconds
+            first = max(int((first_bucket - partition_start) // self.seconds), 0)
+            last = min(int((end - partition_start) // self.seconds) + 1, self.buckets_per_file)
+            records = _read_doubles(path, first * self.record_size, last * self.record_size)
+            for position in range(last - first):
+                offset = position * self.record_size
+                stats = records[offset:offset + self.record_size]
+                if any(stats[0::STAT_SIZE]):
+                    buckets[partition_start + (first + position) * self.seconds] = stats.tolist()
+        return buckets
+
+
+class TimeSeriesStore:
+    """デバイスごと・日付ごとのセグメントを管理する時系列ストア"""
+
+    def __init__(self, root=DEFAULT_DATA_PATH, columns=SENSOR_COLUMNS):
+        self.root = root
+        self.columns = tuple(columns)
+        self.rollups = [
+            RollupTier(name, seconds, partition_seconds, self.columns)
+            for name, seconds, partition_seconds in ROLLUP_TIERS
+        ]
+        self._segments = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _partition_name(day):
+        return datetime.fromtimestamp(day * SECONDS_PER_DAY, timezone.utc).strftime('%Y%m%d')
+
+    def _device_path(self, device_id):
+        # パス区切りなどを含む ID でディレクトリの外に出ないようにする
+        return os.path.join(self.root, str(device_id).replace(os.sep, '_').replace('..', '_'))
+
+    def _segment_names(self, partition_path):
+        try:
+            return sorted(name for name in os.listdir(partition_path) if name.isdigit())
+        except FileNotFoundError:
+            return []
+
+    def _segment(self, path):
+        segment = self._segments.get(path)
+        if segment is None:
+            segment = self._segments[path] = Segment(path, self.columns)
+        return segment
+
+    @contextlib.contextmanager
+    def _device_lock(self, device_id):
+        """
+        デバイス単位の書き込みロック
+
+        プロセス内のスレッドに加え、同じ SENSOR_DATA_PATH に書き込む別プロセス
+        （app.py と simple_api.py など）とも fcntl.flock で排他する。
+        """
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            device_path = self._device_path(device_id)
+            os.makedirs(device_path, exist_ok=True)
+            with open(os.path.join(device_path, LOCK_FILE), 'a') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def append(self, device_id, timestamps, values):
+        """
+        1デバイス分の行を追記する
+
+        Args:
+            timestamps: UNIX 秒のリスト
+            values: {列: 値のリスト}（timestamps と同じ長さ。欠損は None / NaN）
+        """
+        order = sorted(range(len(timestamps)), key=timestamps.__getitem__)
+        with self._device_lock(device_id):
+            for day, rows in self._group_by_day(timestamps, order):
+                partition_path = os.path.join(self._device_path(device_id), self._partition_name(day))
+                names = self._segment_names(partition_path)
+                segment = self._segment(os.path.join(partition_path, names[-1])) if names else None
+                last = segment.last_timestamp() if segment is not None else None
+                if segment is None or (last is not None and timestamps[rows[0]] < last):
+                    # 遅延到着のデータは新しいセグメントへ（既存のセグメントは書き換えない）
+                    number = int(names[-1]) + 1 if names else 0
+                    segment = self._segment(os.path.join(partition_path, f'{number:06d}'))
+                day_timestamps = [timestamps[row] for row in rows]
+                day_values = {
+                    column: [_as_float(values[column][row]) if column in values else math.nan for row in rows]
+                    for column in self.columns
+                }
+                segment.append(day_timestamps, day_values)
+                self._update_rollups(device_id, day_timestamps, day_values)
+
+    def _update_rollups(self, device_id, timestamps, values):
+        """追記した行を最も細かい階層で集計し、粗い階層へは集計結果を合成して反映する"""
+        device_path = self._device_path(device_id)
+        buckets = aggregate_rows(timestamps, [values[column] for column in self.columns], self.rollups[0].seconds)
+        for tier in self.rollups:
+            if tier is not self.rollups[0]:
+                buckets = merge_buckets(buckets, tier.seconds)
+            tier.update(device_path, buckets)
+
+    def rebuild_rollups(self, device_id):
+        """保存済みの全データからロールアップを作り直す"""
+        device_path = self._device_path(device_id)
+        if not os.path.isdir(device_path):
+            return 0
+        with self._device_lock(device_id):
+            shutil.rmtree(os.path.join(device_path, ROLLUP_DIR), ignore_errors=True)
+            days = sorted(name for name in os.listdir(device_path) if name.isdigit())
+        for name in days:
+            start = datetime.strptime(name, '%Y%m%d').replace(tzinfo=timezone.utc).timestamp()
+            data = self.query(device_id, start, start + SECONDS_PER_DAY - 1e-6)
+            with self._device_lock(device_id):
+                self._update_rollups(
+                    device_id, data[TIMESTAMP_COLUMN], {column: data[column] for column in self.columns}
+                )
+        return len(days)
+
+    @staticmethod
+    def _group_by_day(timestamps, order):
+        groups = []
+        for row in order:
+            day = int(timestamps[row] // SECONDS_PER_DAY)
+            if not groups or groups[-1][0] != day:
+                groups.append((day, []))
+            groups[-1][1].append(row)
+        return groups
+
+    def append_readings(self, readings, skip_unknown=False):
+        """
+        normalize_reading の形式のセンサーデータをまとめて追記し、追記した行数を返す
+
+        保存する列（temperature など）の値を1つも含まないデータは、すべて欠損値の行として
+        保存せずに ValueError を送出する（skip_unknown=True の場合は読み飛ばす。
+        SensorData コンテナの humidity など、保存しない種別のアイテムを含むファイルの取り込み用）。
+        検証はすべてのデータについて書き込みの前に行う。
+        """
+        rows_by_device = {}
+        for reading in readings:
+            device_id, timestamp, values = normalize_reading(reading)
+            values = {column: value for column, value in values.items() if column in self.columns}
+            if not values:
+                if skip_unknown:
+                    continue
+                raise ValueError(f"センサー値がありません（sensorData に {' / '.join(self.columns)} のいずれかを指定してください）")
+            # 同じデバイス・同じ時刻（センサー種別ごとのアイテム）は1行にまとめる
+            row = rows_by_device.setdefault(device_id, {}).setdefault(timestamp, {})
+            row.update(values)
+        total = 0
+        for device_id, rows in rows_by_device.items():
+            timestamps = list(rows)
+            self.append(device_id, timestamps, {
+                column: [rows[timestamp].get(column) for timestamp in timestamps] for column in self.columns
+            })
+            total += len(timestamps)
+        return total
+
+    def query(self, device_id, start, end, columns=None):
+        """
+        start 以上 end 以下の行を時刻順の {列: array} で返す
+
+        期間と重なる日付のパーティションのみを開き、各セグメントを二分探索する。
+        """
+        columns = tuple(columns or self.columns)
+        result = {TIMESTAMP_COLUMN: array.array('d')}
+        result.update((column, array.array('d')) for column in columns)
+        device_path = self._device_path(device_id)
+        if start > end or not os.path.isdir(device_path):
+            return result
+        for day in range(int(start // SECONDS_PER_DAY), int(end // SECONDS_PER_DAY) + 1):
+            partition_path = os.path.join(device_path, self._partition_name(day))
+            with self._lock:
+                segments = [self._segment(os.path.join(partition_path, name))
+                            for name in self._segment_names(partition_path)]
+            parts = [part for part in (segment.query(start, end, columns) for segment in segments) if part]
+            if len(parts) > 1:
+                parts = [_merge_parts(parts, columns)]
+            for part in parts:
+                for column, values in part.items():
+                    result[column].extend(values)
+        return result
+
+    def _segments_in_range(self, device_id, start, end):
+        device_path = self._device_path(device_id)
+        if start > end or not os.path.isdir(device_path):
+            return []
+        segments = []
+        with self._lock:
+            for day in range(int(start // SECONDS_PER_DAY), int(end // SECONDS_PER_DAY) + 1):
+                partition_path = os.path.join(device_path, self._partition_name(day))
+                segments.extend(self._segment(os.path.join(partition_path, name))
+                                for name in self._segment_names(partition_path))
+        return segments
+
+    def count(self, device_id, start, end):
+        """start 以上 end 以下の行数"""
+        return sum(segment.count(start, end) for segment in self._segments_in_range(device_id, start, end))
+
+    def points(self, device_id, start, end, columns=None):
+        """API レスポンス用の [{timestamp, 列: 値}] 形式で返す（NaN は None）"""
+        data = self.query(device_id, start, end, columns)
+        columns = [column for column in data if column != TIMESTAMP_COLUMN]
+        return [
+            dict(
+                {TIMESTAMP_COLUMN: format_timestamp(timestamp)},
+                **{column: _json_value(data[column][row]) for column in columns}
+            )
+            for row, timestamp in enumerate(data[TIMESTAMP_COLUMN])
+        ]
+
+    def sample(self, device_id, start, end, max_points=None, resolution=None, method='minmax', column=None):
+        """
+        グラフ表示用に間引いたセンサーデータ
+
+        Args:
+            max_points: 返す点数の上限（未指定の場合は resolution のみで決める）
+            resolution: バケット幅（秒）。max_points と両方指定した場合は粗い方を使う
+            method: 'minmax'（バケットごとの平均・最小・最大）または 'lttb'
+            column: lttb で形状を保つ列（既定は先頭の列）
+
+        Returns:
+            {'sensorData': 点のリスト, 'method', 'resolution': バケット幅（秒）, 'source': 'raw' または階層名}
+            期間内の行数が max_points 以下で resolution も未指定の場合は間引かずに返す。
+        """
+        if column is not None and column not in self.columns:
+            raise DownsampleError(f"未対応の列です: {column}")
+        if max_points is None and resolution is None:
+            return self._raw_sample(device_id, start, end)
+        if resolution is None and self.count(device_id, start, end) <= max_points:
+            return self._raw_sample(device_id, start, end)
+        if method == 'lttb':
+            return self._lttb_sample(device_id, start, end, max_points, column or self.columns[0])
+        return self._bucket_sample(device_id, start, end, max_points, resolution)
+
+    def _raw_sample(self, device_id, start, end):
+        return {'sensorData': self.points(device_id, start, end), 'method': None, 'resolution': None, 'source': 'raw'}
+
+    def _bucket_width(self, start, end, max_points, resolution):
+        """バケット幅と、その幅以下で最も粗いロールアップ階層（なければ None）"""
+        width = max(resolution or 0, (end - start) / max_points if max_points else 0)
+        # 幅を階層の倍数に切り上げても粗くなりすぎない（ROLLUP_TOLERANCE 倍以内の）最も粗い階層
+        tier = next((
+            tier for tier in reversed(self.rollups)
+            if tier.seconds <= width and math.ceil(width / tier.seconds) * tier.seconds <= width * ROLLUP_TOLERANCE
+        ), None)
+        step = tier.seconds if tier is not None else width / (max_points or 1)
+        if tier is not None:
+            width = math.ceil(width / step) * step
+        # バケットの境界は UNIX 秒の倍数のため、期間の両端で点数が増える分を広げる
+        while max_points and int(end // width) - int(start // width) + 1 > max_points:
+            width += step
+        return width, tier
+
+    def _bucket_sample(self, device_id, start, end, max_points, resolution):
+        width, tier = self._bucket_width(start, end, max_points, resolution)
+        # 期間はバケット単位に広げ、ロールアップからでも元データからでも同じバケットになるようにする
+        start = start // width * width
+        end = (end // width + 1) * width
+        if tier is not None:
+            buckets = merge_buckets(tier.read(self._device_path(device_id), start, end - tier.seconds), width)
+        else:
+            data = self.query(device_id, start, math.nextafter(end, -math.inf))
+            buckets = aggregate_rows(data[TIMESTAMP_COLUMN], [data[column] for column in self.columns], width)
+        points = bucket_points(buckets, self.columns)
+        for point in points:
+            point[TIMESTAMP_COLUMN] = format_timestamp(point[TIMESTAMP_COLUMN])
+        return {
+            'sensorData': points,
+            'method': 'minmax',
+            'resolution': width,
+            'source': tier.name if tier is not None else 'raw'
+        }
+
+    def _lttb_sample(self, device_id, start, end, max_points, column):
+        """LTTB で点を選ぶ（行数が多い場合は LTTB_SOURCE_LIMIT 以下になる階層の平均値から選ぶ）"""
+        source = 'raw'
+        if self.count(device_id, start, end) <= LTTB_SOURCE_LIMIT:
+            data = self.query(device_id, start, end)
+        else:
+            tier = next(
+                (tier for tier in self.rollups if (end - start) / tier.seconds <= LTTB_SOURCE_LIMIT),
+                self.rollups[-1]
+            )
+            source = tier.name
+            points = bucket_points(tier.read(self._device_path(device_id), start, end), self.columns)
+            data = {TIMESTAMP_COLUMN: [point[TIMESTAMP_COLUMN] for point in points]}
+            data.update(
+                (name, [_as_float(point[name]) for point in points]) for name in self.columns
+            )
+        rows = lttb_indices(data[TIMESTAMP_COLUMN], data[column], max_points)
+        return {
+            'sensorData': [
+                dict(
+                    {TIMESTAMP_COLUMN: format_timestamp(data[TIMESTAMP_COLUMN][row])},
+                    **{name: _json_value(data[name][row]) for name in self.columns}
+                )
+                for row in rows
+            ],
+            'method': 'lttb',
+            'resolution': None,
+            'source': source
+        }
+
+
+def _as_float(value):
+    return math.nan if value is None else float(value)
+
+
+def _json_value(value):
+    return None if math.isnan(value) else value
+
+
+def _merge_parts(parts, columns):
+    """複数セグメントの検索結果を時刻順にマージする"""
+    merged = {TIMESTAMP_COLUMN: array.array('d')}
+    merged.update((column, array.array('d')) for column in columns)
+    rows = heapq.merge(*(
+        zip(part[TIMESTAMP_COLUMN], *(part[column] for column in columns)) for part in parts
+    ), key=lambda row: row[0])
+    for row in rows:
+        merged[TIMESTAMP_COLUMN].append(row[0])
+        for column, value in zip(columns, row[1:]):
+            merged[column].append(value)
+    return merged
+
+
+def create_store(root=None):
+    """環境変数 SENSOR_DATA_PATH の時系列ストアを生成"""
+    return TimeSeriesStore(root or os.environ.get('SENSOR_DATA_PATH', DEFAULT_DATA_PATH))
+
+
+def iter_reading_file(path):
+    """JSON（配列または単一オブジェクト）または NDJSON のファイルを読む"""
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        text = f.read()
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    return data if isinstance(data, list) else [data]
+
+
+def parse_device_range(text):
+    """'1-7' や '1,3,5' 形式のデバイスID指定を展開"""
+    devices = []
+    for part in text.split(','):
+        if '-' in part:
+            first, last = part.split('-', 1)
+            devices.extend(str(device) for device in range(int(first), int(last) + 1))
+        elif part:
+            devices.append(part)
+    return devices
+
+
+def generate_readings(store, devices, days, interval, seed=42, end=None):
+    """検証用に基準値の周辺で変動するセンサーデータを生成して追記する"""
+    from sample_data import SAMPLE_EQUIPMENT
+
+    baselines = {str(equipment['id']): equipment for equipment in SAMPLE_EQUIPMENT}
+    rng = random.Random(seed)
+    end = time.time() if end is None else end
+    start = end - days * SECONDS_PER_DAY
+    timestamps = [start + i * interval for i in range(int(days * SECONDS_PER_DAY // interval) + 1)]
+    for device_id in devices:
+        base = baselines.get(device_id, {'temperature': 60, 'pressure': 80, 'vibration': 3})
+        values = {column: [] for column in SENSOR_COLUMNS}
+        for i in range(len(timestamps)):
+            wave = math.sin(i * interval / 3600 * math.pi / 12)
+            values['temperature'].append(round(max(0, base['temperature'] + 3 * wave + rng.uniform(-2, 2)), 2))
+            values['pressure'].append(round(max(0, base['pressure'] + rng.uniform(-3, 3)), 2))
+            values['vibration'].append(round(max(0, base['vibration'] + rng.uniform(-0.5, 0.5)), 3))
+        store.append(device_id, timestamps, values)
+    return len(timestamps) * len(devices)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="センサーデータの時系列ストア")
+    parser.add_argument("--path", default=None, help="保存先（既定は SENSOR_DATA_PATH または backend/data/sensor-data）")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ingest = subparsers.add_parser("ingest", help="JSON / NDJSON のセンサーデータを追記")
+    ingest.add_argument("files", nargs="+")
+    generate = subparsers.add_parser("generate", help="検証用のセンサーデータを生成")
+    generate.add_argument("--devices", default="1-7", help="デバイスID（例: 1-7, 1,3,5）")
+    generate.add_argument("--days", type=float, default=1)
+    generate.add_argument("--interval", type=float, default=60, help="計測間隔（秒）")
+    rollup = subparsers.add_parser("rollup", help="保存済みのデータからロールアップを作り直す")
+    rollup.add_argument("--devices", default="1-7", help="デバイスID（例: 1-7, 1,3,5）")
+    args = parser.parse_args()
+
+    store = create_store(args.path)
+    if args.command == "ingest":
+        for path in args.files:
+            count = store.append_readings(iter_reading_file(path), skip_unknown=True)
+            print(f"{path}: {count:,}行を追記しました")
+    elif args.command == "rollup":
+        for device_id in parse_device_range(args.devices):
+            days = store.rebuild_rollups(device_id)
+            print(f"デバイス {device_id}: {days}日分のロールアップを作成しました")
+    else:
+        count = generate_readings(store, parse_device_range(args.devices), args.days, args.interval)
+        print(f"{count:,}行を生成しました: {store.root}")
+
+
+if __name__ == '__main__':
+    main()
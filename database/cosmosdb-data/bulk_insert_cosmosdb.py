@@ -4,21 +4,42 @@ Azure Cosmos DB サンプルデータ一括投入スクリプト
 工場設備管理システム用
 
 使用方法:
-    python bulk_insert_cosmosdb.py --endpoint <ENDPOINT> --key <PRIMARY_KEY>
+    python bulk_insert_cosmosdb.py --endpoint <ENDPOINT> --key <PRIMARY_KEY> [--concurrency 16]
+    python bulk_insert_cosmosdb.py --endpoint <ENDPOINT> --key <PRIMARY_KEY> --resume   # 中断した投入を再開
+    python bulk_insert_cosmosdb.py --fake   # Cosmos DB に接続せずプロセス内の代替コンテナで確認
 
 必要な環境:
-    pip install azure-cosmos
+    pip install azure-cosmos（--fake の場合は不要）
 """
 
-import json
 import os
 import argparse
 import sys
-from typing import List, Dict, Any
-from azure.cosmos import CosmosClient, exceptions
+from typing import List, Dict, Any, Iterable, Optional
+
+from bulk_upsert import BulkUpserter, retry_throttled
+from checkpoint import CheckpointStore
+from json_stream import CountingIterator, JsonStreamError, iter_json_items
+from verification import WriteTracker, is_not_found, verify_partition_counts, verify_sampled_reads
+
+# データファイルとして探す拡張子（先に見つかったものを使用）
+DATA_FILE_EXTENSIONS = ('.json', '.ndjson', '.json.gz', '.ndjson.gz')
+
+# 投入後の検証方法
+#   sample: 書き込んだアイテムの一部をポイント読み取りして etag を確認
+#   partition: 書き込んだパーティションキーごとに今回の id の件数を確認
+#   count: コンテナ全体の件数（パーティション横断の COUNT クエリ）
+#   none: 検証しない
+VERIFY_MODES = ('sample', 'partition', 'count', 'none')
+
+UNAUTHORIZED_STATUS = 401
 
 class CosmosDBDataLoader:
-    def __init__(self, endpoint: str, key: str, database_name: str = "FactoryEquipmentDB"):
+    def __init__(self, endpoint: str, key: str, database_name: str = "FactoryEquipmentDB",
+                 concurrency: int = 16, batch_size: int = 1000, max_retries: int = 9,
+                 progress_interval: float = 2.0, database=None,
+                 checkpoint_path: Optional[str] = None, resume: bool = False,
+                 verify_mode: str = "sample", verify_sample_size: int = 100):
         """
         Cosmos DB データローダーの初期化
         
@@ -26,14 +47,41 @@ class CosmosDBDataLoader:
             endpoint: Cosmos DB エンドポイントURL
             key: Cosmos DB プライマリキー
             database_name: データベース名
+            concurrency: 同時に発行する upsert の上限
+            batch_size: パーティションキーでまとめる単位（件）
+            max_retries: 429（スロットリング）の最大再試行回数
+            progress_interval: 進捗表示の間隔（秒）
+            database: 接続済みのデータベース（検証用の FakeDatabase など）
+            checkpoint_path: 進捗を記録するチェックポイントファイル（省略時は記録しない）
+            resume: チェックポイントの投入済みの分を読み飛ばして再開するか
+            verify_mode: 投入後の検証方法（sample / partition / count / none）
+            verify_sample_size: sample 検証でポイント読み取りする件数
         """
-        self.client = CosmosClient(endpoint, key)
         self.database_name = database_name
-        self.database = self.client.get_database_client(database_name)
+        if database is None:
+            # azure-cosmos は Cosmos DB に接続する場合のみ必要（--fake では読み込まない）
+            from azure.cosmos import CosmosClient
+            self.client = CosmosClient(endpoint, key)
+            database = self.client.get_database_client(database_name)
+        self.database = database
+        self.bulk_options = {
+            'concurrency': concurrency,
+            'batch_size': batch_size,
+            'max_retries': max_retries,
+            'progress_interval': progress_interval
+        }
+        self.checkpoints = CheckpointStore(checkpoint_path) if checkpoint_path else None
+        self.resume = resume
+        if verify_mode not in VERIFY_MODES:
+            raise ValueError(f"未対応の検証方法です: {verify_mode}")
+        self.verify_mode = verify_mode
+        self.verify_sample_size = verify_sample_size
     
     def load_json_file(self, file_path: str) -> List[Dict[str, Any]]:
         """
-        JSONファイルからデータを読み込む
+        JSONファイルからデータを読み込む（JSON配列・NDJSON・gzip圧縮に対応）
+        
+        大きなファイルはすべてをメモリに載せるため、stream_json_file を使用すること
         
         Args:
             file_path: JSONファイルのパス
@@ -42,52 +90,90 @@ class CosmosDBDataLoader:
             データのリスト
         """
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = list(iter_json_items(file_path))
             print(f"✓ {file_path} を読み込みました（{len(data)}件）")
             return data
         except FileNotFoundError:
             print(f"✗ エラー: ファイル {file_path} が見つかりません")
             return []
-        except json.JSONDecodeError as e:
+        except JsonStreamError as e:
             print(f"✗ エラー: {file_path} のJSONフォーマットが無効です - {e}")
             return []
     
-    def insert_data_to_container(self, container_name: str, data: List[Dict[str, Any]]) -> bool:
+    def stream_json_file(self, file_path: str) -> Optional[CountingIterator]:
+        """
+        JSONファイルからデータを1件ずつ読み込むイテレータを返す
+        
+        JSON配列・NDJSON・gzip圧縮に対応し、ファイルサイズによらずメモリ使用量は一定。
+        読み込んだ件数はイテレータの count で参照できる。
+        
+        Args:
+            file_path: JSONファイルのパス
+            
+        Returns:
+            CountingIterator（ファイルが存在しない場合はNone）
+        """
+        if not os.path.isfile(file_path):
+            print(f"✗ エラー: ファイル {file_path} が見つかりません")
+            return None
+        print(f"📖 {file_path} を逐次読み込みしながら投入します")
+        return CountingIterator(iter_json_items(file_path))
+    
+    @staticmethod
+    def find_data_file(data_dir: str, base_name: str) -> str:
+        """base_name に対応するデータファイル（.json / .ndjson / gzip圧縮）のパスを返す"""
+        for extension in DATA_FILE_EXTENSIONS:
+            path = os.path.join(data_dir, base_name + extension)
+            if os.path.isfile(path):
+                return path
+        return os.path.join(data_dir, base_name + DATA_FILE_EXTENSIONS[0])
+    
+    def insert_data_to_container(self, container_name: str, data: Iterable[Dict[str, Any]],
+                                 checkpoint=None, tracker=None) -> bool:
         """
         指定されたコンテナにデータを一括投入
         
+        パーティションキー（equipmentId）ごとにまとめ、同時実行数を制限して並列に upsert する。
+        429（スロットリング）はバックオフして再試行する。
+        
         Args:
             container_name: コンテナ名
-            data: 投入するデータのリスト
+            data: 投入するデータ（リストまたはイテレータ）
+            checkpoint: 進捗を記録する ContainerCheckpoint（投入済みの件数は読み飛ばす）
+            tracker: 書き込んだアイテムの id / etag を記録する WriteTracker
             
         Returns:
             成功した場合True、失敗した場合False
         """
         try:
             container = self.database.get_container_client(container_name)
-            success_count = 0
-            error_count = 0
             
-            print(f"🔄 {container_name} コンテナにデータを投入中...")
+            print(f"🔄 {container_name} コンテナにデータを投入中...（同時実行数 {self.bulk_options['concurrency']}）")
             
-            for i, item in enumerate(data, 1):
-                try:
-                    container.upsert_item(item)
-                    success_count += 1
-                    print(f"  📝 {i}/{len(data)}: {item.get('id', 'N/A')} を投入")
-                except exceptions.CosmosHttpResponseError as e:
-                    error_count += 1
-                    print(f"  ✗ {i}/{len(data)}: {item.get('id', 'N/A')} の投入に失敗 - {e}")
+            start_index = checkpoint.committed if checkpoint is not None else 0
+            if start_index:
+                print(f"⏩ 投入済みの {start_index}件を読み飛ばして再開します")
             
-            print(f"✓ {container_name} への投入完了: 成功 {success_count}件, 失敗 {error_count}件")
-            return error_count == 0
+            result = BulkUpserter(container, **self.bulk_options).upsert_all(
+                data, label=container_name, start_index=start_index, checkpoint=checkpoint, tracker=tracker
+            )
+            for item_id, message in result.errors:
+                print(f"  ✗ {item_id} の投入に失敗 - {message}")
+            if result.failed > len(result.errors):
+                print(f"  ✗ ほか {result.failed - len(result.errors)}件の投入に失敗")
             
-        except exceptions.CosmosResourceNotFoundError:
-            print(f"✗ エラー: コンテナ '{container_name}' が見つかりません")
+            print(f"✓ {container_name} への投入完了: 成功 {result.succeeded}件, 失敗 {result.failed}件"
+                  f"（{result.elapsed:.1f}秒, 429再試行 {result.throttled}回）")
+            return result.failed == 0
+            
+        except JsonStreamError as e:
+            print(f"✗ エラー: {container_name} の入力データのJSONフォーマットが無効です - {e}")
             return False
         except Exception as e:
-            print(f"✗ エラー: {container_name} への投入中に予期しないエラーが発生しました - {e}")
+            if is_not_found(e):
+                print(f"✗ エラー: コンテナ '{container_name}' が見つかりません")
+            else:
+                print(f"✗ エラー: {container_name} への投入中に予期しないエラーが発生しました - {e}")
             return False
     
     def verify_data(self, container_name: str, expected_count: int) -> bool:
@@ -104,7 +190,10 @@ class CosmosDBDataLoader:
         try:
             container = self.database.get_container_client(container_name)
             query = "SELECT VALUE COUNT(1) FROM c"
-            items = list(container.query_items(query=query, enable_cross_partition_query=True))
+            items = retry_throttled(
+                lambda: list(container.query_items(query=query, enable_cross_partition_query=True)),
+                self.bulk_options['max_retries']
+            )
             actual_count = items[0] if items else 0
             
             print(f"📊 {container_name} データ件数確認: {actual_count}件（期待値: {expected_count}件）")
@@ -120,6 +209,47 @@ class CosmosDBDataLoader:
             print(f"✗ エラー: {container_name} のデータ確認に失敗しました - {e}")
             return False
     
+    def verify_written(self, container_name: str, tracker: WriteTracker) -> bool:
+        """
+        今回書き込んだアイテムのみを対象にデータ投入を確認
+        
+        コンテナ全体の COUNT クエリを使わず、書き込んだ件数に比例したコストで確認する。
+        
+        Args:
+            container_name: コンテナ名
+            tracker: 投入時に記録した WriteTracker
+            
+        Returns:
+            問題がなかった場合True
+        """
+        try:
+            container = self.database.get_container_client(container_name)
+            max_retries = self.bulk_options['max_retries']
+            if self.verify_mode == "partition":
+                result = verify_partition_counts(container, tracker, max_retries=max_retries)
+                target = f"{len(tracker.ids_by_partition)}パーティションの {result.checked}件"
+            else:
+                result = verify_sampled_reads(container, tracker, max_retries=max_retries)
+                target = f"{tracker.count}件中 {result.checked}件のポイント読み取り"
+            
+            print(f"📊 {container_name} データ確認（{self.verify_mode}）: {target}, "
+                  f"リクエスト {result.requests}回（429再試行 {result.throttled}回）")
+            for problem in result.problems[:10]:
+                print(f"  ✗ {problem}")
+            if len(result.problems) > 10:
+                print(f"  ✗ ほか {len(result.problems) - 10}件")
+            
+            if result.ok:
+                print(f"✓ {container_name} のデータ確認完了")
+                return True
+            else:
+                print(f"⚠️  {container_name} に投入内容と一致しないデータがあります")
+                return False
+                
+        except Exception as e:
+            print(f"✗ エラー: {container_name} のデータ確認に失敗しました - {e}")
+            return False
+    
     def load_all_sample_data(self, data_dir: str = "database/cosmosdb-data") -> bool:
         """
         すべてのサンプルデータを読み込んで投入
@@ -133,38 +263,107 @@ class CosmosDBDataLoader:
         success = True
         
         # センサーデータの投入
-        sensor_data_file = os.path.join(data_dir, "sensor-data-sample.json")
-        sensor_data = self.load_json_file(sensor_data_file)
-        if sensor_data:
-            success &= self.insert_data_to_container("SensorData", sensor_data)
-            success &= self.verify_data("SensorData", len(sensor_data))
+        sensor_data_file = self.find_data_file(data_dir, "sensor-data-sample")
+        success &= self.load_file_to_container("SensorData", sensor_data_file)
         
         # アラートデータの投入
-        alerts_data_file = os.path.join(data_dir, "alerts-sample.json")
-        alerts_data = self.load_json_file(alerts_data_file)
-        if alerts_data:
-            success &= self.insert_data_to_container("Alerts", alerts_data)
-            success &= self.verify_data("Alerts", len(alerts_data))
+        alerts_data_file = self.find_data_file(data_dir, "alerts-sample")
+        success &= self.load_file_to_container("Alerts", alerts_data_file)
         
         return success
+    
+    def load_file_to_container(self, container_name: str, file_path: str) -> bool:
+        """
+        ファイルを逐次読み込みしながらコンテナに投入し、件数を確認する
+        
+        Args:
+            container_name: コンテナ名
+            file_path: データファイルのパス
+            
+        Returns:
+            成功した場合True（ファイルがない・データが空の場合は投入せずTrue）
+        """
+        items = self.stream_json_file(file_path)
+        if items is None:
+            return True
+        
+        checkpoint = None
+        if self.checkpoints is not None:
+            checkpoint = self.checkpoints.open(container_name, file_path, self.resume)
+            if checkpoint.completed:
+                print(f"⏩ {container_name} は投入済みのためスキップします（{checkpoint.total}件）")
+                if self.verify_mode == "count":
+                    return self.verify_data(container_name, checkpoint.total)
+                return True
+        
+        tracker = None
+        if self.verify_mode in ("sample", "partition"):
+            tracker = WriteTracker(
+                sample_size=self.verify_sample_size,
+                track_ids=self.verify_mode == "partition"
+            )
+        
+        if not self.insert_data_to_container(container_name, items, checkpoint, tracker):
+            return False
+        if checkpoint is not None:
+            checkpoint.complete(items.count)
+        if items.count == 0:
+            print(f"⚠️  {file_path} にデータがありません")
+            return True
+        print(f"✓ {file_path} から {items.count}件を読み込みました")
+        
+        if self.verify_mode == "count":
+            return self.verify_data(container_name, items.count)
+        if tracker is not None and tracker.count:
+            return self.verify_written(container_name, tracker)
+        return True
 
 def main():
     parser = argparse.ArgumentParser(description="Azure Cosmos DB サンプルデータ投入")
-    parser.add_argument("--endpoint", required=True, help="Cosmos DB エンドポイントURL")
-    parser.add_argument("--key", required=True, help="Cosmos DB プライマリキー")
+    parser.add_argument("--endpoint", help="Cosmos DB エンドポイントURL")
+    parser.add_argument("--key", help="Cosmos DB プライマリキー")
     parser.add_argument("--database", default="FactoryEquipmentDB", help="データベース名")
     parser.add_argument("--data-dir", default="database/cosmosdb-data", help="データファイルディレクトリ")
+    parser.add_argument("--concurrency", type=int, default=16, help="同時に発行する upsert の上限")
+    parser.add_argument("--batch-size", type=int, default=1000, help="パーティションキーでまとめる単位（件）")
+    parser.add_argument("--max-retries", type=int, default=9, help="429（スロットリング）の最大再試行回数")
+    parser.add_argument("--progress-interval", type=float, default=2.0, help="進捗表示の間隔（秒）")
+    parser.add_argument("--checkpoint", help="チェックポイントファイル（省略時は <データディレクトリ>/.bulk_insert_checkpoint.json）")
+    parser.add_argument("--resume", action="store_true", help="チェックポイントの投入済みの分を読み飛ばして再開する")
+    parser.add_argument("--verify", choices=VERIFY_MODES, default="sample",
+                        help="投入後の検証方法（sample: 抽出したアイテムのポイント読み取り、"
+                             "partition: 書き込んだパーティションごとの件数、count: コンテナ全体の件数）")
+    parser.add_argument("--verify-sample-size", type=int, default=100, help="sample 検証でポイント読み取りする件数")
+    parser.add_argument("--fake", action="store_true",
+                        help="Cosmos DB に接続せず、遅延と429を模擬するプロセス内コンテナに投入する")
     
     args = parser.parse_args()
+    if not args.fake and not (args.endpoint and args.key):
+        parser.error("--endpoint と --key を指定してください（接続せずに確認する場合は --fake）")
     
     print("🚀 Azure Cosmos DB サンプルデータ投入開始")
-    print(f"📍 エンドポイント: {args.endpoint}")
+    print(f"📍 エンドポイント: {'プロセス内の代替コンテナ' if args.fake else args.endpoint}")
     print(f"💾 データベース: {args.database}")
     print(f"📁 データディレクトリ: {args.data_dir}")
     print("=" * 50)
     
     try:
-        loader = CosmosDBDataLoader(args.endpoint, args.key, args.database)
+        database = None
+        if args.fake:
+            from fake_container import FakeDatabase
+            database = FakeDatabase(latency=0.01, throttle_rate=0.05)
+        loader = CosmosDBDataLoader(
+            args.endpoint, args.key, args.database,
+            concurrency=args.concurrency,
+            batch_size=args.batch_size,
+            max_retries=args.max_retries,
+            progress_interval=args.progress_interval,
+            database=database,
+            checkpoint_path=args.checkpoint or os.path.join(args.data_dir, ".bulk_insert_checkpoint.json"),
+            resume=args.resume,
+            verify_mode=args.verify,
+            verify_sample_size=args.verify_sample_size
+        )
         success = loader.load_all_sample_data(args.data_dir)
         
         print("=" * 50)
@@ -175,16 +374,20 @@ def main():
             print("❌ データ投入中にエラーが発生しました")
             sys.exit(1)
             
-    except exceptions.CosmosResourceNotFoundError:
-        print(f"✗ エラー: データベース '{args.database}' が見つかりません")
-        print("   データベースが作成されているか確認してください")
-        sys.exit(1)
-    except exceptions.CosmosAuthenticationError:
-        print("✗ エラー: 認証に失敗しました")
-        print("   エンドポイントURLとプライマリキーを確認してください")
+    except ImportError as e:
+        print(f"✗ エラー: azure-cosmos を読み込めません - {e}")
+        print("   pip install azure-cosmos を実行してください（接続せずに確認する場合は --fake）")
         sys.exit(1)
     except Exception as e:
-        print(f"✗ 予期しないエラーが発生しました: {e}")
+        # 例外は azure-cosmos に依存せず status_code で判定する（bulk_upsert.py と同じ）
+        if is_not_found(e):
+            print(f"✗ エラー: データベース '{args.database}' が見つかりません")
+            print("   データベースが作成されているか確認してください")
+        elif getattr(e, 'status_code', None) == UNAUTHORIZED_STATUS:
+            print("✗ エラー: 認証に失敗しました")
+            print("   エンドポイントURLとプライマリキーを確認してください")
+        else:
+            print(f"✗ 予期しないエラーが発生しました: {e}")
         sys.exit(1)
 
 if __name__ == "__main__":
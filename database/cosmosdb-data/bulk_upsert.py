@@ -0,0 +1,248 @@
+"""
+Cosmos DB 並列一括 upsert
+
+1件ずつ upsert_item を呼んで待つ方式では、1日分の履歴データの投入に数時間かかる。
+ここでは同時実行数を上限付きで管理しながら複数の upsert を並行して発行する。
+
+- 入力を batch_size 件ずつ区切り、パーティションキーごとにまとめたグループを
+  ワーカーに割り当てる（1つのグループは同じ論理パーティションにのみ書き込む）
+- 実行中・待機中のグループ数に上限を設け、入力がジェネレータでもメモリ使用量を抑える
+- 429（スロットリング）は指数バックオフ（x-ms-retry-after-ms 以上）で再試行する
+  （retry_throttled は投入後の検証の読み取りでも使う）
+- 進捗は progress_interval 秒ごとにまとめて表示する
+- tracker を渡すと、成功したアイテムと書き込み時の etag を記録する（verification.py）
+- checkpoint を渡すと、アイテムの通し番号ごとの成否を記録し定期的に保存する
+  （start_index 件目までは読み飛ばして再開できる）
+
+例外は status_code / headers 属性で判定するため azure-cosmos に依存せず、
+fake_container.FakeContainer でも動作を確認できる。
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+THROTTLED_STATUS = 429
+# 失敗の詳細を保持する上限
+MAX_ERROR_DETAILS = 100
+
+
+def is_throttled(error):
+    """429（リクエスト過多）のエラーか"""
+    return getattr(error, 'status_code', None) == THROTTLED_STATUS
+
+
+def retry_after_seconds(error):
+    """サーバーが指定した再試行までの待ち時間（指定がなければ None）"""
+    headers = getattr(error, 'headers', None) or {}
+    value = headers.get('x-ms-retry-after-ms')
+    try:
+        return float(value) / 1000 if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_seconds(attempt, error, backoff_base=0.1, backoff_max=10.0):
+    """指数バックオフ（ジッター付き）。サーバー指定の待ち時間より短くはしない"""
+    delay = min(backoff_max, backoff_base * (2 ** attempt)) * random.uniform(0.5, 1.0)
+    return max(delay, retry_after_seconds(error) or 0.0)
+
+
+def retry_throttled(call, max_retries=9, backoff_base=0.1, backoff_max=10.0, sleep=time.sleep, on_throttled=None):
+    """
+    call() を実行し、429 の間はバックオフして max_retries 回まで再試行する
+
+    429 以外のエラーと、再試行回数を超えた 429 はそのまま送出する。
+    on_throttled を渡すと、再試行のたびにエラーを渡して呼び出す。
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return call()
+        except Exception as e:
+            if not is_throttled(e) or attempt >= max_retries:
+                raise
+            if on_throttled is not None:
+                on_throttled(e)
+            sleep(backoff_seconds(attempt, e, backoff_base, backoff_max))
+
+
+class BulkResult:
+    """一括投入の集計結果"""
+
+    def __init__(self):
+        self.succeeded = 0
+        self.failed = 0
+        self.throttled = 0
+        self.errors = []
+        self.started_at = time.monotonic()
+        self.finished_at = None
+
+    @property
+    def processed(self):
+        return self.succeeded + self.failed
+
+    @property
+    def elapsed(self):
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def rate(self):
+        return self.processed / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class ProgressReporter:
+    """一定間隔でのみ進捗を表示する"""
+
+    def __init__(self, label, interval=2.0, clock=time.monotonic, output=print):
+        self.label = label
+        self.interval = interval
+        self.clock = clock
+        self.output = output
+        self._last = clock()
+        self._last_processed = None
+
+    def update(self, result, force=False):
+        """前回表示から interval 秒経過していれば表示（force は件数が変わっていれば表示）"""
+        now = self.clock()
+        if force:
+            if result.processed == self._last_processed:
+                return
+        elif now - self._last < self.interval:
+            return
+        self._last = now
+        self._last_processed = result.processed
+        self.output(
+            f"  📝 {self.label}: {result.processed:,}件処理"
+            f"（成功 {result.succeeded:,} / 失敗 {result.failed:,} / 429再試行 {result.throttled:,}）"
+            f" {result.rate:,.0f}件/秒"
+        )
+
+
+class BulkUpserter:
+    """上限付きの並列 upsert"""
+
+    def __init__(self, container, partition_key='equipmentId', concurrency=16, batch_size=1000,
+                 max_retries=9, backoff_base=0.1, backoff_max=10.0, progress_interval=2.0,
+                 sleep=time.sleep, output=print):
+        """
+        Args:
+            container: upsert_item を持つコンテナ（ContainerProxy または FakeContainer）
+            partition_key: パーティションキーのプロパティ名
+            concurrency: 同時に発行する upsert の上限
+            batch_size: パーティションキーでまとめる単位（件）
+            max_retries: 429 の最大再試行回数
+            backoff_base: 指数バックオフの初期待ち時間（秒）
+            backoff_max: バックオフの最大待ち時間（秒）
+            progress_interval: 進捗表示の間隔（秒）
+        """
+        self.container = container
+        self.partition_key = partition_key
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.progress_interval = progress_interval
+        self.sleep = sleep
+        self.output = output
+        self._lock = threading.Lock()
+
+    def _batches(self, items, start_index):
+        """(通し番号, アイテム) のバッチ（start_index 未満は読み飛ばす）"""
+        batch = []
+        for index, item in enumerate(items):
+            if index < start_index:
+                continue
+            batch.append((index, item))
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _partition_groups(self, batch):
+        """バッチをパーティションキーごとに分け、大きいグループは並列度に応じて分割する"""
+        groups = {}
+        for entry in batch:
+            groups.setdefault(entry[1].get(self.partition_key), []).append(entry)
+        group_size = max(1, -(-len(batch) // self.concurrency))
+        for items in groups.values():
+            for start in range(0, len(items), group_size):
+                yield items[start:start + group_size]
+
+    def _upsert(self, item, result, tracker):
+        def throttled(error):
+            with self._lock:
+                result.throttled += 1
+
+        try:
+            response = retry_throttled(
+                lambda: self.container.upsert_item(item), self.max_retries,
+                self.backoff_base, self.backoff_max, self.sleep, on_throttled=throttled
+            )
+        except Exception as e:
+            with self._lock:
+                result.failed += 1
+                if len(result.errors) < MAX_ERROR_DETAILS:
+                    result.errors.append((item.get('id', 'N/A'), str(e)))
+            return False
+        with self._lock:
+            result.succeeded += 1
+        if tracker is not None:
+            tracker.record(item, response)
+        return True
+
+    def _upsert_group(self, entries, result, checkpoint, tracker):
+        for index, item in entries:
+            succeeded = self._upsert(item, result, tracker)
+            if checkpoint is not None:
+                checkpoint.mark(index, succeeded)
+
+    def _wait_any(self, pending, result, progress, checkpoint):
+        """いずれかのグループの完了（または進捗表示の間隔）まで待ち、未完了のものを返す"""
+        done, pending = wait(pending, timeout=self.progress_interval, return_when=FIRST_COMPLETED)
+        for future in done:
+            future.result()
+        progress.update(result)
+        if checkpoint is not None:
+            checkpoint.save()
+        return pending
+
+    def upsert_all(self, items, label='', start_index=0, checkpoint=None, tracker=None):
+        """
+        アイテムを並列に upsert する
+
+        Args:
+            items: アイテムのイテラブル（リスト・ジェネレータ）
+            label: 進捗表示のラベル
+            start_index: 先頭から読み飛ばす件数（投入済みの分）
+            checkpoint: 進捗を記録する checkpoint.ContainerCheckpoint
+            tracker: 書き込んだアイテムを記録する verification.WriteTracker
+
+        Returns:
+            BulkResult
+        """
+        result = BulkResult()
+        progress = ProgressReporter(label, self.progress_interval, output=self.output)
+        max_pending = self.concurrency * 2
+        pending = set()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            try:
+                for batch in self._batches(items, start_index):
+                    for group in self._partition_groups(batch):
+                        while len(pending) >= max_pending:
+                            pending = self._wait_any(pending, result, progress, checkpoint)
+                        pending.add(executor.submit(self._upsert_group, group, result, checkpoint, tracker))
+                while pending:
+                    pending = self._wait_any(pending, result, progress, checkpoint)
+            finally:
+                # 入力エラーなどで中断した場合も、完了済みの分は記録する
+                if checkpoint is not None:
+                    wait(pending)
+                    checkpoint.save(force=True)
+
+        result.finished_at = time.monotonic()
+        progress.update(result, force=True)
+        return result
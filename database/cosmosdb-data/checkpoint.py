@@ -0,0 +1,136 @@
+"""
+一括投入のチェックポイント
+
+大量の SensorData の投入が途中で失敗したとき、最初からやり直すと投入済みの分も
+再度 upsert され RU を二重に消費する。コンテナごとに「ファイル先頭から何件目までが
+確実に投入済みか」を小さな JSON ファイルに記録し、--resume 時はその件数を読み飛ばす。
+
+- 並列 upsert は完了順が前後するため、先頭から途切れなく成功した件数（committed）を記録する
+- 失敗したアイテムがあると committed はそこで止まり、再開時はそこから投入し直す
+  （id 指定の upsert は冪等なので、重複して投入しても結果は変わらない）
+- ファイルのサイズ・更新時刻が記録時と異なる場合は記録を使わず最初から投入する
+- 記録は一時ファイルへの書き込みと置き換えで行い、書き込み途中で中断しても壊れない
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+CHECKPOINT_VERSION = 1
+DEFAULT_SAVE_INTERVAL = 5.0
+
+
+def file_signature(file_path):
+    """ファイルの同一性判定に使う情報"""
+    stat = os.stat(file_path)
+    return {
+        'file': os.path.abspath(file_path),
+        'size': stat.st_size,
+        'mtime': stat.st_mtime
+    }
+
+
+class CheckpointStore:
+    """チェックポイントファイル（コンテナ名 → 進捗）"""
+
+    def __init__(self, path, save_interval=DEFAULT_SAVE_INTERVAL):
+        self.path = path
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self.containers = {}
+        if os.path.isfile(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == CHECKPOINT_VERSION:
+                    self.containers = data.get('containers', {})
+            except (OSError, ValueError):
+                self.containers = {}
+
+    def open(self, container_name, file_path, resume=False):
+        """
+        コンテナへの投入のチェックポイントを開始する
+
+        Args:
+            container_name: コンテナ名
+            file_path: 投入するデータファイル
+            resume: 記録済みの進捗から再開するか（False の場合は記録を破棄）
+        """
+        signature = file_signature(file_path)
+        entry = self.containers.get(container_name)
+        same_file = entry is not None and all(entry.get(key) == value for key, value in signature.items())
+        if not (resume and same_file):
+            entry = dict(signature, committed=0, completed=False, total=None)
+            self.containers[container_name] = entry
+            self.write()
+        return ContainerCheckpoint(self, container_name, entry)
+
+    def write(self):
+        """一時ファイルに書き込んでから置き換える"""
+        with self._lock:
+            data = {'version': CHECKPOINT_VERSION, 'containers': self.containers}
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.path)
+
+
+class ContainerCheckpoint:
+    """1コンテナ分の進捗（先頭から途切れなく成功した件数）"""
+
+    def __init__(self, store, container_name, entry, clock=time.monotonic):
+        self.store = store
+        self.container_name = container_name
+        self.entry = entry
+        self.clock = clock
+        self.committed = entry['committed']
+        self._done = set()
+        # 最初に失敗したアイテムの通し番号（committed はここを越えない）
+        self._failed_index = None
+        self._lock = threading.Lock()
+        self._saved_at = clock()
+
+    @property
+    def completed(self):
+        return self.entry.get('completed', False)
+
+    @property
+    def total(self):
+        return self.entry.get('total')
+
+    def mark(self, index, succeeded):
+        """index 番目（0 始まり）のアイテムの結果を記録する"""
+        with self._lock:
+            if index < self.committed:
+                return
+            if not succeeded:
+                # 失敗したアイテム以降は進めない（再開時にここから投入し直す）
+                if self._failed_index is None or index < self._failed_index:
+                    self._failed_index = index
+                    self._done = {done for done in self._done if done < index}
+                return
+            if self._failed_index is not None and index > self._failed_index:
+                return
+            self._done.add(index)
+            while self.committed in self._done:
+                self._done.remove(self.committed)
+                self.committed += 1
+
+    def save(self, force=False):
+        """save_interval 秒ごと（force の場合は即時）に進捗を書き込む"""
+        now = self.clock()
+        if not force and now - self._saved_at < self.store.save_interval:
+            return
+        self._saved_at = now
+        with self._lock:
+            self.entry['committed'] = self.committed
+        self.entry['updatedAt'] = datetime.now().isoformat()
+        self.store.write()
+
+    def complete(self, total):
+        """全件の投入が成功したことを記録する"""
+        self.entry['completed'] = True
+        self.entry['total'] = total
+        self.save(force=True)
@@ -0,0 +1,118 @@
+"""
+ローカル検証用の Cosmos DB コンテナ代替
+
+Cosmos DB に接続せずに一括投入の並列度・再試行の動作を確認するため、
+ContainerProxy の一部（upsert_item / read_item / query_items）をプロセス内で模擬する。
+
+- 1リクエストごとに latency 秒（±jitter）の待ち時間を入れる
+- 同時実行数が capacity を超えたリクエスト、および throttle_rate の割合のリクエストは
+  429 エラー（x-ms-retry-after-ms 付き）を返す
+"""
+
+import random
+import threading
+import time
+import uuid
+
+
+class FakeCosmosError(Exception):
+    """CosmosHttpResponseError と同じく status_code / headers を持つ例外"""
+
+    def __init__(self, status_code, message, headers=None):
+        super().__init__(f"({status_code}) {message}")
+        self.status_code = status_code
+        self.message = message
+        self.headers = headers or {}
+
+
+class FakeContainer:
+    """メモリ上にアイテムを保持するコンテナ"""
+
+    def __init__(self, name='FakeContainer', partition_key='equipmentId', latency=0.005, jitter=0.5,
+                 capacity=None, throttle_rate=0.0, retry_after_ms=20, seed=None):
+        self.id = name
+        self.partition_key = partition_key
+        self.latency = latency
+        self.jitter = jitter
+        self.capacity = capacity
+        self.throttle_rate = throttle_rate
+        self.retry_after_ms = retry_after_ms
+        self.items = {}
+        self.request_count = 0
+        self.throttled_count = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.items)
+
+    def _request(self):
+        """リクエストの開始（スロットリング判定）と待ち時間"""
+        with self._lock:
+            self.request_count += 1
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+            throttled = (self.capacity is not None and self._in_flight > self.capacity) \
+                or self._random.random() < self.throttle_rate
+            delay = self.latency * (1 + self._random.uniform(-self.jitter, self.jitter))
+        try:
+            if throttled:
+                with self._lock:
+                    self.throttled_count += 1
+                raise FakeCosmosError(
+                    429, "Request rate is large", {'x-ms-retry-after-ms': str(self.retry_after_ms)}
+                )
+            time.sleep(delay)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def upsert_item(self, body, **kwargs):
+        self._request()
+        item = dict(body, _etag=f'"{uuid.uuid4()}"', _ts=int(time.time()))
+        with self._lock:
+            self.items[(item.get(self.partition_key), item['id'])] = item
+        return dict(item)
+
+    def read_item(self, item, partition_key, **kwargs):
+        self._request()
+        with self._lock:
+            stored = self.items.get((partition_key, item))
+        if stored is None:
+            raise FakeCosmosError(404, "Entity with the specified id does not exist in the system.")
+        return dict(stored)
+
+    def query_items(self, query, parameters=None, partition_key=None, enable_cross_partition_query=False, **kwargs):
+        """
+        件数のクエリのみ対応（partition_key 指定時はその範囲の件数）
+
+        - SELECT VALUE COUNT(1) FROM c
+        - SELECT VALUE COUNT(1) FROM c WHERE ARRAY_CONTAINS(@ids, c.id)
+        """
+        self._request()
+        normalized = ' '.join(query.split()).upper()
+        if not normalized.startswith('SELECT VALUE COUNT(1) FROM C'):
+            raise FakeCosmosError(400, f"未対応のクエリです: {query}")
+        ids = None
+        if 'ARRAY_CONTAINS(@IDS, C.ID)' in normalized:
+            ids = set(next(p['value'] for p in parameters or [] if p['name'] == '@ids'))
+        with self._lock:
+            return [sum(
+                1 for key in self.items
+                if (partition_key is None or key[0] == partition_key) and (ids is None or key[1] in ids)
+            )]
+
+
+class FakeDatabase:
+    """コンテナ名ごとに FakeContainer を返す DatabaseProxy の代替"""
+
+    def __init__(self, **container_options):
+        self.container_options = container_options
+        self.containers = {}
+
+    def get_container_client(self, container):
+        if container not in self.containers:
+            self.containers[container] = FakeContainer(container, **self.container_options)
+        return self.containers[container]
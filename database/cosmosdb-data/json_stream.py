@@ -0,0 +1,155 @@
+"""
+JSON / NDJSON ストリーミング読み込み
+
+json.load でファイル全体を読み込むと、数GBの履歴エクスポートでは投入を始める前に
+メモリが不足する。ここではファイルを一定サイズずつ読みながらアイテムを1件ずつ返す。
+
+- 先頭の空白以外の文字が '[' の場合はトップレベル配列、それ以外は NDJSON（1行1アイテム）
+- gzip 圧縮ファイル（先頭2バイトで判定）はそのまま読み込める
+- 保持するのは読み込み中のチャンクと解析中の1アイテムのみで、
+  メモリ使用量はファイルサイズに依存しない
+- 配列の1要素が max_item_size 文字を超えても解析できない場合は、ファイルの末尾まで
+  読み足さずにその位置でエラーとする（壊れた要素でメモリを使い切らないようにする）
+"""
+
+import gzip
+import json
+
+GZIP_MAGIC = b'\x1f\x8b'
+READ_CHUNK_SIZE = 1 << 16
+# 配列の1要素として読み足す上限（文字数）
+MAX_ITEM_SIZE = 1 << 20
+WHITESPACE = ' \t\r\n'
+
+
+class JsonStreamError(ValueError):
+    """入力ファイルの JSON 形式が無効"""
+
+
+def open_text(file_path):
+    """テキストとして開く（gzip 圧縮は自動で展開）"""
+    with open(file_path, 'rb') as f:
+        magic = f.read(2)
+    if magic == GZIP_MAGIC:
+        return gzip.open(file_path, 'rt', encoding='utf-8-sig')
+    return open(file_path, 'r', encoding='utf-8-sig')
+
+
+def iter_json_items(file_path, chunk_size=READ_CHUNK_SIZE, max_item_size=MAX_ITEM_SIZE):
+    """
+    JSON 配列または NDJSON のファイルからアイテムを1件ずつ返す
+
+    Args:
+        file_path: ファイルのパス
+        chunk_size: 1回に読み込む文字数
+        max_item_size: 配列の1要素の上限（文字数）
+
+    Raises:
+        FileNotFoundError: ファイルが存在しない
+        JsonStreamError: JSON 形式が無効
+    """
+    with open_text(file_path) as f:
+        head = f.read(chunk_size)
+        stripped = head.lstrip(WHITESPACE)
+        if stripped.startswith('['):
+            yield from _iter_array(f, stripped[1:], chunk_size, max_item_size)
+        else:
+            yield from _iter_lines(f, head)
+
+
+def _iter_lines(f, head):
+    """NDJSON（空行は無視）"""
+    def lines():
+        # 先頭チャンクの最後の行は続きをファイルから読み足す
+        parts = head.split('\n')
+        yield from parts[:-1]
+        yield parts[-1] + f.readline()
+        yield from f
+
+    for line_number, line in enumerate(lines(), 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise JsonStreamError(f"{line_number}行目: {e.msg}") from None
+
+
+def _iter_array(f, buffer, chunk_size, max_item_size):
+    """トップレベル配列の要素を順に解析する"""
+    decoder = json.JSONDecoder()
+    eof = False
+    position = 0
+    expect_value = True
+    # カンマの直後（']' で閉じると末尾のカンマになる）
+    after_comma = False
+    consumed = 0
+
+    def fill():
+        nonlocal buffer, position, eof, consumed
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+        consumed += position
+        buffer = buffer[position:] + chunk
+        position = 0
+
+    while True:
+        # 空白と区切りのカンマを読み飛ばす
+        while True:
+            while position < len(buffer) and buffer[position] in WHITESPACE:
+                position += 1
+            if position < len(buffer) or eof:
+                break
+            fill()
+        if position >= len(buffer):
+            raise JsonStreamError("配列が閉じられていません")
+
+        char = buffer[position]
+        if char == ']':
+            if after_comma:
+                raise JsonStreamError(f"{consumed + position}文字目: 末尾のカンマの後に値が必要です")
+            return
+        if char == ',' and not expect_value:
+            position += 1
+            expect_value = True
+            after_comma = True
+            continue
+        if not expect_value:
+            raise JsonStreamError(f"{consumed + position}文字目: ',' または ']' が必要です")
+
+        # 1要素を解析（途中で切れていれば読み足す）
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as e:
+                if eof or len(buffer) - position > max_item_size:
+                    raise JsonStreamError(f"{consumed + e.pos}文字目: {e.msg}") from None
+                fill()
+                continue
+            if end == len(buffer) and not eof:
+                # 数値などは続きがある可能性がある
+                fill()
+                continue
+            break
+        yield item
+        position = end
+        expect_value = False
+        after_comma = False
+
+
+class CountingIterator:
+    """読み込んだ件数を数えながらアイテムを返す"""
+
+    def __init__(self, items):
+        self._items = iter(items)
+        self.count = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        item = next(self._items)
+        self.count += 1
+        return item
@@ -0,0 +1,131 @@
+"""
+投入結果の検証
+
+投入後に SELECT VALUE COUNT(1) FROM c をパーティション横断で実行すると、
+大きなコンテナではコンテナ全体を走査する高コストなクエリになり、
+既存のアイテムと今回投入したアイテムも区別できない。
+ここではローダー自身が書き込んだアイテムの id / etag を記録し、
+今回の投入量に比例したコストで検証する。
+
+- sample: 書き込んだアイテムから無作為に抽出した件数をポイント読み取りし、
+  存在することと etag が書き込み時と一致することを確認する（1件あたり約1RU）
+- partition: 書き込んだパーティションキーごとに、今回の id に限定した件数を数える
+
+読み取り・クエリの 429（スロットリング）は投入時と同じく bulk_upsert.retry_throttled で再試行する。
+"""
+
+import random
+import threading
+
+from bulk_upsert import retry_throttled
+
+NOT_FOUND_STATUS = 404
+# partition 検証で1回のクエリに含める id の上限
+IDS_PER_QUERY = 500
+
+PARTITION_COUNT_QUERY = "SELECT VALUE COUNT(1) FROM c WHERE ARRAY_CONTAINS(@ids, c.id)"
+
+
+def is_not_found(error):
+    """404（アイテムが存在しない）のエラーか"""
+    return getattr(error, 'status_code', None) == NOT_FOUND_STATUS
+
+
+class WriteTracker:
+    """upsert に成功したアイテムの記録"""
+
+    def __init__(self, partition_key='equipmentId', sample_size=100, track_ids=False, seed=None):
+        """
+        Args:
+            partition_key: パーティションキーのプロパティ名
+            sample_size: ポイント読み取りで検証する件数（リザーバーサンプリング）
+            track_ids: パーティションごとの id をすべて保持するか（partition 検証用）
+        """
+        self.partition_key = partition_key
+        self.sample_size = sample_size
+        self.track_ids = track_ids
+        self.count = 0
+        self.samples = []
+        self.ids_by_partition = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def record(self, item, response):
+        """書き込み結果（upsert_item の戻り値）を記録する"""
+        entry = (item.get('id'), item.get(self.partition_key), (response or {}).get('_etag'))
+        with self._lock:
+            self.count += 1
+            if len(self.samples) < self.sample_size:
+                self.samples.append(entry)
+            else:
+                slot = self._random.randrange(self.count)
+                if slot < self.sample_size:
+                    self.samples[slot] = entry
+            if self.track_ids:
+                self.ids_by_partition.setdefault(entry[1], set()).add(entry[0])
+
+
+class VerificationResult:
+    """検証結果"""
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.checked = 0
+        self.requests = 0
+        self.throttled = 0
+        self.problems = []
+
+    @property
+    def ok(self):
+        return not self.problems
+
+    def call(self, func, retry_options):
+        """1リクエストを実行する（429 は再試行し、再試行の回数も数える）"""
+        def throttled(error):
+            self.throttled += 1
+
+        self.requests += 1
+        return retry_throttled(func, on_throttled=throttled, **retry_options)
+
+
+def verify_sampled_reads(container, tracker, **retry_options):
+    """
+    抽出したアイテムをポイント読み取りで確認する
+
+    retry_options は retry_throttled の引数（max_retries / backoff_base / backoff_max / sleep）
+    """
+    result = VerificationResult('sample')
+    for item_id, partition_key, etag in tracker.samples:
+        result.checked += 1
+        try:
+            stored = result.call(
+                lambda: container.read_item(item=item_id, partition_key=partition_key), retry_options
+            )
+        except Exception as e:
+            if not is_not_found(e):
+                raise
+            result.problems.append(f"{item_id}: 見つかりません")
+            continue
+        if etag is not None and stored.get('_etag') != etag:
+            result.problems.append(f"{item_id}: etag が書き込み時と異なります（投入後の更新、または入力内の id 重複）")
+    return result
+
+
+def verify_partition_counts(container, tracker, **retry_options):
+    """パーティションキーごとに今回書き込んだ id の件数を確認する（retry_options は verify_sampled_reads と同じ）"""
+    result = VerificationResult('partition')
+    for partition_key, ids in tracker.ids_by_partition.items():
+        ids = sorted(ids)
+        found = 0
+        for start in range(0, len(ids), IDS_PER_QUERY):
+            # 結果の取得中（ページの読み込み）の 429 も再試行できるよう、list() までをまとめて実行する
+            counts = result.call(lambda: list(container.query_items(
+                query=PARTITION_COUNT_QUERY,
+                parameters=[{'name': '@ids', 'value': ids[start:start + IDS_PER_QUERY]}],
+                partition_key=partition_key
+            )), retry_options)
+            found += counts[0] if counts else 0
+        result.checked += len(ids)
+        if found != len(ids):
+            result.problems.append(f"パーティション {partition_key}: {found}件（期待値: {len(ids)}件）")
+    return result
@@ -102,6 +102,26 @@ class ApiService {
     return this.request(`/sensor-data/${equipmentId}`)
   }
 
+  /**
+   * 変更の購読（Server-Sent Events）
+   * handlers: { equipment, alert, sensor, reset } の各イベントのコールバック
+   * 切断時は EventSource が Last-Event-ID 付きで自動的に再接続する
+   * 戻り値の関数を呼ぶと購読を終了する
+   */
+  subscribeToUpdates(handlers = {}, types = []) {
+    const query = types.length ? `?types=${types.join(',')}` : ''
+    const source = new EventSource(`${API_BASE_URL}/stream${query}`)
+    
+    for (const [type, handler] of Object.entries(handlers)) {
+      source.addEventListener(type, event => handler(JSON.parse(event.data)))
+    }
+    source.onerror = error => {
+      console.error('Update stream error:', error)
+    }
+    
+    return () => source.close()
+  }
+
   /**
    * IoTデータ処理（Azure Functionsへのリクエスト）
    */